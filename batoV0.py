@@ -1,7 +1,6 @@
 import os
 import re
 import time
-import requests
 from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -10,6 +9,11 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+
 # Selenium setup
 def setup_driver():
     chrome_options = Options()
@@ -18,7 +22,7 @@ def setup_driver():
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--start-maximized")
-    driver_service = Service("path/to/chromedriver")  # Update this to the correct path
+    driver_service = Service(chromedriver.driver_path())  # Cached per Chrome version, or CHROMEDRIVER_PATH
     driver = webdriver.Chrome(service=driver_service, options=chrome_options)
     return driver
 
@@ -37,35 +41,40 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
             output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                img.save(output_path, "JPEG")
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
             num_pieces = img_height // piece_height
             for cut_number in range(num_pieces):
                 left, upper, right, lower = 0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height
-                piece = img.crop((left, upper, right, lower))
+                with metrics.stage("slice"):
+                    piece = img.crop((left, upper, right, lower))
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
             remainder = img_height % piece_height
             if remainder > 0:
                 box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -74,19 +83,21 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 # Download images for a chapter
 def download_images_for_chapter(driver, chapter_url, manga_title, chapter_number):
     print(f"Processing Chapter {chapter_number}: {chapter_url}")
-    driver.get(chapter_url)
-
-    # Wait for the viewer div to load
-    try:
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.ID, "viewer"))
-        )
-    except Exception as e:
-        print(f"Viewer not found: {e}")
-        return
-
-    viewer_div = driver.find_element(By.ID, "viewer")
-    img_elements = viewer_div.find_elements(By.TAG_NAME, "img")
+    with metrics.stage("render"):
+        driver.get(chapter_url)
+
+        # Wait for the viewer div to load
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.ID, "viewer"))
+            )
+        except Exception as e:
+            print(f"Viewer not found: {e}")
+            return
+
+    with metrics.stage("parse"):
+        viewer_div = driver.find_element(By.ID, "viewer")
+        img_elements = viewer_div.find_elements(By.TAG_NAME, "img")
 
     if not img_elements:
         print(f"No images found for Chapter {chapter_number}")
@@ -102,7 +113,9 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_number
         # Check if the image is the best quality by URL
         if "mbuul.org/media" in img_url and (".webp" in img_url or ".jpg" in img_url):  # Prefer webp or high res jpg
             try:
-                img_data = requests.get(img_url, timeout=10).content
+                response = httpcache.get(img_url)
+                response.raise_for_status()
+                img_data = response.content
                 temp_image_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
 
                 # Save the image temporarily
@@ -119,23 +132,26 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_number
                 os.remove(temp_image_path)
             except Exception as e:
                 print(f"Error downloading image {img_url}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
 
 # Scrape chapters from the main page
 def scrape_chapters(driver, manga_url):
     print(f"Scraping chapters from {manga_url}")
-    driver.get(manga_url)
-
-    # Wait for the main div to load
-    try:
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "main"))
-        )
-    except Exception as e:
-        print(f"Failed to load main div: {e}")
-        return []
-
-    main_div = driver.find_element(By.CLASS_NAME, "main")
-    chapter_links = main_div.find_elements(By.CSS_SELECTOR, "a.chapt")
+    with metrics.stage("render"):
+        driver.get(manga_url)
+
+        # Wait for the main div to load
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.CLASS_NAME, "main"))
+            )
+        except Exception as e:
+            print(f"Failed to load main div: {e}")
+            return []
+
+    with metrics.stage("parse"):
+        main_div = driver.find_element(By.CLASS_NAME, "main")
+        chapter_links = main_div.find_elements(By.CSS_SELECTOR, "a.chapt")
 
     chapters = []
     for link in chapter_links:
@@ -154,14 +170,18 @@ def main():
     manga_url = "https://battwo.com/series/141768/secret-playlist-official"
     manga_title = "Secret Playlist Official"
 
-    driver = setup_driver()
-
-    try:
-        chapters = scrape_chapters(driver, manga_url)
-        for chapter_number, chapter_url in chapters:
-            download_images_for_chapter(driver, chapter_url, manga_title, chapter_number)
-    finally:
-        driver.quit()
+    with metrics.labels(site="battwo", series=manga_title):
+        with metrics.stage("browser_start"):
+            driver = setup_driver()
+
+        try:
+            with metrics.stage("list_scrape"):
+                chapters = scrape_chapters(driver, manga_url)
+            for chapter_number, chapter_url in chapters:
+                with metrics.labels(chapter=chapter_number):
+                    download_images_for_chapter(driver, chapter_url, manga_title, chapter_number)
+        finally:
+            driver.quit()
 
     print("Download completed!")
 
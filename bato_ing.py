@@ -1,5 +1,4 @@
 import os
-import requests
 from bs4 import BeautifulSoup
 from PIL import Image
 from urllib.parse import urljoin
@@ -7,17 +6,23 @@ import re
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 import time
 
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+
 # Function to fetch page with Selenium (JavaScript rendered)
 def fetch_page_with_selenium(chapter_url):
     options = Options()
     options.headless = True  # Run in headless mode (no UI)
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    driver.get(chapter_url)
-    time.sleep(5)  # Wait for JavaScript to load
-    page_source = driver.page_source
+    with metrics.stage("browser_start"):
+        driver = webdriver.Chrome(service=Service(chromedriver.driver_path()), options=options)
+    with metrics.stage("render"):
+        driver.get(chapter_url)
+        time.sleep(5)  # Wait for JavaScript to load
+        page_source = driver.page_source
     driver.quit()
     return page_source
 
@@ -27,9 +32,9 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
     print(f"Processing Chapter {chapter_number} at {chapter_url}")
 
     page_source = fetch_page_with_selenium(chapter_url)
-    soup = BeautifulSoup(page_source, "html.parser")
-
-    image_divs = soup.find_all("div", {"data-name": "image-item"})
+    with metrics.stage("parse"):
+        soup = BeautifulSoup(page_source, "html.parser")
+        image_divs = soup.find_all("div", {"data-name": "image-item"})
     if not image_divs:
         print(f"No images found for Chapter {chapter_number}.")
         return
@@ -46,7 +51,9 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
         if img_tag and img_tag.get("src"):
             img_url = img_tag["src"]
             try:
-                img_data = requests.get(img_url).content
+                response = httpcache.get(img_url)
+                response.raise_for_status()
+                img_data = response.content
                 img_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
                 with open(img_path, "wb") as img_file:
                     img_file.write(img_data)
@@ -56,6 +63,7 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
                 os.remove(img_path)  # Remove temporary image
             except Exception as e:
                 print(f"Error downloading page {idx + 1}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
         else:
             print(f"No image found in div {idx + 1}. Skipping.")
 
@@ -81,35 +89,40 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
             output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index}.jpg"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                img.save(output_path, "JPEG")
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
             num_pieces = img_height // piece_height
             for cut_number in range(num_pieces):
                 left, upper, right, lower = 0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height
-                piece = img.crop((left, upper, right, lower))
+                with metrics.stage("slice"):
+                    piece = img.crop((left, upper, right, lower))
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
             remainder = img_height % piece_height
             if remainder > 0:
                 box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -120,9 +133,9 @@ def scrape_chapters(manga_url):
     print(f"Scraping chapters for {manga_url}")
 
     page_source = fetch_page_with_selenium(manga_url)
-    soup = BeautifulSoup(page_source, "html.parser")
-
-    chapter_list_div = soup.find("div", class_="group flex flex-col")
+    with metrics.stage("parse"):
+        soup = BeautifulSoup(page_source, "html.parser")
+        chapter_list_div = soup.find("div", class_="group flex flex-col")
     if not chapter_list_div:
         print("Could not find the chapter list div.")
         return []
@@ -145,10 +158,13 @@ def scrape_chapters(manga_url):
 # Main function
 def main():
     manga_url = "https://bato.ing/title/84772-olgami"
-    chapters = scrape_chapters(manga_url)
+    with metrics.labels(site="bato", series=extract_manga_title(manga_url)):
+        with metrics.stage("list_scrape"):
+            chapters = scrape_chapters(manga_url)
 
-    for chapter_number, chapter_href in chapters:
-        download_images_for_chapter(chapter_number, chapter_href, manga_url)
+        for chapter_number, chapter_href in chapters:
+            with metrics.labels(chapter=chapter_number):
+                download_images_for_chapter(chapter_number, chapter_href, manga_url)
 
     print("Download completed!")
 
@@ -1,17 +1,20 @@
 import os
 import re
 import time
-import requests
 from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By  
 from selenium.webdriver.common.action_chains import ActionChains
 
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+
 # Selenium setup
 def setup_driver():
     chrome_options = Options()
@@ -21,8 +24,8 @@ def setup_driver():
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--start-maximized")
     
-    # Use ChromeDriverManager().install() to handle the chromedriver without explicitly setting path
-    driver_service = Service(ChromeDriverManager().install())  # Set up the ChromeDriver service
+    # chromedriver.driver_path() resolves the driver once per Chrome version and reuses it offline
+    driver_service = Service(chromedriver.driver_path())  # Set up the ChromeDriver service
     driver = webdriver.Chrome(service=driver_service, options=chrome_options)  # Pass the driver service correctly
     return driver
 
@@ -41,35 +44,40 @@ def split_image(image_path, output_folder, manga_title, chapter_index, start_pag
 
             output_filename = f"chapter{chapter_index}_{current_page_index:02}.jpg"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                img.save(output_path, "JPEG")
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
             num_pieces = img_height // piece_height
             for cut_number in range(num_pieces):
                 left, upper, right, lower = 0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height
-                piece = img.crop((left, upper, right, lower))
+                with metrics.stage("slice"):
+                    piece = img.crop((left, upper, right, lower))
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"chapter{chapter_index}_{current_page_index:02}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
             remainder = img_height % piece_height
             if remainder > 0:
                 box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"chapter{chapter_index}_{current_page_index:02}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -79,18 +87,20 @@ def split_image(image_path, output_folder, manga_title, chapter_index, start_pag
 # Function to download images for a chapter
 def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index):
     print(f"Processing Chapter {chapter_index}: {chapter_url}")
-    driver.get(chapter_url)
-
-    # Wait for the image elements to load
-    try:
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div[name='image-items'] img"))
-        )
-    except Exception as e:
-        print(f"Images not found for Chapter {chapter_index}: {e}")
-        return
-
-    image_elements = driver.find_elements(By.CSS_SELECTOR, "div[name='image-items'] img")
+    with metrics.stage("render"):
+        driver.get(chapter_url)
+
+        # Wait for the image elements to load
+        try:
+            WebDriverWait(driver, 30).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div[name='image-items'] img"))
+            )
+        except Exception as e:
+            print(f"Images not found for Chapter {chapter_index}: {e}")
+            return
+
+    with metrics.stage("parse"):
+        image_elements = driver.find_elements(By.CSS_SELECTOR, "div[name='image-items'] img")
     if not image_elements:
         print(f"No images found for Chapter {chapter_index}")
         return
@@ -105,7 +115,9 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
         # Ensure we get the full image URL
         if img_url and img_url.startswith("https"):
             try:
-                img_data = requests.get(img_url, timeout=10).content
+                response = httpcache.get(img_url)
+                response.raise_for_status()
+                img_data = response.content
                 temp_image_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
 
                 # Save the image temporarily
@@ -122,31 +134,34 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
                 os.remove(temp_image_path)
             except Exception as e:
                 print(f"Error downloading image {img_url}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_index, chapter_url=chapter_url, page=idx + 1)
 
 
 
 # Scrape chapters from the main page
 def scrape_chapters(driver, manga_url):
     print(f"Scraping chapters from {manga_url}")
-    driver.get(manga_url)
-
-    # Wait for the chapter list div to be visible
-    try:
-        # Wait for the chapter list container to load (adjust timeout if necessary)
-        WebDriverWait(driver, 60).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'div[name="chapter-list"]'))
-        )
-    except Exception as e:
-        print(f"Failed to load content: {e}")
-        return []
-
-    # Locate the chapter list
-    try:
-        chapter_list = driver.find_element(By.CSS_SELECTOR, 'div[name="chapter-list"]')
-        chapter_links = chapter_list.find_elements(By.CSS_SELECTOR, 'a.link-hover')  # Targeting the chapter links
-    except Exception as e:
-        print(f"Failed to locate chapter list: {e}")
-        return []
+    with metrics.stage("render"):
+        driver.get(manga_url)
+
+        # Wait for the chapter list div to be visible
+        try:
+            # Wait for the chapter list container to load (adjust timeout if necessary)
+            WebDriverWait(driver, 60).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'div[name="chapter-list"]'))
+            )
+        except Exception as e:
+            print(f"Failed to load content: {e}")
+            return []
+
+    with metrics.stage("parse"):
+        # Locate the chapter list
+        try:
+            chapter_list = driver.find_element(By.CSS_SELECTOR, 'div[name="chapter-list"]')
+            chapter_links = chapter_list.find_elements(By.CSS_SELECTOR, 'a.link-hover')  # Targeting the chapter links
+        except Exception as e:
+            print(f"Failed to locate chapter list: {e}")
+            return []
 
     # Extract chapter details
     chapters = []
@@ -166,15 +181,18 @@ def main():
     manga_url = "https://battwo.com/title/181053-muse-on-fame-official"
     manga_title = "Muse on Fame"
 
-    driver = setup_driver()
-
-    try:
-        chapters = scrape_chapters(driver, manga_url)
-        for chapter_number, chapter_url in chapters[0:]:
-
-            download_images_for_chapter(driver, chapter_url, manga_title, chapter_number)
-    finally:
-        driver.quit()
+    with metrics.labels(site="battwo", series=manga_title):
+        with metrics.stage("browser_start"):
+            driver = setup_driver()
+
+        try:
+            with metrics.stage("list_scrape"):
+                chapters = scrape_chapters(driver, manga_url)
+            for chapter_number, chapter_url in chapters[0:]:
+                with metrics.labels(chapter=chapter_number):
+                    download_images_for_chapter(driver, chapter_url, manga_title, chapter_number)
+        finally:
+            driver.quit()
 
     print("Download completed!")
 
@@ -0,0 +1,62 @@
+"""
+Compares the fixed-height cutter with the gutter-aware cutter on tall strips.
+
+Run from the repository root:
+    python -m benchmarks.bench_cuts
+"""
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from gutters import cut_boxes, row_scores
+
+
+# Function to build a synthetic webtoon strip: panels of noise separated by white gutters
+def make_strip(width, height, seed=0):
+    rng = random.Random(seed)
+    strip = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(strip)
+    panels = []
+    top = 0
+    while top < height:
+        panel_height = rng.randint(400, 1400)
+        bottom = min(height, top + panel_height)
+        noise = Image.effect_noise((width - 40, bottom - top), 60).convert("RGB")
+        strip.paste(noise, (20, top))
+        draw.rectangle((20, top, width - 21, bottom - 1), outline="black", width=3)
+        panels.append((top, bottom))
+        top = bottom + rng.randint(60, 240)  # Gutter
+    return strip, panels
+
+
+# Function to count cuts that land inside a panel
+def cuts_through_panels(boxes, panels):
+    cuts = [box[3] for box in boxes[:-1]]
+    return sum(1 for cut in cuts for top, bottom in panels if top < cut < bottom)
+
+
+def bench(width, height, piece_height=2000, tolerance=300, repeat=3):
+    strip, panels = make_strip(width, height)
+
+    timings = {}
+    for name, tol in (("fixed", None), ("gutter", tolerance)):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes = cut_boxes(strip, piece_height, tolerance=tol)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = (best, len(boxes), cuts_through_panels(boxes, panels))
+
+    start = time.perf_counter()
+    row_scores(strip)
+    scan_time = time.perf_counter() - start
+
+    print(f"{width}x{height} (row scan {scan_time * 1000:.1f} ms)")
+    for name, (seconds, pieces, bad_cuts) in timings.items():
+        print(f"  {name:<7} {seconds * 1000:8.2f} ms  pieces={pieces:<3} cuts through panels={bad_cuts}")
+
+
+if __name__ == "__main__":
+    for size in ((720, 20000), (800, 60000), (1080, 120000)):
+        bench(*size)
@@ -0,0 +1,205 @@
+"""
+End-to-end download benchmark against a local fixture server: scrapes the
+chapter list, fetches every reader page and image and splits the pages with
+sitespecs.download_series, for every site, without touching the network.
+
+Run from the repository root:
+    python -m benchmarks.bench_e2e [--sites naver bato] [--profile broadband]
+                                   [--chapters 5] [--fixtures DIR] [--check]
+
+Reports chapters/min, MB/s, CPU seconds and peak RSS per site, appends them
+to benchmarks/results/e2e.jsonl with the git commit and compares with the
+previous run of the same settings (--check exits with status 1 on a
+regression of more than --tolerance).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import PROFILES, SITE_TEMPLATES, FixtureServer, generate_fixtures
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "e2e.jsonl")
+
+# Metric -> True if higher is better
+METRICS = {"chapters_per_min": True, "mb_per_s": True, "cpu_seconds": False, "peak_rss_mb": False}
+
+
+def _download_site(site, series_url, work_folder, chapters, keep_rate_limits, queue):
+    # Runs in a fresh process, so the HTTP cache, rate limiter and peak RSS start from zero
+    os.environ["MANGA_HTTP_CACHE_DIR"] = os.path.join(work_folder, "http-cache")
+    os.environ["MANGA_FAILED_PAGES"] = os.path.join(work_folder, "failed_pages.jsonl")
+    if not keep_rate_limits:
+        # The fixture server is not a remote host to be polite to
+        os.environ["MANGA_RATE_INITIAL"] = os.environ["MANGA_RATE_MAX"] = "1000"
+
+    import sitespecs
+
+    class FixtureFetcher(sitespecs.PageFetcher):
+        # Fixtures are already the rendered DOM, so nothing needs a browser
+        def fetch(self, url, render=False, wait=0):
+            return super().fetch(url)
+
+    output_folder = os.path.join(work_folder, "output")
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            with FixtureFetcher() as fetcher:
+                sitespecs.download_series(site, series_url, site, output_folder, end=chapters, fetcher=fetcher)
+        finally:
+            sys.stdout = stdout
+    wall = time.perf_counter() - start
+
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = usage.ru_utime + usage.ru_stime
+        peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    else:
+        cpu, peak_rss_mb = time.process_time() - cpu_start, None
+
+    series_folder = os.path.join(output_folder, site)
+    chapter_folders = [name for name in os.listdir(series_folder)] if os.path.isdir(series_folder) else []
+    pages = sum(len(os.listdir(os.path.join(series_folder, name))) for name in chapter_folders)
+    queue.put({"wall": wall, "cpu_seconds": cpu, "peak_rss_mb": peak_rss_mb, "chapters": len(chapter_folders), "pages": pages})
+
+
+def run_site(server, site, chapters, keep_rate_limits):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    served_before = server.bytes_served
+    with tempfile.TemporaryDirectory(prefix=f"bench-e2e-{site}-") as work_folder:
+        process = context.Process(
+            target=_download_site,
+            args=(site, f"{server.url}/{site}/series/", work_folder, chapters, keep_rate_limits, queue),
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+    megabytes = (server.bytes_served - served_before) / (1024 * 1024)
+    return {
+        "chapters": result["chapters"],
+        "pages": result["pages"],
+        "wall_seconds": round(result["wall"], 3),
+        "chapters_per_min": round(result["chapters"] / result["wall"] * 60, 2),
+        "mb_per_s": round(megabytes / result["wall"], 2),
+        "cpu_seconds": round(result["cpu_seconds"], 3),
+        "peak_rss_mb": round(result["peak_rss_mb"], 1) if result["peak_rss_mb"] is not None else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to find the last recorded run with the same settings
+def previous_run(settings, path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, "r", encoding="utf-8") as results_file:
+        for line in results_file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("settings") == settings:
+                    previous = record
+    return previous
+
+
+def compare(current, previous, tolerance):
+    """
+    Returns:
+        list: (site, metric, previous value, current value) for every metric
+        that got worse by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for site, result in current["sites"].items():
+        before = previous["sites"].get(site)
+        if not before:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((site, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", nargs="+", default=sorted(SITE_TEMPLATES), choices=sorted(SITE_TEMPLATES))
+    parser.add_argument("--profile", default="lan", choices=sorted(PROFILES))
+    parser.add_argument("--chapters", type=int, default=5, help="Chapters downloaded per site")
+    parser.add_argument("--pages", type=int, default=8, help="Images per chapter (synthetic fixtures)")
+    parser.add_argument("--fixtures", default=None, help="Recorded fixtures folder (see benchmarks/fixtures.py)")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Keep ratelimit.py's starting limits")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--no-save", action="store_true", help="Don't append this run to the results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-e2e-fixtures-") as generated:
+        fixtures = args.fixtures or generate_fixtures(generated, chapters=args.chapters, pages=args.pages)
+        server = FixtureServer(fixtures, args.profile).start()
+
+        print(f"Profile {args.profile}, {args.chapters} chapters per site, fixtures in {fixtures}")
+        print(f"{'site':<12} {'chapters':>8} {'pages':>6} {'wall s':>8} {'ch/min':>8} {'MB/s':>7} {'CPU s':>7} {'RSS MB':>7}")
+        sites = {}
+        for site in args.sites:
+            result = sites[site] = run_site(server, site, args.chapters, args.keep_rate_limits)
+            print(
+                f"{site:<12} {result['chapters']:>8} {result['pages']:>6} {result['wall_seconds']:>8.2f} "
+                f"{result['chapters_per_min']:>8.1f} {result['mb_per_s']:>7.2f} {result['cpu_seconds']:>7.2f} "
+                f"{result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-':>7}"
+            )
+        server.shutdown()
+
+    settings = {
+        "profile": args.profile,
+        "chapters": args.chapters,
+        "pages": args.pages,
+        "fixtures": os.path.abspath(args.fixtures) if args.fixtures else "synthetic",
+        "keep_rate_limits": args.keep_rate_limits,
+    }
+    record = {"commit": git_commit(), "timestamp": time.time(), "python": sys.version.split()[0], "settings": settings, "sites": sites}
+
+    previous = previous_run(settings, args.results)
+    regressions = compare(record, previous, args.tolerance) if previous else []
+    if previous:
+        print(f"\nCompared with {previous.get('commit') or 'unknown commit'}:")
+        for site, metric, old, new in regressions:
+            print(f"  REGRESSION {site} {metric}: {old} -> {new}")
+        if not regressions:
+            print(f"  no regression over {args.tolerance:.0%}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.results), exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as results_file:
+            results_file.write(json.dumps(record) + "\n")
+        print(f"Saved to {args.results}")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
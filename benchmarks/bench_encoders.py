@@ -0,0 +1,64 @@
+"""
+Reports encode time and size per page for every encoder preset.
+
+Run from the repository root:
+    python -m benchmarks.bench_encoders [image ...]
+
+Without arguments a synthetic webtoon-like page is used.
+"""
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from encoders import PRESETS, ENCODERS, encode_to_bytes, resolve_preset
+
+
+# Function to build a page with flat colour, line art and some noisy shading
+def make_page(width=800, height=2000):
+    page = Image.new("RGB", (width, height), (250, 248, 240))
+    shading = Image.effect_noise((width - 80, height // 3), 40).convert("RGB")
+    page.paste(shading, (40, height // 3))
+    draw = ImageDraw.Draw(page)
+    for y in range(60, height, 180):
+        draw.ellipse((80, y, width - 80, y + 120), outline="black", width=4)
+        draw.text((120, y + 50), "Sample dialogue in a speech bubble", fill="black")
+    return page
+
+
+def bench(pages, repeat=3):
+    baseline = {"format": "jpeg", "quality": 100}  # What naverV1/spliceTool wrote before presets
+    presets = [("quality=100 jpeg", baseline)] + list(PRESETS.items())
+
+    print(f"{'preset':<18} {'format':<6} {'ms/page':>9} {'KiB/page':>10}")
+    for name, preset in presets:
+        try:
+            options = resolve_preset(preset)
+        except ValueError as e:
+            print(f"{name:<18} skipped: {e}")
+            continue
+
+        total_time = 0.0
+        total_bytes = 0
+        for page in pages:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = encode_to_bytes(page, preset)
+                best = min(best, time.perf_counter() - start)
+            total_time += best
+            total_bytes += len(data)
+
+        print(
+            f"{name:<18} {options['format']:<6} {total_time / len(pages) * 1000:9.1f} "
+            f"{total_bytes / len(pages) / 1024:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pages = [Image.open(path).convert("RGB") for path in sys.argv[1:]]
+    else:
+        pages = [make_page()]
+    print(f"Available encoders: {', '.join(sorted(ENCODERS))}")
+    bench(pages)
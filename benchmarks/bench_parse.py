@@ -0,0 +1,127 @@
+"""
+Compares ways of extracting chapter links and image URLs from list and
+reader pages: BeautifulSoup's html.parser + soupsieve (what the scripts
+used), lxml on the whole page, and lxml on the spec's scope only.
+
+Run from the repository root:
+    python -m benchmarks.bench_parse [--fixtures DIR] [--sites naver bato] [--repeat 20]
+
+--fixtures takes recorded pages in the layout of benchmarks/fixtures.py
+(<site>/list.html, <site>/chapter.html). Without it, synthetic pages are
+generated and padded with a head, scripts and navigation the size of a
+real site's page.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+import htmlextract
+from benchmarks.fixtures import SITE_TEMPLATES, expand, generate_fixtures
+from sitespecs import SITE_SPECS
+
+
+# Markup surrounding the content on a real page: inline scripts, a style sheet, menus, a footer
+_HEAD = (
+    "<head><meta charset=\"utf-8\"><title>Series</title>"
+    + "".join(f"<script>window.__state{i} = {{\"items\": [{', '.join(str(n) for n in range(300))}]}};</script>" for i in range(20))
+    + "<style>" + "".join(f".c{i} {{ margin: {i}px; color: #{i:06x}; }}" for i in range(1500)) + "</style></head>"
+)
+_NAV = "<nav><ul>" + "".join(f"<li class=\"menu-item\"><a href=\"/genre/{i}\">Genre {i}</a></li>" for i in range(300)) + "</ul></nav>"
+_FOOTER = "<footer>" + "".join(f"<div class=\"related\"><a href=\"/series/{i}\"><img src=\"/cover/{i}.jpg\"></a></div>" for i in range(150)) + "</footer>"
+
+
+def pad(html):
+    head, _, body = html.partition("<body>")
+    return head.replace("<head>", "").rsplit("</head>", 1)[0] + _HEAD + "<body>" + _NAV + body.replace("</body>", _FOOTER + "</body>")
+
+
+def _value(element, attributes):
+    for attribute in attributes:
+        value = element.get(attribute)
+        if value:
+            return value
+    return None
+
+
+def bs4_html_parser(html, selector, scope, attributes):
+    soup = BeautifulSoup(html, "html.parser")
+    return [_value(element, attributes) for element in soupsieve.select(selector, soup)]
+
+
+def lxml_full(html, selector, scope, attributes):
+    tree = htmlextract.parse(html)
+    return [_value(element, attributes) for element in htmlextract.select(tree, selector)]
+
+
+def lxml_scoped(html, selector, scope, attributes):
+    tree = htmlextract.parse(html, scope)
+    return [_value(element, attributes) for element in htmlextract.select(tree, selector)]
+
+
+EXTRACTORS = {"bs4 html.parser": bs4_html_parser, "lxml": lxml_full, "lxml scoped": lxml_scoped}
+
+
+def load_pages(fixtures, sites, synthetic):
+    # Yields (site, "chapters" or "images", html)
+    for site in sites:
+        for kind, name in (("chapters", "list.html"), ("images", "chapter.html")):
+            path = os.path.join(fixtures, site, name)
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as page_file:
+                html = expand(page_file.read(), "https://example.com", site, "1")
+            yield site, kind, pad(html) if synthetic else html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=None, help="Recorded pages (see benchmarks/fixtures.py)")
+    parser.add_argument("--sites", nargs="+", default=sorted(SITE_TEMPLATES))
+    parser.add_argument("--chapters", type=int, default=300, help="Chapter links per synthetic list page")
+    parser.add_argument("--pages", type=int, default=60, help="Images per synthetic reader page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-parse-") as folder:
+        if args.fixtures:
+            pages = list(load_pages(args.fixtures, args.sites, synthetic=False))
+        else:
+            generate_fixtures(folder, chapters=args.chapters, pages=args.pages, image_count=1)
+            pages = list(load_pages(folder, args.sites, synthetic=True))
+
+    print(f"{'site':<12} {'page':<9} {'KiB':>6} " + " ".join(f"{name + ' ms':>18}" for name in EXTRACTORS) + f" {'speedup':>8}")
+    for site, kind, html in pages:
+        spec = SITE_SPECS[site]
+        if kind == "chapters":
+            selector, attributes = spec["chapter_list"], ["href"]
+        else:
+            selector, attributes = spec["images"], spec.get("image_attributes", ["src"])
+        scope = spec.get("scope", {}).get(kind)
+
+        timings = {}
+        results = {}
+        for name, extract in EXTRACTORS.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[name] = extract(html, selector, scope, attributes)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+
+        baseline = results["bs4 html.parser"]
+        mismatched = [name for name, result in results.items() if result != baseline]
+        speedup = timings["bs4 html.parser"] / timings["lxml scoped"]
+        print(
+            f"{site:<12} {kind:<9} {len(html) / 1024:>6.0f} "
+            + " ".join(f"{timings[name] * 1000:>18.2f}" for name in EXTRACTORS)
+            + f" {speedup:>7.1f}x"
+            + (f"  MISMATCH: {', '.join(mismatched)}" if mismatched else f"  ({len(baseline)} matches)")
+        )
+
+
+if __name__ == "__main__":
+    main()
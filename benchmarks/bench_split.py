@@ -0,0 +1,151 @@
+"""
+Compares every split_image implementation in the repo on synthetic strips
+of several sizes, modes and formats: time per strip, peak traced memory and
+bytes written.
+
+Run from the repository root:
+    python -m benchmarks.bench_split [--variants spliceTool naverV1] [--heights 3000 12000]
+                                     [--modes RGB L] [--formats jpeg png] [--repeat 3]
+
+Memory is tracemalloc's peak, which covers Python objects and NumPy arrays
+but not Pillow's own image buffers (those are allocated outside Python).
+Every variant cuts at 2000 px so the output sizes are comparable.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image
+
+from benchmarks.fixtures import make_strip
+
+
+PIECE_HEIGHT = 2000
+FORMATS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+MODES = ("RGB", "RGBA", "P", "L")
+
+
+def _split_image(module):
+    # The common signature: (image_path, output_folder, manga_title, chapter, start_page_index)
+    def run(image_path, output_folder):
+        split = importlib.import_module(module).split_image
+        return split(image_path, output_folder, "bench", 1, 1, piece_height=PIECE_HEIGHT)
+    return run
+
+
+def _remanga(image_path, output_folder):
+    import remanga
+
+    return remanga.split_image(image_path, output_folder, 1, 1, piece_height=PIECE_HEIGHT)
+
+
+def _zbato_static(image_path, output_folder):
+    import zbato
+
+    with Image.open(image_path) as img:
+        return zbato.slice_static_image(img, output_folder, "bench", 1, 1, PIECE_HEIGHT)
+
+
+# Name -> function(image_path, output_folder)
+VARIANTS = {
+    "mangaDownloadCombination": _split_image("mangaDownloadCombination"),
+    "batoV0": _split_image("batoV0"),
+    "bato_ing": _split_image("bato_ing"),
+    "battwo": _split_image("battwo"),
+    "zbato.slice_static_image": _zbato_static,
+    "remanga": _remanga,
+    "naverV0": _split_image("naverV0"),
+    "naverV1": _split_image("naverV1"),
+    "manhuausV0": _split_image("manhuausV0"),
+    "kingofshojo": _split_image("kingofshojo"),
+    "spliceTool": _split_image("spliceTool"),
+}
+
+
+# Function to write a synthetic strip in the given mode and format
+def make_input(folder, height, mode, image_format, width=800):
+    strip = make_strip(height % 97, width=width, height=height)
+    if mode == "P":
+        strip = strip.convert("P", palette=Image.ADAPTIVE)
+    else:
+        strip = strip.convert(mode)
+    path = os.path.join(folder, f"strip-{height}-{mode}{FORMATS[image_format]}")
+    strip.save(path, image_format.upper())
+    return path
+
+
+def _folder_bytes(folder):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names
+    )
+
+
+# Function to run one variant on one strip, returning (seconds, peak bytes, output bytes)
+def measure(variant, image_path, work_folder, repeat):
+    cwd = os.getcwd()
+    times = []
+    try:
+        os.chdir(work_folder)  # Some scripts write relative to the working directory
+        for run in range(-1, repeat + 1):  # A warm-up run (imports...), then an extra traced run for memory
+            with tempfile.TemporaryDirectory(dir=work_folder) as output_folder:
+                traced = run == repeat
+                if traced:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    variant(image_path, output_folder)
+                elapsed = time.perf_counter() - start
+                if traced:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    output_bytes = _folder_bytes(work_folder)  # The output folder plus anything written beside it
+                elif run >= 0:
+                    times.append(elapsed)
+                for name in os.listdir(work_folder):  # Anything written next to the output folder
+                    path = os.path.join(work_folder, name)
+                    if path != output_folder and os.path.isfile(path):
+                        os.remove(path)
+    finally:
+        os.chdir(cwd)
+    return min(times), peak, output_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--heights", nargs="+", type=int, default=[1500, 6000, 20000])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-split-") as folder:
+        print(f"{'variant':<26} {'input':<22} {'ms':>9} {'peak KiB':>10} {'out KiB':>9}")
+        for image_format in args.formats:
+            for mode in args.modes:
+                if image_format == "jpeg" and mode in ("RGBA", "P"):
+                    continue  # JPEG has no alpha or palette
+                for height in args.heights:
+                    image_path = make_input(folder, height, mode, image_format)
+                    label = f"{image_format} {mode} 800x{height}"
+                    work_folder = os.path.join(folder, "work")
+                    os.makedirs(work_folder, exist_ok=True)
+                    for name in args.variants:
+                        try:
+                            seconds, peak, output_bytes = measure(VARIANTS[name], image_path, work_folder, args.repeat)
+                        except Exception as e:
+                            if tracemalloc.is_tracing():
+                                tracemalloc.stop()
+                            print(f"{name:<26} {label:<22} failed: {type(e).__name__}: {e}")
+                            continue
+                        print(f"{name:<26} {label:<22} {seconds * 1000:>9.1f} {peak / 1024:>10.0f} {output_bytes / 1024:>9.0f}")
+                    print()
+
+
+if __name__ == "__main__":
+    main()
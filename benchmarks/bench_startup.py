@@ -0,0 +1,65 @@
+"""
+Measures how long the downloader scripts take to import, using python -X importtime.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [--budget-ms 150] [--runs 5]
+
+Exits with status 1 if a module goes over the budget or pulls in a heavy
+dependency (Selenium, webdriver_manager, PIL, NumPy, bs4) at import time.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+
+MODULES = ["mangaDownloadCombination"]
+HEAVY = ("selenium", "webdriver_manager", "PIL", "numpy", "bs4")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+# Function to import a module in a fresh interpreter and parse the -X importtime report
+def import_profile(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))  # microseconds
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        runs = [import_profile(module) for _ in range(args.runs)]
+        best_ms = min(run[module] for run in runs) / 1000
+        heavy = sorted({name.split(".")[0] for name in runs[0] if name.split(".")[0] in HEAVY})
+        slowest = sorted(
+            ((name, us) for name, us in runs[0].items() if "." not in name and name != module),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:5]
+
+        status = "ok" if best_ms <= args.budget_ms and not heavy else "OVER BUDGET"
+        print(f"{module}: {best_ms:.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+        print(f"  heavy modules imported at startup: {', '.join(heavy) or 'none'}")
+        print("  slowest top-level imports: " + ", ".join(f"{name} {us / 1000:.1f} ms" for name, us in slowest))
+        failed |= status != "ok"
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
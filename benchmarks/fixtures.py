@@ -0,0 +1,219 @@
+"""
+Local HTTP server replaying list pages, reader pages and images for every
+site in sitespecs.SITE_SPECS, with optional latency / bandwidth shaping.
+
+Pages come from <fixtures>/<site>/list.html and <fixtures>/<site>/chapter.html
+(post-JavaScript DOM, as saved from the browser) and images from
+<fixtures>/<site>/images/. In the HTML, "{base}" is replaced by the
+server's URL, "{chapter}" by the requested chapter and "{i}" in
+<!--repeat-->...<!--/repeat--> blocks by 1..N. Without a fixtures folder,
+generate_fixtures() writes synthetic ones matching each site's markup.
+
+    python -m benchmarks.fixtures [--fixtures DIR] [--profile broadband] [--port 8700]
+"""
+import argparse
+import http.server
+import os
+import re
+import socketserver
+import threading
+import time
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageDraw
+
+
+# name -> (latency before the response in seconds, bandwidth per connection in bytes/s or None)
+PROFILES = {
+    "lan": (0.0, None),
+    "broadband": (0.04, 50 * 1024 * 1024 / 8),
+    "mobile": (0.15, 5 * 1024 * 1024 / 8),
+    "slow-cdn": (0.3, 2 * 1024 * 1024),
+}
+
+# Synthetic markup per site, matching the selectors in sitespecs.SITE_SPECS.
+# Image URLs go through wp-content/uploads so kingofshojo's image filter passes.
+_IMAGE = "{base}/{site}/wp-content/uploads/{chapter}/{i}.jpg"
+SITE_TEMPLATES = {
+    "kingofshojo": (
+        '<div class="eplister" id="chapterlist"><ul><!--repeat--><li><a href="{base}/kingofshojo/read/ch-{i}/">Chapter {i}</a></li><!--/repeat--></ul></div>',
+        '<div id="readerarea" class="rdminimal"><!--repeat--><img src="' + _IMAGE + '" alt="{i}"><!--/repeat--></div>',
+    ),
+    "manhuaus": (
+        '<div class="page-content-listing single-page"><ul><!--repeat--><li class="wp-manga-chapter"><a href="{base}/manhuaus/read/chapter-{i}/">Chapter {i}</a></li><!--/repeat--></ul></div>',
+        '<div class="reading-content"><!--repeat--><img class="wp-manga-chapter-img" data-src="' + _IMAGE + '" src="data:,"><!--/repeat--></div>',
+    ),
+    "naver": (
+        '<ul><!--repeat--><li class="EpisodeListList__item--M8zq4"><a href="{base}/naver/read/detail?titleId=1&amp;no={i}"><p class="EpisodeListList__title_area--fTivg"><span class="EpisodeListList__title--lfIzU">{i}화</span></p></a></li><!--/repeat--></ul>',
+        '<div class="wt_viewer"><!--repeat--><img alt="comic content" src="' + _IMAGE + '"><!--/repeat--></div>',
+    ),
+    "bato": (
+        '<div class="main"><!--repeat--><a class="chapt" href="{base}/bato/read/chapter/{i}">Chapter {i}</a><!--/repeat--></div>',
+        '<div id="viewer"><!--repeat--><div class="item"><img src="' + _IMAGE + '"></div><!--/repeat--></div>',
+    ),
+    "battwo": (
+        '<div name="chapter-list"><!--repeat--><a class="link-hover link-primary" href="{base}/battwo/read/ch_{i}">Chapter {i}</a><!--/repeat--></div>',
+        '<div name="image-items"><!--repeat--><div><img src="' + _IMAGE + '"></div><!--/repeat--></div>',
+    ),
+    "zbato": (
+        '<div class="main"><!--repeat--><a class="visited chapt" href="{base}/zbato/read/{i}"><b>Chapter {i}</b></a><!--/repeat--></div>',
+        '<div id="viewer"><!--repeat--><div class="item"><img class="page-img" src="' + _IMAGE + '"></div><!--/repeat--></div>',
+    ),
+    "remanga": (
+        '<div class="Chapters_container__5S4y_"><!--repeat--><a class="Chapters_chapterItem__4Wz_G" href="{base}/remanga/read/{i}"><span class="Chapters_tome__tBNYU">Глава {i}</span></a><!--/repeat--></div>',
+        '<div><!--repeat--><img id="chapter-image" src="' + _IMAGE + '"><!--/repeat--></div>',
+    ),
+}
+
+_PAGE = "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{site}</title></head><body>{body}</body></html>"
+
+
+# Function to draw a webtoon-like strip (flat colour, bubbles, noisy shading)
+def make_strip(seed, width=800, height=6000):
+    strip = Image.new("RGB", (width, height), (250, 248, 240))
+    shading = Image.effect_noise((width - 80, height // 4), 30 + seed % 20).convert("RGB")
+    strip.paste(shading, (40, height // 3))
+    draw = ImageDraw.Draw(strip)
+    for y in range(80 + seed * 7 % 90, height, 400):
+        draw.rectangle((40, y, width - 40, y + 300), outline="black", width=5)
+        draw.ellipse((120, y + 40, width - 120, y + 160), outline="black", width=3, fill="white")
+        draw.text((180, y + 90), f"Page text {seed}-{y}", fill="black")
+    return strip
+
+
+def generate_fixtures(folder, chapters=20, pages=8, image_count=4):
+    """
+    Writes synthetic fixtures for every site in SITE_TEMPLATES: a list page
+    with `chapters` links, a reader page with `pages` images and
+    `image_count` distinct strips that the image URLs cycle through.
+    """
+    for site, (list_body, chapter_body) in SITE_TEMPLATES.items():
+        site_folder = os.path.join(folder, site)
+        os.makedirs(os.path.join(site_folder, "images"), exist_ok=True)
+        for name, body, count in (("list.html", list_body, chapters), ("chapter.html", chapter_body, pages)):
+            with open(os.path.join(site_folder, name), "w", encoding="utf-8") as page_file:
+                page_file.write(f"<!--count:{count}-->" + _PAGE.replace("{body}", body).replace("{site}", site))
+        for index in range(image_count):
+            make_strip(index).save(os.path.join(site_folder, "images", f"{index}.jpg"), quality=85)
+    return folder
+
+
+def expand(template, base, site, chapter="0"):
+    # Fills {base}/{site}/{chapter} and repeats the <!--repeat--> blocks
+    match = re.match(r"<!--count:(\d+)-->", template)
+    count = int(match.group(1)) if match else 1
+    template = template[match.end():] if match else template
+
+    def repeat(block):
+        return "".join(block.group(1).replace("{i}", str(i)) for i in range(1, count + 1))
+
+    html = re.sub(r"<!--repeat-->(.*?)<!--/repeat-->", repeat, template, flags=re.S)
+    return html.replace("{base}", base).replace("{site}", site).replace("{chapter}", chapter)
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like a real CDN
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        segments = parts.path.strip("/").split("/")
+        site = segments[0] if segments else ""
+        site_folder = os.path.join(server.fixtures, site)
+        base = f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+        if len(segments) >= 2 and segments[1] == "series":
+            body = expand(server.read(os.path.join(site_folder, "list.html")).decode("utf-8"), base, site).encode()
+            content_type = "text/html; charset=utf-8"
+        elif len(segments) >= 2 and segments[1] == "read":
+            chapter = re.sub(r"\W+", "_", parts.path + "_" + parts.query).strip("_")
+            html = server.read(os.path.join(site_folder, "chapter.html")).decode("utf-8")
+            body = expand(html, base, site, chapter).encode()
+            content_type = "text/html; charset=utf-8"
+        elif "wp-content" in segments or "images" in segments:
+            images = server.images(site_folder)
+            if not images:
+                self.send_error(404)
+                return
+            index = int(re.sub(r"\D", "", segments[-1]) or 0)
+            body = images[index % len(images)]
+            content_type = "image/jpeg"
+        else:
+            self.send_error(404)
+            return
+
+        latency, bandwidth = server.profile
+        if latency:
+            time.sleep(latency)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")  # Every run downloads for real
+        self.end_headers()
+
+        chunk_size = 64 * 1024
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset:offset + chunk_size]
+            self.wfile.write(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+        with server.lock:
+            server.bytes_served += len(body)
+            server.requests_served += 1
+
+
+class FixtureServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fixtures, profile="lan", port=0):
+        super().__init__(("127.0.0.1", port), FixtureHandler)
+        self.fixtures = fixtures
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.lock = threading.Lock()
+        self.bytes_served = 0
+        self.requests_served = 0
+        self._files = {}
+        self._images = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def read(self, path):
+        if path not in self._files:
+            with open(path, "rb") as fixture_file:
+                self._files[path] = fixture_file.read()
+        return self._files[path]
+
+    def images(self, site_folder):
+        if site_folder not in self._images:
+            folder = os.path.join(site_folder, "images")
+            names = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+            self._images[site_folder] = [self.read(os.path.join(folder, name)) for name in names]
+        return self._images[site_folder]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Serve site fixtures locally.")
+    parser.add_argument("--fixtures", default=None, help="Fixtures folder (default: generate synthetic ones)")
+    parser.add_argument("--profile", default="lan", choices=sorted(PROFILES))
+    parser.add_argument("--port", type=int, default=8700)
+    args = parser.parse_args()
+
+    fixtures = args.fixtures or generate_fixtures(tempfile.mkdtemp(prefix="manga-fixtures-"))
+    server = FixtureServer(fixtures, args.profile, args.port)
+    print(f"Serving {fixtures} on {server.url} ({args.profile})")
+    for site in sorted(os.listdir(fixtures)):
+        print(f"  {server.url}/{site}/series/")
+    server.serve_forever()
@@ -0,0 +1,592 @@
+import argparse
+import collections
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import metrics
+
+
+# Queues a job can be routed to; a worker only pops the ones it is capable of:
+#   render - pages that need headless Chrome (RAM-heavy nodes)
+#   http   - plain HTTP scraping, image downloads and slicing (CPU/bandwidth nodes)
+QUEUE_PREFIX = "manga:"
+CAPABILITIES = ("render", "http")
+FAILED_QUEUE = QUEUE_PREFIX + "failed"
+
+# A popped job sits in <queue>:processing:<worker> until the worker acks it.
+# Workers refresh manga:alive:<worker> every WORKER_TTL / 3 seconds; the jobs
+# of a worker whose key has expired (crashed, killed, lost its node) are
+# pushed back to their queue by the next sweep.
+WORKERS_SET = QUEUE_PREFIX + "workers"
+WORKER_TTL = 60
+SWEEP_INTERVAL = 30
+
+
+def processing_list(queue, worker):
+    return f"{queue}:processing:{worker}"
+
+
+def _alive_key(worker):
+    return f"{QUEUE_PREFIX}alive:{worker}"
+
+
+class _ReliableQueues:
+    """
+    Reliable pop / ack / sweep on top of a few Redis list and set commands
+    (LMOVE, BLMOVE, LREM, SADD, SREM, SMEMBERS, SET EX, EXISTS), which the
+    brokers below implement.
+    """
+
+    def push(self, queue, message):
+        self.lpush(queue, json.dumps(message))
+
+    def pop(self, queues, worker, timeout=5):
+        """
+        Moves the oldest job of the first non-empty queue into this worker's
+        processing list.
+
+        Returns:
+            tuple or None: (queue, message, receipt); pass the receipt to ack().
+        """
+        for queue in queues:
+            data = self.lmove(queue, processing_list(queue, worker), "RIGHT", "LEFT")
+            if data is not None:
+                return queue, json.loads(data), data
+        # Nothing waiting: block on each queue in turn for a share of the timeout
+        for queue in queues:
+            data = self.lmove(queue, processing_list(queue, worker), "RIGHT", "LEFT", timeout / len(queues))
+            if data is not None:
+                return queue, json.loads(data), data
+        return None
+
+    def ack(self, queue, worker, receipt):
+        # The job is finished (done, or re-pushed for a retry): drop it from the processing list
+        self.lrem(processing_list(queue, worker), 1, receipt)
+
+    def register(self, worker):
+        self.sadd(WORKERS_SET, worker)
+        self.heartbeat(worker)
+
+    def heartbeat(self, worker):
+        self.set_ex(_alive_key(worker), WORKER_TTL, "1")
+
+    def unregister(self, worker):
+        self.requeue(worker)
+        self.srem(WORKERS_SET, worker)
+
+    def requeue(self, worker):
+        """
+        Pushes a worker's unacknowledged jobs back to the front of their queues.
+
+        Returns:
+            int: Jobs requeued.
+        """
+        count = 0
+        for capability in CAPABILITIES:
+            queue = queue_for(capability)
+            # Newest first to the consuming end, so the oldest is popped first again
+            while self.lmove(processing_list(queue, worker), queue, "LEFT", "RIGHT") is not None:
+                count += 1
+        return count
+
+    def sweep(self):
+        """
+        Requeues the jobs of every registered worker that stopped heartbeating.
+
+        Returns:
+            int: Jobs requeued.
+        """
+        count = 0
+        for worker in self.smembers(WORKERS_SET):
+            if not self.exists(_alive_key(worker)):
+                requeued = self.requeue(worker)
+                self.srem(WORKERS_SET, worker)
+                if requeued:
+                    print(f"Requeued {requeued} job(s) of unresponsive worker {worker}")
+                count += requeued
+        return count
+
+
+class LocalBroker(_ReliableQueues):
+    """
+    In-process broker with the same interface as RedisBroker, for tests and
+    single-machine runs. Also backs BrokerServer.
+    """
+
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)  # Left = LPUSH end, right = consuming end
+        self.sets = collections.defaultdict(set)
+        self.expiry = {}  # key -> monotonic deadline
+        self.condition = threading.Condition()
+
+    def clone(self):
+        return self  # Thread-safe already
+
+    def lpush(self, queue, *values):
+        with self.condition:
+            self.queues[queue].extendleft(values)
+            self.condition.notify_all()
+            return len(self.queues[queue])
+
+    def rpush(self, queue, *values):
+        with self.condition:
+            self.queues[queue].extend(values)
+            self.condition.notify_all()
+            return len(self.queues[queue])
+
+    def lmove(self, source, destination, wherefrom, whereto, timeout=None):
+        """
+        Redis LMOVE, or BLMOVE when `timeout` is given (0 = wait forever).
+
+        Returns:
+            str or None: The moved element.
+        """
+        deadline = None if not timeout else time.monotonic() + timeout
+        with self.condition:
+            while not self.queues[source]:
+                if timeout is None:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            data = self.queues[source].pop() if wherefrom == "RIGHT" else self.queues[source].popleft()
+            if whereto == "LEFT":
+                self.queues[destination].appendleft(data)
+            else:
+                self.queues[destination].append(data)
+            self.condition.notify_all()
+            return data
+
+    def lrem(self, queue, count, value):
+        with self.condition:
+            removed = 0
+            while removed < count and value in self.queues[queue]:
+                self.queues[queue].remove(value)
+                removed += 1
+            return removed
+
+    def length(self, queue):
+        with self.condition:
+            return len(self.queues[queue])
+
+    def sadd(self, key, member):
+        with self.condition:
+            added = member not in self.sets[key]
+            self.sets[key].add(member)
+            return int(added)
+
+    def srem(self, key, member):
+        with self.condition:
+            removed = member in self.sets[key]
+            self.sets[key].discard(member)
+            return int(removed)
+
+    def smembers(self, key):
+        with self.condition:
+            return sorted(self.sets[key])
+
+    def set_ex(self, key, seconds, value):
+        with self.condition:
+            self.expiry[key] = time.monotonic() + seconds
+
+    def exists(self, key):
+        with self.condition:
+            return int(self.expiry.get(key, 0) > time.monotonic())
+
+
+def _encode_command(*args):
+    # RESP array of bulk strings
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def _read_reply(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Broker closed the connection")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b"+":
+        return rest.decode()
+    if prefix == b"-":
+        raise RuntimeError(rest.decode())
+    if prefix == b":":
+        return int(rest)
+    if prefix == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)[:-2]
+        return data
+    if prefix == b"*":
+        count = int(rest)
+        if count < 0:
+            return None
+        return [_read_reply(stream) for _ in range(count)]
+    raise RuntimeError(f"Unexpected reply from broker: {line!r}")
+
+
+# Commands that leave the same state when sent twice; only these are resent after a reconnect
+_IDEMPOTENT = frozenset(("PING", "LLEN", "SADD", "SREM", "SMEMBERS", "SET", "EXISTS"))
+
+
+class RedisBroker(_ReliableQueues):
+    """
+    Broker client speaking the Redis protocol, so it works against a real
+    Redis server (6.2+, for LMOVE / BLMOVE) or against `python broker.py serve`.
+    No redis package needed.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379):
+        self.address = (host, port)
+        self._connect()
+
+    def _connect(self):
+        self.sock = socket.create_connection(self.address, timeout=None)
+        self.stream = self.sock.makefile("rb")
+
+    def _call(self, *args):
+        try:
+            self.sock.sendall(_encode_command(*args))
+            return _read_reply(self.stream)
+        except (ConnectionError, OSError):
+            self._connect()  # One reconnect, e.g. after the broker restarted
+            if args[0] not in _IDEMPOTENT:
+                # The command may have run before the connection dropped (a resent
+                # LPUSH would queue the job twice): let the caller decide
+                raise
+            self.sock.sendall(_encode_command(*args))
+            return _read_reply(self.stream)
+
+    def clone(self):
+        # A second connection, for another thread (one socket can't be shared)
+        return RedisBroker(*self.address)
+
+    def lpush(self, queue, *values):
+        return self._call("LPUSH", queue, *values)
+
+    def lmove(self, source, destination, wherefrom, whereto, timeout=None):
+        if timeout is None:
+            reply = self._call("LMOVE", source, destination, wherefrom, whereto)
+        else:
+            reply = self._call("BLMOVE", source, destination, wherefrom, whereto, f"{max(0.1, timeout):.3f}")
+        return reply.decode("utf-8") if reply is not None else None
+
+    def lrem(self, queue, count, value):
+        return self._call("LREM", queue, count, value)
+
+    def length(self, queue):
+        return self._call("LLEN", queue)
+
+    def sadd(self, key, member):
+        return self._call("SADD", key, member)
+
+    def srem(self, key, member):
+        return self._call("SREM", key, member)
+
+    def smembers(self, key):
+        return sorted(member.decode("utf-8") for member in self._call("SMEMBERS", key))
+
+    def set_ex(self, key, seconds, value):
+        return self._call("SET", key, value, "EX", seconds)
+
+    def exists(self, key):
+        return self._call("EXISTS", key)
+
+
+def connect(url):
+    """
+    Returns a broker for "redis://host:port", "tcp://host:port" or "local".
+    """
+    if url == "local":
+        return LocalBroker()
+    parts = urlsplit(url)
+    if parts.scheme not in ("redis", "tcp"):
+        raise ValueError(f"Unsupported broker URL {url!r}")
+    return RedisBroker(parts.hostname or "127.0.0.1", parts.port or 6379)
+
+
+def _reply(value):
+    # Python value -> RESP reply
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, (list, tuple)):
+        return _encode_command(*value)
+    return _encode_command(value)[len(b"*1\r\n"):]  # A single bulk string
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    # Serves the RESP subset RedisBroker uses, backed by the server's LocalBroker
+
+    def handle(self):
+        broker = self.server.broker
+        while True:
+            try:
+                command = _read_reply(self.rfile)
+            except (ConnectionError, OSError):
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(b"-ERR expected a command array\r\n")
+                continue
+
+            name = command[0].decode().upper()
+            args = [arg.decode("utf-8") for arg in command[1:]]
+            if name == "PING":
+                self.wfile.write(b"+PONG\r\n")
+            elif name == "LPUSH":
+                self.wfile.write(_reply(broker.lpush(args[0], *args[1:])))
+            elif name == "RPUSH":
+                self.wfile.write(_reply(broker.rpush(args[0], *args[1:])))
+            elif name == "LLEN":
+                self.wfile.write(_reply(broker.length(args[0])))
+            elif name == "LMOVE":
+                self.wfile.write(_reply(broker.lmove(*args[:4])))
+            elif name == "BLMOVE":
+                self.wfile.write(_reply(broker.lmove(*args[:4], float(args[4]))))
+            elif name == "LREM":
+                self.wfile.write(_reply(broker.lrem(args[0], int(args[1]), args[2])))
+            elif name == "SADD":
+                self.wfile.write(_reply(sum(broker.sadd(args[0], member) for member in args[1:])))
+            elif name == "SREM":
+                self.wfile.write(_reply(sum(broker.srem(args[0], member) for member in args[1:])))
+            elif name == "SMEMBERS":
+                self.wfile.write(_reply(broker.smembers(args[0])))
+            elif name == "SET" and len(args) == 4 and args[2].upper() == "EX":
+                broker.set_ex(args[0], int(args[3]), args[1])
+                self.wfile.write(b"+OK\r\n")
+            elif name == "EXISTS":
+                self.wfile.write(_reply(broker.exists(args[0])))
+            else:
+                self.wfile.write(f"-ERR unknown command {name}\r\n".encode())
+
+
+class BrokerServer(socketserver.ThreadingTCPServer):
+    """
+    Stand-alone TCP broker for clusters without Redis (queues live in memory).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _BrokerHandler)
+        self.broker = LocalBroker()
+
+
+def queue_for(capability):
+    return QUEUE_PREFIX + capability
+
+
+# Function to queue a whole series on the broker
+def submit_series(broker, site, url, manga_title, start=1, end=None, piece_height=2000, preset=None):
+    from sitespecs import extractor_for
+
+    extractor = extractor_for(site)
+    job = {
+        "kind": "series",
+        "site": site,
+        "url": url,
+        "manga_title": manga_title,
+        "start": start,
+        "end": end,
+        "piece_height": piece_height,
+        "preset": preset,
+        "attempts": 0,
+    }
+    broker.push(queue_for("render" if "chapters" in extractor.render else "http"), job)
+
+
+def run_job(job, fetcher, broker, output_root, store=None):
+    """
+    Runs one job and pushes its follow-up jobs:
+        series   -> one chapter job per chapter (render or http queue, per the site spec)
+        chapter  -> one download job with the chapter's image URLs (http queue)
+        download -> images fetched and split into output_root (nothing queued)
+    """
+    from sitespecs import extractor_for
+
+    extractor = extractor_for(job["site"])
+    with metrics.labels(site=job["site"], series=job["manga_title"], chapter=job.get("chapter_number")):
+        _run_job(job, extractor, fetcher, broker, output_root, store)
+
+
+def _run_job(job, extractor, fetcher, broker, output_root, store):
+    import httpcache
+    from sitespecs import USER_AGENT
+
+    if job["kind"] == "series":
+        with metrics.stage("list_scrape"):
+            html = fetcher.fetch(job["url"], "chapters" in extractor.render, extractor.wait)
+            chapters = extractor.chapters(html, job["url"])[job["start"] - 1:job["end"]]
+        queue = queue_for("render" if "images" in extractor.render else "http")
+        for chapter_number, chapter_url in chapters:
+            broker.push(queue, dict(job, kind="chapter", url=chapter_url, chapter_number=chapter_number, attempts=0))
+        print(f"{job['manga_title']}: {len(chapters)} chapters queued")
+
+    elif job["kind"] == "chapter":
+        html = fetcher.fetch(job["url"], "images" in extractor.render, extractor.wait)
+        image_urls = extractor.images(html, job["url"])
+        if not image_urls:
+            raise ValueError(f"No images found for Chapter {job['chapter_number']}")
+        broker.push(queue_for("http"), dict(job, kind="download", image_urls=image_urls, attempts=0))
+
+    elif job["kind"] == "download":
+        from spliceTool import split_image
+
+        headers = {"User-Agent": USER_AGENT}
+        if extractor.referer:
+            headers["Referer"] = job["url"]
+        os.makedirs(output_root, exist_ok=True)
+        page_index = 1
+        with tempfile.TemporaryDirectory(prefix="manga-worker-") as download_folder:
+            for image_index, image_url in enumerate(job["image_urls"], start=1):
+                response = httpcache.get(image_url, headers=headers, timeout=10)
+                response.raise_for_status()
+                extension = os.path.splitext(image_url.split("?")[0])[1].lower() or ".jpg"
+                image_path = os.path.join(download_folder, f"{image_index:04}{extension}")
+                with open(image_path, "wb") as image_file:
+                    image_file.write(response.content)
+                page_index = split_image(
+                    image_path, output_root, job["manga_title"], job["chapter_number"], page_index,
+                    piece_height=job["piece_height"], preset=job["preset"], store=store
+                )
+        print(f"{job['manga_title']} chapter {job['chapter_number']}: {page_index - 1} pages")
+
+    else:
+        raise ValueError(f"Unknown job kind {job['kind']!r}")
+
+
+class _Heartbeat:
+    """
+    Keeps a worker's alive key fresh from a background thread, on its own
+    broker connection, while the worker is busy with long jobs.
+    """
+
+    def __init__(self, broker, worker):
+        self.broker = broker.clone()
+        self.worker = worker
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(WORKER_TTL / 3):
+            try:
+                self.broker.heartbeat(self.worker)
+            except (ConnectionError, OSError, RuntimeError) as e:
+                print(f"Heartbeat for {self.worker} failed: {e}")
+
+    def __enter__(self):
+        self.broker.register(self.worker)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+# Function to pull jobs for this node's capabilities until stopped (or idle, with idle_timeout)
+def run_worker(broker, output_root, capabilities=CAPABILITIES, store_root=None, max_attempts=3, idle_timeout=None):
+    from sitespecs import PageFetcher
+
+    store = None
+    if store_root:
+        from castore import ImageStore
+
+        store = ImageStore(store_root)
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    queues = [queue_for(capability) for capability in CAPABILITIES if capability in capabilities]
+    broker.sweep()
+    last_sweep = idle_since = time.monotonic()
+    with _Heartbeat(broker, worker), PageFetcher() as fetcher:
+        try:
+            while True:
+                popped = broker.pop(queues, worker, timeout=5)
+                if popped is None:
+                    if time.monotonic() - last_sweep >= SWEEP_INTERVAL:
+                        broker.sweep()
+                        last_sweep = time.monotonic()
+                    if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                        return
+                    continue
+
+                queue, job, receipt = popped
+                try:
+                    run_job(job, fetcher, broker, output_root, store)
+                except Exception as e:
+                    job["attempts"] += 1
+                    job["error"] = str(e)
+                    retry = job["attempts"] < max_attempts
+                    broker.push(queue if retry else FAILED_QUEUE, job)
+                    print(f"{job['kind']} job {job['url']} {'will be retried' if retry else 'failed'}: {e}")
+                # Only now is the job safe elsewhere (its output written, or its retry queued)
+                broker.ack(queue, worker, receipt)
+                idle_since = time.monotonic()
+        finally:
+            # Anything still unacknowledged (e.g. Ctrl+C mid-job) goes back to its queue
+            broker.unregister(worker)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-node workers pulling jobs from a shared broker.")
+    parser.add_argument("--broker", default="redis://127.0.0.1:6379", help="redis://host:port or tcp://host:port")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run a stand-alone broker (no Redis needed)")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=6379)
+
+    submit_parser = commands.add_parser("submit", help="Queue a series")
+    submit_parser.add_argument("site", help="Site name from sitespecs.SITE_SPECS")
+    submit_parser.add_argument("manga_url")
+    submit_parser.add_argument("manga_title")
+    submit_parser.add_argument("--start", type=int, default=1)
+    submit_parser.add_argument("--end", type=int, default=None)
+    submit_parser.add_argument("--height", type=int, default=2000)
+    submit_parser.add_argument("--preset", default=None)
+
+    work_parser = commands.add_parser("work", help="Pull and run jobs")
+    work_parser.add_argument("output_root", help="Shared output folder (NFS, SMB...) every worker writes to")
+    work_parser.add_argument(
+        "--capabilities", default="render,http",
+        help="Comma-separated: render (has Chrome), http (downloads and slicing)"
+    )
+    work_parser.add_argument("--store", default=None, help="Shared content-addressed store root (see castore.py)")
+    work_parser.add_argument("--idle-timeout", type=float, default=None, help="Exit after this many idle seconds")
+
+    commands.add_parser("status", help="Show queue lengths")
+    commands.add_parser("sweep", help="Requeue the jobs of workers that stopped heartbeating")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        with BrokerServer((args.host, args.port)) as server:
+            print(f"Broker listening on {args.host}:{args.port}")
+            server.serve_forever()
+    else:
+        broker = connect(args.broker)
+        if args.command == "submit":
+            submit_series(broker, args.site, args.manga_url, args.manga_title, args.start, args.end, args.height, args.preset)
+        elif args.command == "status":
+            for capability in CAPABILITIES:
+                print(f"{queue_for(capability):<14} {broker.length(queue_for(capability))}")
+            print(f"{FAILED_QUEUE:<14} {broker.length(FAILED_QUEUE)}")
+        elif args.command == "sweep":
+            print(f"{broker.sweep()} job(s) requeued")
+        elif args.command == "work":
+            capabilities = [capability.strip() for capability in args.capabilities.split(",") if capability.strip()]
+            unknown = set(capabilities) - set(CAPABILITIES)
+            if unknown:
+                parser.error(f"Unknown capabilities: {', '.join(sorted(unknown))}")
+            run_worker(broker, args.output_root, capabilities, args.store, idle_timeout=args.idle_timeout)
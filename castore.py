@@ -0,0 +1,155 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+FICLONE = 0x40049409  # ioctl from <linux/fs.h>: share all extents of another file (btrfs, xfs, ...)
+
+
+class ImageStore:
+    """
+    Content-addressed store for downloaded originals and produced slices.
+
+    Every blob is kept once under objects/<2 hex>/<2 hex>/<sha256>, no matter
+    how many series or mirrors (bato, battwo, zbato...) it shows up in.
+    Output trees are materialised from the store with hardlinks, falling back
+    to reflinks / copy_file_range and only then to a byte copy.
+
+    Files in the output tree may be hardlinks into the store: replace them,
+    never edit them in place.
+
+    Originals stored with put_file() are only kept when they can be
+    reflinked (free on btrfs / xfs); with copy_originals=True they are byte
+    copied elsewhere, which costs their size again on disk.
+    """
+
+    def __init__(self, root, copy_originals=False):
+        self.root = root
+        self.copy_originals = copy_originals
+        self.objects = os.path.join(root, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:4], digest)
+
+    def _publish(self, tmp_path, digest):
+        object_path = self.path_for(digest)
+        if os.path.exists(object_path):
+            os.remove(tmp_path)  # Already stored, drop the duplicate
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_path, object_path)
+        return digest
+
+    def put_bytes(self, data):
+        """
+        Stores a blob and returns its SHA-256 hex digest.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if os.path.exists(self.path_for(digest)):
+            return digest
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.chmod(tmp_path, 0o444)  # Shared by every hardlinked output
+        return self._publish(tmp_path, digest)
+
+    def put_file(self, path, copy=None):
+        """
+        Stores an existing file (e.g. a downloaded original) and returns its digest.
+
+        The file is hashed in chunks and reflinked into the store when the
+        filesystem allows it, never hardlinked: the caller still owns the
+        original and may rewrite it in place, which must not change the blob.
+
+        Args:
+            path (str): File to store.
+            copy (bool): Byte copy the file when it can't be reflinked;
+                None uses the store's copy_originals.
+
+        Returns:
+            str or None: The digest, or None when the file would have had
+            to be copied and copying is off.
+        """
+        copy = self.copy_originals if copy is None else copy
+        digest_builder = hashlib.sha256()
+        with open(path, "rb") as source_file:
+            for chunk in iter(lambda: source_file.read(1024 * 1024), b""):
+                digest_builder.update(chunk)
+        digest = digest_builder.hexdigest()
+        object_path = self.path_for(digest)
+        if os.path.exists(object_path):
+            return digest
+
+        tmp_path = os.path.join(self.objects, f".tmp-{digest}-{os.getpid()}")
+        if self._clone(path, tmp_path, hardlink=False, copy=copy) is None:
+            return None
+        os.chmod(tmp_path, 0o444)  # Shared by every hardlinked output
+        return self._publish(tmp_path, digest)
+
+    def materialize(self, digest, destination):
+        """
+        Makes `destination` hold the blob `digest` without copying bytes
+        where the filesystem allows it.
+
+        Returns:
+            str: "hardlink", "reflink", "copy_file_range" or "copy".
+        """
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        tmp_path = f"{destination}.tmp-{os.getpid()}"
+        method = self._clone(self.path_for(digest), tmp_path)
+        os.replace(tmp_path, destination)  # Atomically replaces any previous output
+        return method
+
+    def _clone(self, source, destination, hardlink=True, copy=True):
+        if hardlink:
+            try:
+                os.link(source, destination)
+                return "hardlink"
+            except OSError:
+                pass  # Different filesystem, or links not supported
+
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            try:
+                fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+                return "reflink"
+            except OSError:
+                if not copy:
+                    destination_file.close()
+                    os.remove(destination)
+                    return None
+
+            size = os.fstat(source_file.fileno()).st_size
+            try:
+                copied = 0
+                while copied < size:
+                    written = os.copy_file_range(source_file.fileno(), destination_file.fileno(), size - copied)
+                    if written == 0:
+                        break
+                    copied += written
+                if copied == size:
+                    return "copy_file_range"
+            except (AttributeError, OSError):
+                pass  # Not Linux, or an old kernel
+
+            source_file.seek(0)
+            destination_file.seek(0)
+            destination_file.truncate()
+            shutil.copyfileobj(source_file, destination_file)
+            return "copy"
+
+    def usage(self):
+        """
+        Returns:
+            tuple: (number of stored blobs, total bytes).
+        """
+        count = 0
+        total = 0
+        for root, _, files in os.walk(self.objects):
+            for file_name in files:
+                if not file_name.startswith(".tmp-"):
+                    count += 1
+                    total += os.path.getsize(os.path.join(root, file_name))
+        return count, total
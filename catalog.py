@@ -0,0 +1,92 @@
+import re
+import threading
+
+
+_NUMBER = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+# Function to read a chapter number ("12", "12.5", "12화", "Chapter 7") once, at discovery time
+def parse_number(text):
+    match = _NUMBER.search(text or "")
+    if not match:
+        return None
+    value = match.group(1)
+    return float(value) if "." in value else int(value)
+
+
+class Chapter:
+    """
+    One chapter of a series. `order` sorts chapters in reading order when
+    the number alone can't (specials, extras, site-specific episode ids).
+    """
+
+    __slots__ = ("number", "title", "url", "order")
+
+    def __init__(self, number, title, url, order=None):
+        self.number = number
+        self.title = title
+        self.url = url
+        self.order = order if order is not None else number
+
+    def __repr__(self):
+        return f"Chapter({self.number!r}, {self.title!r}, {self.url!r}, order={self.order!r})"
+
+
+class ChapterCatalog:
+    """
+    The chapters of one series, indexed by number (O(1) lookup) and listed
+    in reading order. Safe to share between threads: adding takes a lock,
+    and listing works on a snapshot.
+
+    Usage:
+        catalog = ChapterCatalog("Weapon creater")
+        catalog.add(parse_number(title), title, url)
+        for chapter in catalog:
+            download(chapter.number, chapter.url)
+    """
+
+    def __init__(self, manga_title):
+        self.manga_title = manga_title
+        self._by_number = {}
+        self._ordered = None  # Cached reading order, rebuilt after an add
+        self._lock = threading.Lock()
+
+    def add(self, number, title, url, order=None):
+        """
+        Adds a chapter unless one with the same number is already there
+        (the same chapter listed on two pages).
+
+        Returns:
+            Chapter: The chapter stored under `number`.
+        """
+        with self._lock:
+            chapter = self._by_number.get(number)
+            if chapter is None:
+                chapter = self._by_number[number] = Chapter(number, title, url, order)
+                self._ordered = None
+            return chapter
+
+    def get(self, number, default=None):
+        return self._by_number.get(number, default)
+
+    def __getitem__(self, number):
+        return self._by_number[number]
+
+    def __contains__(self, number):
+        return number in self._by_number
+
+    def __len__(self):
+        return len(self._by_number)
+
+    def chapters(self):
+        """
+        Returns:
+            tuple: Chapters in reading order (a snapshot; later adds don't change it).
+        """
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = tuple(sorted(self._by_number.values(), key=lambda chapter: (chapter.order, chapter.number)))
+            return self._ordered
+
+    def __iter__(self):
+        return iter(self.chapters())
@@ -0,0 +1,158 @@
+import argparse
+import io
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from natsort import natsorted
+from PIL import Image
+
+from encoders import encode_image, extension_for
+
+
+class CbzWriter:
+    """
+    Streams pages straight into a CBZ (a ZIP of images) without writing any
+    loose files. Entries are stored, not deflated: the images are already
+    compressed, so recompressing them only costs CPU.
+
+    ComicInfo.xml is written last, when the page count is known, and the
+    archive is only moved into place once it is complete.
+
+    Usage:
+        with CbzWriter("chapter_12.cbz", series="Get Schooled", number=12) as cbz:
+            cbz.add_page(piece)
+    """
+
+    def __init__(self, path, series=None, number=None, title=None, volume=None, web=None):
+        self.path = path
+        self.metadata = {"Series": series, "Number": number, "Title": title, "Volume": volume, "Web": web}
+        self.pages = []  # (entry name, width, height, size in bytes)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._tmp_path = path + ".tmp"
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", compression=zipfile.ZIP_STORED)
+
+    def add_bytes(self, name, data, width=None, height=None):
+        self._zip.writestr(name, data)
+        self.pages.append((name, width, height, len(data)))
+        return name
+
+    def add_page(self, img, preset=None, file_extension=".jpg"):
+        """
+        Encodes a page and appends it as page_NNNN.<ext>.
+
+        Args:
+            img (PIL.Image.Image): The page.
+            preset (str): Encoder preset (see encoders.PRESETS); None saves in
+                the format matching file_extension at full quality.
+            file_extension (str): Format to use when preset is None.
+        """
+        buffer = io.BytesIO()
+        if preset is None:
+            img_format = Image.registered_extensions().get(file_extension, "JPEG")
+            if img_format == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(buffer, img_format, quality=100)
+        else:
+            file_extension = extension_for(preset)
+            encode_image(img, buffer, preset)
+
+        name = f"page_{len(self.pages) + 1:04}{file_extension}"
+        return self.add_bytes(name, buffer.getvalue(), img.width, img.height)
+
+    def comic_info(self):
+        lines = ['<?xml version="1.0" encoding="utf-8"?>', "<ComicInfo>"]
+        for key, value in self.metadata.items():
+            if value is not None:
+                lines.append(f"  <{key}>{escape(str(value))}</{key}>")
+        lines.append(f"  <PageCount>{len(self.pages)}</PageCount>")
+        lines.append("  <Pages>")
+        for index, (_, width, height, size) in enumerate(self.pages):
+            attributes = f'Image="{index}" ImageSize="{size}"'
+            if width is not None:
+                attributes += f' ImageWidth="{width}" ImageHeight="{height}"'
+            lines.append(f"    <Page {attributes} />")
+        lines.append("  </Pages>")
+        lines.append("</ComicInfo>")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self._zip.writestr("ComicInfo.xml", self.comic_info())
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._zip.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# Function to pack chapter CBZs into per-volume CBZs (chapter_N/page_NNNN.ext inside)
+def pack_volumes(series_folder, chapters_per_volume, remove_chapters=False):
+    """
+    Groups a series' chapter CBZs into volume_NN.cbz archives.
+
+    Page bytes are copied as-is (stored entries, no decode or recompression).
+
+    Returns:
+        list: Paths of the volume archives written.
+    """
+    chapter_paths = natsorted(
+        os.path.join(series_folder, name)
+        for name in os.listdir(series_folder)
+        if name.endswith(".cbz") and not name.startswith("volume_")
+    )
+    series = os.path.basename(os.path.normpath(series_folder))
+
+    volume_paths = []
+    for start in range(0, len(chapter_paths), chapters_per_volume):
+        volume_number = start // chapters_per_volume + 1
+        volume_path = os.path.join(series_folder, f"volume_{volume_number:02}.cbz")
+        with CbzWriter(volume_path, series=series, volume=volume_number) as volume:
+            for chapter_path in chapter_paths[start:start + chapters_per_volume]:
+                chapter_name = os.path.splitext(os.path.basename(chapter_path))[0]
+                with zipfile.ZipFile(chapter_path) as chapter:
+                    page_sizes = _page_sizes(chapter)
+                    pages = [info for info in chapter.infolist() if info.filename != "ComicInfo.xml"]
+                    for page_index, info in enumerate(pages):
+                        width, height = page_sizes.get(page_index, (None, None))
+                        volume.add_bytes(f"{chapter_name}/{info.filename}", chapter.read(info), width, height)
+        volume_paths.append(volume_path)
+        print(f"Packed: {volume_path}")
+
+        if remove_chapters:
+            for chapter_path in chapter_paths[start:start + chapters_per_volume]:
+                os.remove(chapter_path)
+
+    return volume_paths
+
+
+def _page_sizes(chapter):
+    # Page index -> (width, height) from the chapter's ComicInfo.xml, if present
+    try:
+        comic_info = chapter.read("ComicInfo.xml").decode("utf-8")
+    except KeyError:
+        return {}
+    sizes = {}
+    for match in re.finditer(r'<Page Image="(\d+)"[^>]*?ImageWidth="(\d+)" ImageHeight="(\d+)"', comic_info):
+        sizes[int(match.group(1))] = (int(match.group(2)), int(match.group(3)))
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack chapter CBZs into per-volume CBZs.")
+    parser.add_argument("series_folder")
+    parser.add_argument("--chapters-per-volume", type=int, default=10)
+    parser.add_argument("--remove-chapters", action="store_true", help="Delete chapter CBZs once packed")
+    args = parser.parse_args()
+
+    pack_volumes(args.series_folder, args.chapters_per_volume, args.remove_chapters)
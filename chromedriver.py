@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+# Explicit driver binary; skips detection and the cache entirely (air-gapped nodes)
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH")
+CACHE_FILE = os.environ.get(
+    "MANGA_CHROMEDRIVER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "manga_download", "chromedriver.json"),
+)
+
+# Browser binaries tried, in order, to find the installed Chrome version
+_CHROME_BINARIES = (
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+)
+
+_resolved = {}  # Chrome major version -> driver path, for this process
+
+
+# Function to read the installed Chrome's major version, e.g. "126"
+@functools.lru_cache(maxsize=None)
+def chrome_version():
+    candidates = [os.environ["CHROME_BINARY"]] if os.environ.get("CHROME_BINARY") else list(_CHROME_BINARIES)
+    for binary in candidates:
+        path = binary if os.path.isabs(binary) else shutil.which(binary)
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"(\d+)\.\d+\.\d+", output)
+        if match:
+            return match.group(1)
+
+    if sys.platform == "win32":
+        try:
+            import winreg
+
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Google\Chrome\BLBeacon") as key:
+                return winreg.QueryValueEx(key, "version")[0].split(".")[0]
+        except OSError:
+            pass
+    return None
+
+
+def _load_cache():
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(CACHE_FILE), prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+        json.dump(cache, tmp_file, indent=2)
+    os.replace(tmp_path, CACHE_FILE)
+
+
+# Function used by every Selenium script in place of ChromeDriverManager().install()
+def driver_path():
+    """
+    Resolves the chromedriver binary once and reuses it offline afterwards.
+
+    Order:
+        1. CHROMEDRIVER_PATH from the environment.
+        2. The driver already resolved by this process.
+        3. The on-disk cache entry for the installed Chrome's major version.
+        4. webdriver_manager (network), whose result is then cached.
+        5. A chromedriver found on PATH.
+
+    Returns:
+        str: Path to a chromedriver executable.
+    """
+    if CHROMEDRIVER_PATH:
+        return CHROMEDRIVER_PATH
+
+    version = chrome_version() or "unknown"
+    if version in _resolved:
+        return _resolved[version]
+
+    cache = _load_cache()
+    cached = cache.get(version)
+    if cached and os.access(cached, os.X_OK):
+        _resolved[version] = cached
+        return cached
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        path = ChromeDriverManager().install()
+    except Exception as e:  # No network, no webdriver_manager, unknown Chrome...
+        path = shutil.which("chromedriver")
+        if path is None:
+            raise RuntimeError(
+                f"Could not resolve chromedriver for Chrome {version} ({e}). "
+                "Set CHROMEDRIVER_PATH to a driver binary."
+            ) from e
+        print(f"webdriver_manager failed ({e}), using {path}")
+
+    cache[version] = path
+    _save_cache(cache)
+    _resolved[version] = path
+    return path
+
+
+if __name__ == "__main__":
+    print(f"Chrome version: {chrome_version() or 'not found'}")
+    print(f"chromedriver: {driver_path()}")
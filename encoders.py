@@ -0,0 +1,131 @@
+import io
+
+from PIL import features
+
+
+# Encoders take (img, fp, options) and write one encoded image to fp.
+# New formats can be plugged in with register_encoder().
+ENCODERS = {}
+EXTENSIONS = {}
+
+
+def register_encoder(name, extension, encode_func):
+    ENCODERS[name] = encode_func
+    EXTENSIONS[name] = extension
+
+
+def _flatten(img, keep_alpha):
+    # Drop palettes/alpha that the target format can't hold
+    if img.mode == "P":
+        img = img.convert("RGBA" if keep_alpha and "transparency" in img.info else "RGB")
+    if img.mode in ("RGBA", "LA") and not keep_alpha:
+        img = img.convert("RGB" if img.mode == "RGBA" else "L")
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGB")
+    return img
+
+
+def encode_jpeg(img, fp, options):
+    img = _flatten(img, keep_alpha=False)
+    img.save(
+        fp,
+        "JPEG",
+        quality=options.get("quality", 90),
+        progressive=options.get("progressive", False),
+        optimize=options.get("optimize", False),
+        subsampling=options.get("subsampling", -1),
+    )
+
+
+def encode_png(img, fp, options):
+    img.save(fp, "PNG", compress_level=options.get("compress_level", 6), optimize=options.get("optimize", False))
+
+
+def encode_webp(img, fp, options):
+    img = _flatten(img, keep_alpha=True)
+    img.save(
+        fp,
+        "WEBP",
+        quality=options.get("quality", 85),
+        lossless=options.get("lossless", False),
+        method=options.get("method", 4),
+    )
+
+
+def encode_avif(img, fp, options):
+    img = _flatten(img, keep_alpha=True)
+    img.save(fp, "AVIF", quality=options.get("quality", 60), speed=options.get("speed", 6))
+
+
+def _avif_supported():
+    try:
+        return features.check_module("avif")  # Pillow >= 11.2 built with libavif
+    except ValueError:  # Older Pillow doesn't know the module at all
+        return False
+
+
+register_encoder("jpeg", ".jpg", encode_jpeg)
+register_encoder("png", ".png", encode_png)
+register_encoder("webp", ".webp", encode_webp)
+if _avif_supported():
+    register_encoder("avif", ".avif", encode_avif)
+
+
+# Named presets. "fallback" is used when the preferred format isn't available
+# in this Pillow build.
+PRESETS = {
+    # Lossless, for long-term storage
+    "archive": {"format": "png", "compress_level": 9},
+    # Small files that still look good on phones/tablets
+    "reader": {"format": "webp", "quality": 82, "method": 4},
+    # Smallest files; falls back to WebP where AVIF isn't supported
+    "compact": {"format": "avif", "quality": 55, "speed": 6, "fallback": "reader"},
+    # Grayscale progressive JPEG for e-readers (most can't show WebP)
+    "e-ink": {"format": "jpeg", "quality": 75, "progressive": True, "optimize": True, "grayscale": True},
+}
+
+
+def resolve_preset(preset):
+    """
+    Returns the options dict for a preset name (or an options dict as-is),
+    following fallbacks for formats this Pillow build can't write.
+    """
+    options = PRESETS[preset] if isinstance(preset, str) else preset
+    while options["format"] not in ENCODERS:
+        if "fallback" not in options:
+            raise ValueError(f"No encoder available for format {options['format']!r}")
+        options = resolve_preset(options["fallback"])
+    return options
+
+
+def extension_for(preset):
+    return EXTENSIONS[resolve_preset(preset)["format"]]
+
+
+def encode_image(img, fp, preset):
+    """
+    Encodes a PIL image into the file object (or path) `fp` using a preset.
+    """
+    options = resolve_preset(preset)
+    if options.get("grayscale") and img.mode not in ("L", "LA"):
+        img = img.convert("L")
+    ENCODERS[options["format"]](img, fp, options)
+
+
+def encode_to_bytes(img, preset):
+    buffer = io.BytesIO()
+    encode_image(img, buffer, preset)
+    return buffer.getvalue()
+
+
+def save_image(img, output_path_without_ext, preset):
+    """
+    Saves an image with the extension matching the preset's format.
+
+    Returns:
+        str: The path that was written.
+    """
+    output_path = output_path_without_ext + extension_for(preset)
+    with open(output_path, "wb") as output_file:
+        encode_image(img, output_file, preset)
+    return output_path
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+
+# (connect, read) timeouts in seconds for every request; no call may hang forever
+CONNECT_TIMEOUT = float(os.environ.get("MANGA_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("MANGA_READ_TIMEOUT", "30"))
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+RETRIES = int(os.environ.get("MANGA_RETRIES", "4"))  # Extra attempts after the first
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Circuit breaker: after this many consecutive failures a host is skipped for
+# BREAKER_COOLDOWN seconds (doubling while it keeps failing, up to BREAKER_MAX_COOLDOWN)
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+
+FAILED_PAGES_FILE = os.environ.get("MANGA_FAILED_PAGES", "failed_pages.jsonl")
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of contacting a host whose circuit breaker is open.
+    Subclasses requests.ConnectionError so existing handlers catch it.
+    """
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"{host} is failing, skipped for another {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: closed (normal) -> open (every call fails fast) ->
+    half-open (one trial request) -> closed again on success.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+        self.open_until = 0.0
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.failures < BREAKER_THRESHOLD:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+
+    def before_request(self):
+        """
+        Returns:
+            bool: True if this request is the half-open trial; the caller must
+                then call end_trial() once it's over, whatever the outcome.
+        """
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_running):
+                raise CircuitOpenError(self.host, max(0.0, self.open_until - time.monotonic()))
+            if state == "half-open":
+                self.trial_running = True
+                return True
+            return False
+
+    def end_trial(self):
+        # A trial that ended without a verdict (429, non-transient error): let the next request try
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.cooldown = BREAKER_COOLDOWN
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            if self.trial_running:
+                self.cooldown = min(BREAKER_MAX_COOLDOWN, self.cooldown * 2)  # Still down after the pause
+                self.trial_running = False
+            self.failures += 1
+            if self.failures >= BREAKER_THRESHOLD:
+                self.open_until = time.monotonic() + self.cooldown
+                print(f"Circuit open for {self.host}: pausing it for {self.cooldown:.0f}s")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url):
+    host = urlsplit(url).netloc.lower()
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def backoff(attempt, retry_after=None):
+    # "Full jitter" exponential backoff; honours a numeric Retry-After if it's longer
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, min(BACKOFF_CAP, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+
+# Function wrapping one network request with retries and the host's circuit breaker
+def call(url, send, retries=RETRIES):
+    """
+    Runs send() (which performs one request for `url` and returns the
+    response) until it succeeds, retrying transient errors and 429/5xx
+    responses with jittered exponential backoff.
+
+    Returns:
+        The last response; a retryable status is returned as-is once retries run out.
+
+    Raises:
+        CircuitOpenError: The host is paused after repeated failures.
+        requests.RequestException: A non-transient error, or a transient one on the last attempt.
+    """
+    breaker = breaker_for(url)
+    for attempt in range(retries + 1):
+        trial = breaker.before_request()
+        retry_after = None
+        try:
+            response = send()
+        except TRANSIENT_ERRORS:
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+            if response.status_code >= 500:
+                breaker.record_failure()  # 429 is the rate limiter's business, not a dead host
+            if attempt == retries:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            response.close()  # Hands a stream=True connection back to the pool
+        finally:
+            if trial:
+                breaker.end_trial()
+        time.sleep(backoff(attempt, retry_after))
+
+
+_session = None
+
+
+# Function to fetch an HTML page (not cached) under the fetch policy
+def get(url, headers=None, timeout=None, session=None, stream=False):
+    # stream=True returns once the headers arrive; read the body with iter_content() and close the response
+    global _session
+    if session is None:
+        if _session is None:
+            _session = requests.Session()
+        session = _session
+    return call(url, lambda: session.get(url, headers=headers, timeout=timeout or TIMEOUT, stream=stream))
+
+
+_failed_lock = threading.Lock()
+
+
+# Function to record a page that could not be downloaded, for a targeted re-fetch later
+def record_failure(url, error, **context):
+    """
+    Appends the page to FAILED_PAGES_FILE (JSON lines). Pass whatever
+    identifies the page: chapter_number, page, chapter_url (sent as Referer
+    on re-fetch), path (where the image should be written).
+    """
+    record = dict(context, url=url, error=str(error), failed_at=time.time())
+    with _failed_lock, open(FAILED_PAGES_FILE, "a", encoding="utf-8") as failed_file:
+        failed_file.write(json.dumps(record) + "\n")
+
+
+def load_failures(path=FAILED_PAGES_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as failed_file:
+        return [json.loads(line) for line in failed_file if line.strip()]
+
+
+# Function to retry every recorded failure; pages that still fail stay in the file
+def refetch(path=FAILED_PAGES_FILE, output_folder="refetched"):
+    import httpcache
+
+    remaining = []
+    records = load_failures(path)
+    for record in records:
+        headers = {"Referer": record["chapter_url"]} if record.get("chapter_url") else None
+        try:
+            response = httpcache.get(record["url"], headers=headers)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            remaining.append(dict(record, error=str(e), failed_at=time.time()))
+            continue
+
+        output_path = record.get("path")
+        if not output_path:
+            extension = os.path.splitext(urlsplit(record["url"]).path)[1] or ".jpg"
+            chapter = record.get("chapter_number", "unknown")
+            page = record.get("page", len(os.listdir(output_folder)) if os.path.isdir(output_folder) else 0)
+            output_path = os.path.join(output_folder, f"chapter_{chapter}", f"page_{page}{extension}")
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "wb") as image_file:
+            image_file.write(response.content)
+        print(f"Re-fetched: {output_path}")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as failed_file:
+        for record in remaining:
+            failed_file.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, path)
+    print(f"{len(records) - len(remaining)} re-fetched, {len(remaining)} still failing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-fetch the pages recorded in a failed-pages file.")
+    parser.add_argument("failed_pages", nargs="?", default=FAILED_PAGES_FILE)
+    parser.add_argument("--output", default="refetched", help="Folder for records without a path")
+    args = parser.parse_args()
+
+    refetch(args.failed_pages, args.output)
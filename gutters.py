@@ -0,0 +1,93 @@
+import numpy as np
+from PIL import Image
+
+
+# Rows are scored on a narrow grayscale copy, wide enough to see speech
+# bubbles and panel borders but cheap to hold for very tall strips.
+SCAN_WIDTH = 256
+
+
+def row_scores(img, scan_width=SCAN_WIDTH):
+    """
+    Scores every row of an image by how "busy" it is.
+
+    A gutter (blank space between panels) is a row of almost uniform colour,
+    so its standard deviation across the width is close to zero. The whole
+    strip is scored in one vectorised pass.
+
+    Args:
+        img (PIL.Image.Image): The image to scan.
+        scan_width (int): Width the grayscale copy is reduced to before scoring.
+
+    Returns:
+        numpy.ndarray: One float32 score per row (0 = perfectly flat).
+    """
+    gray = img.convert("L")
+    if gray.width > scan_width:
+        gray = gray.resize((scan_width, gray.height), Image.BOX)
+    rows = np.asarray(gray, dtype=np.float32)
+    return rows.std(axis=1)
+
+
+def find_cut_points(img, piece_height, tolerance=200, threshold=4.0, scores=None):
+    """
+    Finds where to cut a tall strip so that cuts land in whitespace gutters.
+
+    For every target line (previous cut + piece_height) the rows inside
+    [target - tolerance, target + tolerance] are searched. Among the flat rows
+    (score <= threshold) the one closest to the target wins; if the window has
+    no gutter at all the cut falls back to the fixed target line.
+
+    Args:
+        img (PIL.Image.Image): The image to be cut.
+        piece_height (int): Desired height of each piece in pixels.
+        tolerance (int): How far (in pixels) a cut may move from its target.
+        threshold (float): Maximum row score that still counts as a gutter.
+        scores (numpy.ndarray): Precomputed `row_scores`, to avoid rescanning.
+
+    Returns:
+        list: Y coordinates of the cuts, not including 0 and the image height.
+    """
+    img_height = img.height
+    if img_height <= piece_height:
+        return []
+    if scores is None:
+        scores = row_scores(img)
+    tolerance = max(0, min(tolerance, piece_height // 2))
+
+    cuts = []
+    last_cut = 0
+    while img_height - last_cut > piece_height:
+        target = last_cut + piece_height
+        low = max(last_cut + 1, target - tolerance)
+        high = min(img_height - 1, target + tolerance)
+        window = scores[low:high + 1]
+
+        gutter_rows = np.flatnonzero(window <= threshold)
+        if gutter_rows.size:
+            offsets = gutter_rows + low
+            cut = int(offsets[np.argmin(np.abs(offsets - target))])
+        else:
+            cut = target
+
+        cuts.append(cut)
+        last_cut = cut
+
+    return cuts
+
+
+def cut_boxes(img, piece_height, tolerance=None, threshold=4.0):
+    """
+    Returns the crop boxes used to split an image into pieces.
+
+    With `tolerance` set to None this is the plain fixed-height cutter (full
+    pieces followed by the remainder); otherwise cuts snap to gutters.
+    """
+    img_width, img_height = img.size
+    if tolerance is None:
+        cuts = list(range(piece_height, img_height, piece_height))
+    else:
+        cuts = find_cut_points(img, piece_height, tolerance=tolerance, threshold=threshold)
+
+    edges = [0] + cuts + [img_height]
+    return [(0, top, img_width, bottom) for top, bottom in zip(edges, edges[1:])]
@@ -0,0 +1,241 @@
+import functools
+import html as html_module
+import re
+
+import lxml.html
+from lxml import etree
+
+
+# CSS -> XPath for the selector subset the site specs use: tag, *, #id, .class,
+# [attr], [attr=v], [attr*=v], [attr^=v], [attr$=v], descendant and ">" combinators,
+# "," groups. With the cssselect package installed, it translates instead (full CSS 3).
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<combinator>>)
+      | (?P<comma>,)
+      | (?P<tag>[a-zA-Z][\w-]*|\*)
+      | \#(?P<id>[\w-]+)
+      | \.(?P<class>[\w-]+)
+      | \[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[\w-]+))\s*)?\]
+    )""",
+    re.VERBOSE,
+)
+
+
+def _literal(value):
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    raise ValueError(f"Can't quote {value!r} in XPath")
+
+
+def _condition(match):
+    if match.group("id"):
+        return f"@id={_literal(match.group('id'))}"
+    if match.group("class"):
+        return f"contains(concat(' ', normalize-space(@class), ' '), {_literal(' ' + match.group('class') + ' ')})"
+    name = match.group("attr")
+    op = match.group("op")
+    if not op:
+        return f"@{name}"
+    value = _literal(next(v for v in (match.group("dq"), match.group("sq"), match.group("bare")) if v is not None))
+    return {
+        "=": f"@{name}={value}",
+        "*=": f"contains(@{name}, {value})",
+        "^=": f"starts-with(@{name}, {value})",
+        "$=": f"substring(@{name}, string-length(@{name}) - string-length({value}) + 1)={value}",
+    }[op]
+
+
+def _translate(selector):
+    paths = []
+    path, axis, tag, conditions = "", "descendant-or-self::", None, []
+    selector = selector.strip()
+    position = 0
+
+    def finish_step():
+        nonlocal path, tag, conditions
+        if tag is None and not conditions:
+            raise ValueError(f"Empty step in CSS selector {selector!r}")
+        path += axis + (tag or "*") + "".join(f"[{condition}]" for condition in conditions)
+        tag, conditions = None, []
+
+    while position < len(selector):
+        match = _TOKEN.match(selector, position)
+        if not match:
+            raise ValueError(f"Unsupported CSS selector {selector!r} (install cssselect for full CSS)")
+        whitespace_before = match.group(0)[0].isspace()
+        position = match.end()
+
+        if match.group("comma"):
+            finish_step()
+            paths.append(path)
+            path, axis = "", "descendant-or-self::"
+        elif match.group("combinator"):
+            finish_step()
+            axis = "/"
+        else:
+            if whitespace_before and (tag is not None or conditions):
+                finish_step()  # Descendant combinator
+                axis = "/descendant::"
+            if match.group("tag"):
+                if tag is not None or conditions:
+                    raise ValueError(f"Unsupported CSS selector {selector!r}")
+                tag = match.group("tag").lower()
+            else:
+                conditions.append(_condition(match))
+    finish_step()
+    paths.append(path)
+    return " | ".join(paths)
+
+
+def css_to_xpath(selector):
+    """
+    Returns:
+        str: An XPath expression selecting what the CSS selector selects.
+
+    Raises:
+        ValueError: The selector uses CSS beyond the supported subset (and cssselect isn't installed).
+    """
+    try:
+        from cssselect import HTMLTranslator
+    except ImportError:
+        return _translate(selector)
+    return HTMLTranslator().css_to_xpath(selector)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_selector(expression):
+    """
+    Compiles a CSS selector, or an XPath expression prefixed with "xpath:",
+    into a callable returning the matches in a parsed tree.
+    """
+    if expression.startswith("xpath:"):
+        return etree.XPath(expression[len("xpath:"):])
+    return etree.XPath(css_to_xpath(expression))
+
+
+def subtree(html, scope):
+    """
+    Cuts the HTML down to the part a selector needs: from the tag containing
+    `scope` (plain text such as 'id="chapterlist"') to the end of the page.
+    The head, scripts and navigation before it are never parsed. Returns the
+    whole page when `scope` is empty or not found.
+    """
+    if not scope:
+        return html
+    index = html.find(scope)
+    if index == -1:
+        return html
+    start = html.rfind("<", 0, index)
+    return html[start:] if start != -1 else html
+
+
+def parse(html, scope=None):
+    """
+    Parses (part of) a page with lxml's C parser. The result always has
+    <html><body> around the content, so selectors match the same way for a
+    whole page and for a subtree.
+    """
+    html = subtree(html, scope)
+    if not html.strip():
+        html = "<html></html>"
+    return lxml.html.document_fromstring(html)
+
+
+def select(tree, expression):
+    return compile_selector(expression)(tree)
+
+
+def text(element):
+    # XPath may return plain strings (text() or @attr results)
+    if isinstance(element, str):
+        return element.strip()
+    return element.text_content().strip()
+
+
+_IMG_TAG = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=None)
+def _attribute_pattern(name):
+    return re.compile(r"\s" + re.escape(name) + r"""\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+
+
+def tag_attribute(tag, name):
+    # An attribute of a single tag's source, entities decoded; None if absent
+    match = _attribute_pattern(name).search(tag)
+    if not match:
+        return None
+    return html_module.unescape(next(value for value in match.groups() if value is not None))
+
+
+class ImageStream:
+    """
+    Pulls image URLs out of HTML as it arrives, chunk by chunk, with regexes
+    and no tree. Only complete <img> tags are read: a tag cut between two
+    chunks is kept until the next one, so memory stays at about one chunk.
+
+    Usage:
+        stream = ImageStream(["data-src", "src"], tag_filter="wp-manga-chapter-img")
+        for chunk in chunks:
+            for url in stream.feed(chunk):
+                ...
+    """
+
+    def __init__(self, attributes=("src",), tag_filter=None, scope=None):
+        """
+        Args:
+            attributes (list): Attributes holding the URL, first non-empty wins.
+            tag_filter (str): Regex the whole <img ...> tag must match (e.g. a class name).
+            scope (str): Text marking where the images start (see subtree());
+                tags before it are skipped. Nothing is found if it never appears.
+        """
+        self.attributes = list(attributes)
+        self.tag_filter = re.compile(tag_filter) if tag_filter else None
+        self.scope = scope
+        self.in_scope = not scope
+        self.buffer = ""
+
+    def feed(self, text):
+        """
+        Returns:
+            list: URLs (as written in the page) of the <img> tags completed by this chunk.
+        """
+        self.buffer += text
+        if not self.in_scope:
+            index = self.buffer.find(self.scope)
+            if index == -1:
+                self.buffer = self.buffer[-len(self.scope):]  # May end with the start of the marker
+                return []
+            self.in_scope = True
+            self.buffer = self.buffer[index:]
+
+        urls = []
+        end = 0
+        for match in _IMG_TAG.finditer(self.buffer):
+            end = match.end()
+            tag = match.group(0)
+            if self.tag_filter is not None and not self.tag_filter.search(tag):
+                continue
+            for attribute in self.attributes:
+                value = tag_attribute(tag, attribute)
+                if value and value.strip():
+                    urls.append(value.strip())
+                    break
+
+        rest = self.buffer[end:]
+        start = rest.rfind("<")
+        self.buffer = rest[start:] if start != -1 and ">" not in rest[start:] else ""
+        return urls
+
+
+def stream_image_urls(chunks, attributes=("src",), tag_filter=None, scope=None):
+    """
+    Yields image URLs from an iterable of HTML text chunks as soon as each
+    <img> tag is complete (see ImageStream).
+    """
+    stream = ImageStream(attributes, tag_filter, scope)
+    for chunk in chunks:
+        yield from stream.feed(chunk)
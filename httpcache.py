@@ -0,0 +1,271 @@
+import email.utils
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import fetchpolicy
+import metrics
+import ratelimit
+
+
+# Cache settings, overridable from the environment so every site script picks them up
+CACHE_DIR = os.environ.get(
+    "MANGA_HTTP_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "manga_download", "http")
+)
+CACHE_MAX_BYTES = int(os.environ.get("MANGA_HTTP_CACHE_MAX_MB", "10240")) * 1024 * 1024
+# Treat every cached response as fresh for this many seconds, whatever its
+# headers say (e.g. 31536000 to reprocess a series fully offline). Unset =
+# honour Cache-Control / Expires and revalidate with ETag / Last-Modified.
+CACHE_TTL = float(os.environ["MANGA_HTTP_CACHE_TTL"]) if os.environ.get("MANGA_HTTP_CACHE_TTL") else None
+
+# Response headers kept with the cached body
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date")
+
+
+def canonical_url(url):
+    """
+    Normalises a URL so trivially different spellings share a cache entry:
+    lower-case scheme/host, default ports dropped, query sorted, no fragment.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+class CachedResponse:
+    """
+    The parts of requests.Response the site scripts use, for both cached and
+    freshly fetched responses.
+    """
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def _freshness_lifetime(headers):
+    # Seconds the response may be served without revalidation, per RFC 9111
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return int(match.group(1))
+    if headers.get("Expires"):
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+            date = email.utils.parsedate_to_datetime(headers["Date"]).timestamp() if headers.get("Date") else time.time()
+            return max(0, expires - date)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+def _write_atomic(path, data, mode):
+    # Readers in other threads see the old file or the new one, never a partial write
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, mode) as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
+
+
+class HttpCache:
+    """
+    Disk-backed, size-bounded HTTP cache for image downloads.
+
+    Entries live in <directory>/<ab>/<sha256 of canonical URL>.{body,json}.
+    A hit refreshes the body's mtime, and when the cache grows past max_bytes
+    the least recently used entries are evicted first.
+
+    Safe to share between threads: files are replaced atomically, the size
+    bookkeeping and eviction run under a lock, and each thread gets its own
+    requests.Session.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._size = None  # Computed lazily on the first store
+        self._lock = threading.RLock()  # Guards _size and eviction
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _paths(self, url):
+        key = hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".body", base + ".json"
+
+    def _load(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            with open(body_path, "rb") as body_file:
+                content = body_file.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, content
+
+    def _store(self, url, response):
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if response.status_code != 200 or "no-store" in cache_control:
+            return
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+
+        meta = {
+            "url": url,
+            "status_code": response.status_code,
+            "headers": {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers},
+            "stored_at": time.time(),
+        }
+        with self._lock:
+            old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            _write_atomic(body_path, response.content, "wb")
+            _write_atomic(meta_path, json.dumps(meta), "w")
+
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(response.content) - old_size
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def _touch(self, url, meta=None):
+        body_path, meta_path = self._paths(url)
+        if meta is not None:
+            _write_atomic(meta_path, json.dumps(meta), "w")
+        try:
+            os.utime(body_path)  # mtime doubles as the LRU timestamp
+        except OSError:
+            pass
+
+    def _bodies(self):
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith(".body"):
+                    path = os.path.join(root, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._bodies())
+
+    def evict(self, target_ratio=0.9):
+        """
+        Removes least recently used entries until the cache is below
+        target_ratio * max_bytes.
+        """
+        with self._lock:
+            bodies = sorted(self._bodies(), key=lambda item: item[1].st_mtime)
+            size = sum(stat.st_size for _, stat in bodies)
+            target = self.max_bytes * target_ratio
+            for body_path, stat in bodies:
+                if size <= target:
+                    break
+                for path in (body_path, body_path[:-len(".body")] + ".json"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                size -= stat.st_size
+            self._size = size
+
+    def get(self, url, headers=None, timeout=None, ttl=None):
+        """
+        Fetches a URL through the cache.
+
+        Args:
+            url (str): URL to fetch.
+            headers (dict): Extra request headers (User-Agent, Referer...).
+            timeout: Passed to requests; None uses fetchpolicy.TIMEOUT.
+            ttl (float): Overrides the cache's TTL for this request.
+
+        Returns:
+            CachedResponse
+        """
+        ttl = self.ttl if ttl is None else ttl
+        meta, content = self._load(url)
+
+        request_headers = dict(headers or {})
+        if meta is not None:
+            age = time.time() - meta["stored_at"]
+            lifetime = ttl if ttl is not None else _freshness_lifetime(meta["headers"])
+            if age < lifetime:
+                self._touch(url)
+                return CachedResponse(url, meta["status_code"], meta["headers"], content, from_cache=True)
+
+            # Stale: ask the server whether our copy is still good
+            if "ETag" in meta["headers"]:
+                request_headers["If-None-Match"] = meta["headers"]["ETag"]
+            if "Last-Modified" in meta["headers"]:
+                request_headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        def send():
+            with ratelimit.limiter.slot(url) as slot:  # Per-host AIMD rate / concurrency limits
+                response = self.session.get(url, headers=request_headers, timeout=timeout or fetchpolicy.TIMEOUT)
+                slot.record(response)
+            return response
+
+        # Retries, backoff and the host's circuit breaker (see fetchpolicy.py)
+        with metrics.stage("fetch"):
+            response = fetchpolicy.call(url, send)
+
+        if response.status_code == 304 and meta is not None:
+            meta["stored_at"] = time.time()
+            meta["headers"].update({name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers})
+            self._touch(url, meta)
+            return CachedResponse(url, meta["status_code"], meta["headers"], content, from_cache=True)
+
+        self._store(url, response)
+        return CachedResponse(url, response.status_code, dict(response.headers), response.content)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+# Function used by the site scripts in place of requests.get for image downloads
+def get(url, headers=None, timeout=None, ttl=None):
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = HttpCache()
+    return _default_cache.get(url, headers=headers, timeout=timeout, ttl=ttl)
@@ -0,0 +1,97 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+
+
+# Event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class Inotify:
+    """
+    Minimal ctypes wrapper around Linux inotify (no third-party packages).
+
+    Usage:
+        notifier = Inotify()
+        notifier.add_watch("downloads", IN_CREATE | IN_CLOSE_WRITE)
+        for path, name, mask in notifier.read_events(timeout=1.0):
+            ...
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("inotify needs Linux (libc not found)")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.paths = {}  # watch descriptor -> directory path
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self.paths[wd] = path
+        return wd
+
+    def read_events(self, timeout=None):
+        """
+        Waits up to `timeout` seconds and returns the pending events.
+
+        Returns:
+            list: (watched directory, file name, mask) tuples.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+
+            path = self.paths.get(wd)
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)  # Watched directory was removed
+                continue
+            if path is not None:
+                events.append((path, os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
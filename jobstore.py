@@ -0,0 +1,423 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+
+from natsort import natsorted
+
+import metrics
+
+
+# Job kinds, in the order a series is worked through:
+#   series   - scrape the chapter list, queue one chapter job per chapter
+#   chapter  - scrape the chapter page, queue one page job per image
+#   page     - download one original image
+#   assemble - split a chapter's downloaded originals into output pages
+#              (queued automatically once all its page jobs are done)
+KINDS = ("series", "chapter", "page", "assemble")
+STATES = ("queued", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    job_key TEXT NOT NULL UNIQUE,
+    parent_id INTEGER REFERENCES jobs(id),
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, kind, id);
+CREATE INDEX IF NOT EXISTS jobs_parent ON jobs (parent_id, state);
+"""
+
+# Deeper kinds first, so a run finishes chapters before starting new ones
+_CLAIM_ORDER = "CASE kind WHEN 'assemble' THEN 0 WHEN 'page' THEN 1 WHEN 'chapter' THEN 2 ELSE 3 END"
+
+
+class JobStore:
+    """
+    SQLite table of series / chapter / page jobs for crash-safe batch runs.
+
+    Jobs are claimed inside BEGIN IMMEDIATE transactions, so any number of
+    worker processes can share one database. A claim is a lease, renewed
+    while the job runs (see Heartbeat): if the worker dies, the job is
+    handed out again once the lease runs out, so a kill at any moment only
+    loses the pages that were in flight. A job whose lease has expired
+    max_attempts times is marked failed instead of being handed out again.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def enqueue(self, kind, job_key, payload, parent_id=None):
+        """
+        Queues a job unless one with the same key exists (re-running a batch
+        never duplicates work).
+
+        Returns:
+            int: The job id, new or existing.
+        """
+        self.db.execute(
+            "INSERT OR IGNORE INTO jobs (kind, job_key, parent_id, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, job_key, parent_id, json.dumps(payload), time.time()),
+        )
+        return self.db.execute("SELECT id FROM jobs WHERE job_key = ?", (job_key,)).fetchone()["id"]
+
+    def claim(self, kinds=KINDS):
+        """
+        Marks the next queued (or lease-expired) job as running for this worker.
+
+        Returns:
+            sqlite3.Row or None: The claimed job, as updated (attempts counts this run).
+        """
+        now = time.time()
+        placeholders = ", ".join("?" for _ in kinds)
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # A job that keeps killing its worker would otherwise come back forever
+            self.db.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= ?",
+                (f"Lease expired {self.max_attempts} times (worker killed?)", now, now, self.max_attempts),
+            )
+            job = self.db.execute(
+                f"SELECT * FROM jobs WHERE kind IN ({placeholders}) "
+                "AND (state = 'queued' OR (state = 'running' AND lease_until < ?)) "
+                f"ORDER BY {_CLAIM_ORDER}, id LIMIT 1",
+                (*kinds, now),
+            ).fetchone()
+            if job is not None:
+                self.db.execute(
+                    "UPDATE jobs SET state = 'running', worker = ?, lease_until = ?, started_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (self.worker, now + self.lease_seconds, now, job["id"]),
+                )
+                job = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return job
+
+    def renew(self, job):
+        """
+        Extends the lease of a job this worker is running.
+
+        Returns:
+            bool: False if the job is no longer this worker's (its lease ran out and it was reclaimed).
+        """
+        return self.db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND state = 'running' AND worker = ?",
+            (time.time() + self.lease_seconds, job["id"], self.worker),
+        ).rowcount == 1
+
+    def complete(self, job, children=()):
+        """
+        Marks a job done and queues its children (kind, key, payload) in the
+        same transaction. When the last page of a chapter finishes, the
+        chapter's assemble job is queued too.
+        """
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for kind, job_key, payload in children:
+                self.enqueue(kind, job_key, payload, job["id"])
+            self.db.execute(
+                "UPDATE jobs SET state = 'done', finished_at = ?, lease_until = NULL, error = NULL WHERE id = ?",
+                (time.time(), job["id"]),
+            )
+            if job["kind"] == "page":
+                self._queue_assemble_if_ready(job["parent_id"])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def _queue_assemble_if_ready(self, chapter_id):
+        pending = self.db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE parent_id = ? AND kind = 'page' AND state != 'done'", (chapter_id,)
+        ).fetchone()[0]
+        if pending == 0:
+            chapter = self.db.execute("SELECT * FROM jobs WHERE id = ?", (chapter_id,)).fetchone()
+            self.enqueue("assemble", f"assemble:{chapter['job_key']}", json.loads(chapter["payload"]), chapter_id)
+
+    def fail(self, job, error):
+        """
+        Requeues a job after an error, or marks it failed once it has used
+        up max_attempts.
+        """
+        state = "failed" if job["attempts"] >= self.max_attempts else "queued"
+        self.db.execute(
+            "UPDATE jobs SET state = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+            (state, str(error), time.time(), job["id"]),
+        )
+        return state
+
+    def active(self):
+        # Jobs queued or running: other workers may still queue children
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running')").fetchone()[0]
+
+    def retry_failed(self):
+        return self.db.execute("UPDATE jobs SET state = 'queued', attempts = 0 WHERE state = 'failed'").rowcount
+
+    def stats(self):
+        """
+        Returns:
+            list: (kind, state, count, average seconds of finished jobs) rows.
+        """
+        return self.db.execute(
+            "SELECT kind, state, COUNT(*) AS count, AVG(finished_at - started_at) AS seconds "
+            "FROM jobs GROUP BY kind, state ORDER BY kind, state"
+        ).fetchall()
+
+
+class Heartbeat:
+    """
+    Renews a claimed job's lease every lease_seconds / 3 while the job runs,
+    so Selenium scrapes or big assembles can outlast one lease. Uses its
+    own connection (sqlite3 connections stay in the thread that made them).
+
+    Usage:
+        with Heartbeat(store, job):
+            run_job(job, fetcher)
+    """
+
+    def __init__(self, store, job):
+        self.store = store
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._renew, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def _renew(self):
+        with JobStore(self.store.path, self.store.lease_seconds, self.store.max_attempts) as store:
+            store.worker = self.store.worker
+            while not self.stopped.wait(self.store.lease_seconds / 3):
+                try:
+                    if not store.renew(self.job):
+                        print(f"{self.job['kind']} job {self.job['id']} lost its lease")
+                        return
+                except sqlite3.OperationalError as e:  # Busy database: try again next beat
+                    print(f"Could not renew the lease of job {self.job['id']}: {e}")
+
+
+def originals_folder(payload):
+    title = payload["manga_title"].lower().replace(" ", "_")
+    return os.path.join(payload["output_folder"], ".originals", title, f"chapter_{payload['chapter_number']}")
+
+
+# Function to run one claimed job; returns the children to queue
+def run_job(job, fetcher):
+    from sitespecs import extractor_for
+
+    payload = json.loads(job["payload"])
+    extractor = extractor_for(payload["site"])
+    with metrics.labels(site=payload["site"], series=payload["manga_title"], chapter=payload.get("chapter_number")):
+        return _run_job(job["kind"], payload, extractor, fetcher)
+
+
+def _run_job(kind, payload, extractor, fetcher):
+    import httpcache
+    from sitespecs import USER_AGENT
+
+    if kind == "series":
+        with metrics.stage("list_scrape"):
+            html = fetcher.fetch(payload["url"], "chapters" in extractor.render, extractor.wait)
+            chapters = extractor.chapters(html, payload["url"])[payload["start"] - 1:payload["end"]]
+        print(f"{payload['manga_title']}: {len(chapters)} chapters queued")
+        return [
+            ("chapter", f"chapter:{chapter_url}", dict(payload, url=chapter_url, chapter_number=chapter_number))
+            for chapter_number, chapter_url in chapters
+        ]
+
+    if kind == "chapter":
+        html = fetcher.fetch(payload["url"], "images" in extractor.render, extractor.wait)
+        image_urls = extractor.images(html, payload["url"])
+        if not image_urls:
+            raise ValueError(f"No images found for Chapter {payload['chapter_number']}")
+        return [
+            ("page", f"page:{payload['url']}#{image_index}", dict(payload, image_url=image_url, image_index=image_index))
+            for image_index, image_url in enumerate(image_urls, start=1)
+        ]
+
+    if kind == "page":
+        headers = {"User-Agent": USER_AGENT}
+        if extractor.referer:
+            headers["Referer"] = payload["url"]
+        response = httpcache.get(payload["image_url"], headers=headers, timeout=10)
+        response.raise_for_status()
+
+        folder = originals_folder(payload)
+        os.makedirs(folder, exist_ok=True)
+        extension = os.path.splitext(payload["image_url"].split("?")[0])[1].lower() or ".jpg"
+        image_path = os.path.join(folder, f"{payload['image_index']:04}{extension}")
+        tmp_path = f"{image_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as image_file:
+            image_file.write(response.content)
+        os.replace(tmp_path, image_path)  # A killed worker never leaves a half-written original
+        return []
+
+    if kind == "assemble":
+        from spliceTool import split_image
+
+        folder = originals_folder(payload)
+        page_index = 1
+        for file_name in natsorted(name for name in os.listdir(folder) if ".tmp-" not in name):
+            page_index = split_image(
+                os.path.join(folder, file_name), payload["output_folder"], payload["manga_title"],
+                payload["chapter_number"], page_index, piece_height=payload["piece_height"], preset=payload["preset"]
+            )
+        if not payload.get("keep_originals"):
+            for file_name in os.listdir(folder):
+                os.remove(os.path.join(folder, file_name))
+            os.rmdir(folder)
+        print(f"{payload['manga_title']} chapter {payload['chapter_number']}: {page_index - 1} pages")
+        return []
+
+    raise ValueError(f"Unknown job kind {kind!r}")
+
+
+# Function to process jobs until none are left (or forever, polling, with idle_exit=False)
+def run_worker(db_path, idle_exit=True, poll_interval=2.0, metrics_queue=None):
+    # metrics_queue: multiprocessing.Queue that receives this worker's stage timings when it exits
+    from sitespecs import PageFetcher
+
+    with JobStore(db_path) as store, PageFetcher() as fetcher:
+        while True:
+            job = store.claim()
+            if job is None:
+                if idle_exit and not store.active():
+                    if metrics_queue is not None:
+                        metrics_queue.put(metrics.registry.drain())
+                    return
+                time.sleep(poll_interval)
+                continue
+            try:
+                with Heartbeat(store, job):
+                    children = run_job(job, fetcher)
+            except Exception as e:
+                state = store.fail(job, e)
+                print(f"{job['kind']} job {job['id']} {'failed' if state == 'failed' else 'will be retried'}: {e}")
+                continue
+            store.complete(job, children)
+
+
+# Function to merge every worker's metrics, without waiting forever on a worker that died
+def collect_metrics(workers, metrics_queue, poll_interval=1.0):
+    pending = len(workers)
+    while pending:
+        try:
+            metrics.registry.merge(metrics_queue.get(timeout=poll_interval))
+            pending -= 1
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+    while pending:  # Reports queued just before the last worker exited
+        try:
+            metrics.registry.merge(metrics_queue.get_nowait())
+            pending -= 1
+        except queue.Empty:
+            break
+    for worker in workers:
+        worker.join()
+        if worker.exitcode:
+            print(f"Worker {worker.pid} exited with code {worker.exitcode}; its metrics are missing")
+
+
+def add_series(store, site, url, manga_title, output_folder, start=1, end=None, piece_height=2000, preset=None,
+               keep_originals=False):
+    payload = {
+        "site": site,
+        "url": url,
+        "manga_title": manga_title,
+        "output_folder": os.path.abspath(output_folder),
+        "start": start,
+        "end": end,
+        "piece_height": piece_height,
+        "preset": preset,
+        "keep_originals": keep_originals,
+    }
+    return store.enqueue("series", f"series:{site}:{url}", payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crash-safe batch downloads driven by a SQLite job table.")
+    parser.add_argument("database", help="SQLite job database (created if missing)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="Queue a series")
+    add_parser.add_argument("site", help="Site name from sitespecs.SITE_SPECS")
+    add_parser.add_argument("manga_url")
+    add_parser.add_argument("manga_title")
+    add_parser.add_argument("output_folder")
+    add_parser.add_argument("--start", type=int, default=1)
+    add_parser.add_argument("--end", type=int, default=None)
+    add_parser.add_argument("--height", type=int, default=2000)
+    add_parser.add_argument("--preset", default=None)
+    add_parser.add_argument("--keep-originals", action="store_true")
+
+    run_parser = commands.add_parser("run", help="Work through the queue")
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--forever", action="store_true", help="Keep polling for new jobs instead of exiting")
+
+    commands.add_parser("status", help="Show job counts and timings")
+    commands.add_parser("retry", help="Requeue failed jobs")
+    args = parser.parse_args()
+
+    with JobStore(args.database) as store:
+        if args.command == "add":
+            add_series(
+                store, args.site, args.manga_url, args.manga_title, args.output_folder,
+                args.start, args.end, args.height, args.preset, args.keep_originals
+            )
+        elif args.command == "retry":
+            print(f"Requeued {store.retry_failed()} failed jobs")
+        elif args.command == "status":
+            for row in store.stats():
+                seconds = f"{row['seconds']:.2f}s avg" if row["seconds"] is not None else ""
+                print(f"{row['kind']:<9} {row['state']:<8} {row['count']:>7} {seconds}")
+
+    if args.command == "run":
+        metrics_queue = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=run_worker, args=(args.database, not args.forever, 2.0, metrics_queue))
+            for _ in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        collect_metrics(workers, metrics_queue)  # Written out at exit with MANGA_METRICS_DIR
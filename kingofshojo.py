@@ -1,5 +1,4 @@
 import os
-import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
@@ -7,6 +6,10 @@ from PIL import Image
 import re
 import time
 
+import fetchpolicy
+import httpcache
+import metrics
+
 # Function to set up the Selenium WebDriver
 def setup_driver():
     chrome_options = Options()
@@ -19,21 +22,25 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_title):
     print(f"Processing Chapter {chapter_number}: {chapter_url}")
     
     try:
-        driver = setup_driver()
-        driver.get(chapter_url)
+        with metrics.stage("browser_start"):
+            driver = setup_driver()
+        with metrics.stage("render"):
+            driver.get(chapter_url)
 
-        # Wait for the page to fully load (increase time if necessary)
-        time.sleep(5)  # Adjust sleep time based on page loading speed
+            # Wait for the page to fully load (increase time if necessary)
+            time.sleep(5)  # Adjust sleep time based on page loading speed
+            page_source = driver.page_source
 
         # Retrieve the page source after it's fully loaded
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        with metrics.stage("parse"):
+            soup = BeautifulSoup(page_source, "html.parser")
+            # Find the div with id 'readerarea' and class 'rdminimal'
+            reader_area_div = soup.find("div", id="readerarea", class_="rdminimal")
         driver.quit()
     except Exception as e:
         print(f"Failed to fetch chapter page: {e}")
         return
 
-    # Find the div with id 'readerarea' and class 'rdminimal'
-    reader_area_div = soup.find("div", id="readerarea", class_="rdminimal")
     if not reader_area_div:
         print(f"Reader area not found for Chapter {chapter_number}.")
         return
@@ -63,7 +70,9 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_title):
     current_page_index = 1  # Start the page index for this chapter
     for idx, img_url in enumerate(valid_imgs):
         try:
-            img_data = requests.get(img_url, timeout=10).content
+            response = httpcache.get(img_url)
+            response.raise_for_status()
+            img_data = response.content
             temp_image_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
 
             # Save the image temporarily
@@ -81,6 +90,7 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_title):
 
         except Exception as e:
             print(f"Error downloading image {img_url}: {e}")
+            fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
 
 # Function to split an image into smaller pieces
 def split_image(image_path, output_folder, manga_title, chapter_number, start_page_index, piece_height=2000):
@@ -97,35 +107,40 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
             output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                img.save(output_path, "JPEG")
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
             num_pieces = img_height // piece_height
             for cut_number in range(num_pieces):
                 left, upper, right, lower = 0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height
-                piece = img.crop((left, upper, right, lower))
+                with metrics.stage("slice"):
+                    piece = img.crop((left, upper, right, lower))
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
             remainder = img_height % piece_height
             if remainder > 0:
                 box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
 
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -136,14 +151,16 @@ def scrape_chapters(manga_url):
     print(f"Scraping chapters from {manga_url}")
     
     try:
-        response = requests.get(manga_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
+        with metrics.stage("fetch"):
+            response = fetchpolicy.get(manga_url)
+            response.raise_for_status()
+        with metrics.stage("parse"):
+            soup = BeautifulSoup(response.text, "html.parser")
+            chapter_list_div = soup.find("div", class_="eplister", id="chapterlist")
     except Exception as e:
         print(f"Failed to fetch manga page: {e}")
         return []
 
-    chapter_list_div = soup.find("div", class_="eplister", id="chapterlist")
     if not chapter_list_div:
         print("Chapter list not found.")
         return []
@@ -167,13 +184,16 @@ def main():
     manga_url = "https://kingofshojo.com/manga/seduce-the-villains-father/"
     manga_title = "Seduce the Villain’s Father"  # Set manga title
 
-    chapters = scrape_chapters(manga_url)
-    start_index = 81  # Start from chapter 2 81 === 76 
-    end_index = 165    # End at chapter 5 
+    with metrics.labels(site="kingofshojo", series=manga_title):
+        with metrics.stage("list_scrape"):
+            chapters = scrape_chapters(manga_url)
+        start_index = 81  # Start from chapter 2 81 === 76 
+        end_index = 165    # End at chapter 5 
 
-    # Assuming chapters is a list of tuples with chapter_number and chapter_url
-    for chapter_number, chapter_url in chapters[start_index - 1:end_index]:
-        download_images_for_chapter(chapter_number, chapter_url, manga_title)
+        # Assuming chapters is a list of tuples with chapter_number and chapter_url
+        for chapter_number, chapter_url in chapters[start_index - 1:end_index]:
+            with metrics.labels(chapter=chapter_number):
+                download_images_for_chapter(chapter_number, chapter_url, manga_title)
 
     print("Download completed!")
 
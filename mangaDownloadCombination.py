@@ -1,25 +1,29 @@
+import argparse
 import os
-import requests
-from bs4 import BeautifulSoup
-from PIL import Image
 import re
-from io import BytesIO
 from requests.exceptions import RequestException
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By  
 from urllib.parse import urljoin
 
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+
+# Selenium, webdriver_manager, lxml (htmlextract), PIL and NumPy are imported inside
+# the functions that need them, so a run of only the HTTP sites doesn't pay
+# for Selenium and a plain "--help" starts instantly.
+# (python -m benchmarks.bench_startup checks the import-time budget)
+
 # Function to fetch page with Selenium (JavaScript rendered)
 def fetch_page_with_selenium(chapter_url):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     options = Options()
     options.headless = True  # Run in headless mode (no UI)
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    driver = webdriver.Chrome(service=Service(chromedriver.driver_path()), options=options)
     driver.get(chapter_url)
     time.sleep(5)  # Wait for JavaScript to load
     page_source = driver.page_source
@@ -28,6 +32,10 @@ def fetch_page_with_selenium(chapter_url):
 
 # Selenium setup
 def setup_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--disable-gpu")
@@ -35,14 +43,32 @@ def setup_driver():
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--start-maximized")
     
-    # Use ChromeDriverManager().install() to handle the chromedriver without explicitly setting path
-    driver_service = Service(ChromeDriverManager().install())  # Set up the ChromeDriver service
+    # chromedriver.driver_path() resolves the driver once per Chrome version and reuses it offline
+    driver_service = Service(chromedriver.driver_path())  # Set up the ChromeDriver service
     driver = webdriver.Chrome(service=driver_service, options=chrome_options)  # Pass the driver service correctly
     return driver
 
 
+# Function to save one piece, as RGB JPEG by default or with an encoder preset ("reader", "e-ink", ...)
+def save_piece(piece, output_folder, manga_title, chapter_number, page_index, preset=None):
+    from encoders import save_image
+
+    output_path_without_ext = os.path.join(output_folder, f"{manga_title}_chapter{chapter_number}_{page_index:02}")
+    if preset is not None:
+        return save_image(piece, output_path_without_ext, preset)
+
+    if piece.mode in ["RGBA", "P"]:
+        piece = piece.convert("RGB")
+    output_path = output_path_without_ext + ".jpg"
+    piece.save(output_path, "JPEG")
+    return output_path
+
+
 # Function to split an image into smaller pieces
-def split_image(image_path, output_folder, manga_title, chapter_number, start_page_index, piece_height=2000):
+def split_image(image_path, output_folder, manga_title, chapter_number, start_page_index, piece_height=2000, gutter_tolerance=None, preset=None):
+    from PIL import Image
+    from gutters import cut_boxes
+
     manga_title = manga_title.lower().replace(" ", "_")
     with Image.open(image_path) as img:
         img_width, img_height = img.size
@@ -51,40 +77,19 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
         current_page_index = start_page_index
 
         if img_height <= piece_height:
-            if img.mode in ["RGBA", "P"]:
-                img = img.convert("RGB")
-
-            output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
-            output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                output_path = save_piece(img, output_folder, manga_title, chapter_number, current_page_index, preset)
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
-            num_pieces = img_height // piece_height
-            for cut_number in range(num_pieces):
-                left, upper, right, lower = 0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height
-                piece = img.crop((left, upper, right, lower))
-
-                if piece.mode in ["RGBA", "P"]:
-                    piece = piece.convert("RGB")
-
-                output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
-                output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
-                print(f"Saved: {output_path}")
-                current_page_index += 1
-
-            remainder = img_height % piece_height
-            if remainder > 0:
-                box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
-
-                if piece.mode in ["RGBA", "P"]:
-                    piece = piece.convert("RGB")
-
-                output_filename = f"{manga_title}_chapter{chapter_number}_{current_page_index:02}.jpg"
-                output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+            # Fixed-height cuts, or cuts snapped to blank gutters when gutter_tolerance is set
+            with metrics.stage("slice"):
+                boxes = cut_boxes(img, piece_height, tolerance=gutter_tolerance)
+            for box in boxes:
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
+                with metrics.stage("encode"):
+                    output_path = save_piece(piece, output_folder, manga_title, chapter_number, current_page_index, preset)
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -92,18 +97,22 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
 # https://kingofshojo.com script section
 # Function to download images for a specific chapter
-def kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_title):
+def kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_title, preset=None):
+    import htmlextract
+
     print(f"Processing Chapter {chapter_number}: {chapter_url}")
     
     try:
-        response = requests.get(chapter_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
+        with metrics.stage("fetch"):
+            response = fetchpolicy.get(chapter_url)
+            response.raise_for_status()
+        with metrics.stage("parse"):
+            tree = htmlextract.parse(response.text)
+            img_tags = htmlextract.select(tree, "img[src]")
     except Exception as e:
         print(f"Failed to fetch chapter page: {e}")
         return
 
-    img_tags = soup.find_all("img", src=True)
     valid_imgs = []
 
     for img in img_tags:
@@ -128,7 +137,9 @@ def kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_t
     current_page_index = 1  # Start the page index for this chapter
     for idx, img_url in enumerate(valid_imgs):
         try:
-            img_data = requests.get(img_url, timeout=10).content
+            response = httpcache.get(img_url)
+            response.raise_for_status()
+            img_data = response.content
             temp_image_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
 
             # Save the image temporarily
@@ -138,7 +149,7 @@ def kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_t
 
             # Split the image into pieces if necessary
             current_page_index = split_image(
-                temp_image_path, folder_name, manga_title, chapter_number, current_page_index
+                temp_image_path, folder_name, manga_title, chapter_number, current_page_index, preset=preset
             )
 
             # Remove the temporary file
@@ -146,31 +157,36 @@ def kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_t
 
         except Exception as e:
             print(f"Error downloading image {img_url}: {e}")
+            fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
 
 
 # Function to scrape chapters from the chapter list
 def kingOfShojo_scrape_chapters(manga_url):
+    import htmlextract
+
     print(f"Scraping chapters from {manga_url}")
     
     try:
-        response = requests.get(manga_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
+        with metrics.stage("fetch"):
+            response = fetchpolicy.get(manga_url)
+            response.raise_for_status()
+        with metrics.stage("parse"):
+            tree = htmlextract.parse(response.text, 'id="chapterlist"')
+            chapter_list_div = htmlextract.select(tree, "div#chapterlist.eplister")
     except Exception as e:
         print(f"Failed to fetch manga page: {e}")
         return []
 
-    chapter_list_div = soup.find("div", class_="eplister", id="chapterlist")
     if not chapter_list_div:
         print("Chapter list not found.")
         return []
 
-    chapter_links = chapter_list_div.find_all("a", href=True)
+    chapter_links = htmlextract.select(chapter_list_div[0], "a[href]")
     chapters = []
     for link in chapter_links:
         href = link.get("href")
         if href:
-            chapter_number_match = re.search(r"Chapter (\d+)", link.text.strip())
+            chapter_number_match = re.search(r"Chapter (\d+)", htmlextract.text(link))
             if chapter_number_match:
                 chapter_number = int(chapter_number_match.group(1))
                 chapters.append((chapter_number, href))
@@ -181,30 +197,37 @@ def kingOfShojo_scrape_chapters(manga_url):
 
 
 # Main function
-def kingOfShojo_main():
+def kingOfShojo_main(preset=None):
     manga_url = "https://kingofshojo.com/manga/seduce-the-villains-father/"
     manga_title = "Seduce the Villain’s Father"  # Set manga title
 
-    chapters = kingOfShojo_scrape_chapters(manga_url)
-    for chapter_number, chapter_url in chapters:
-        kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_title)
+    with metrics.labels(site="kingofshojo", series=manga_title):
+        with metrics.stage("list_scrape"):
+            chapters = kingOfShojo_scrape_chapters(manga_url)
+        for chapter_number, chapter_url in chapters:
+            with metrics.labels(chapter=chapter_number):
+                kingOfShojo_download_images_for_chapter(chapter_number, chapter_url, manga_title, preset)
 
     print("Download completed!")
 
 # https://manhuaus.com script section
 # Function to download images for a specific chapter and split large images into smaller pieces
-def manhuaus_download_images_for_chapter(chapter_number, chapter_url, manga_url):
+def manhuaus_download_images_for_chapter(chapter_number, chapter_url, manga_url, preset=None):
+    import htmlextract
+
     # Extract the manga name from the URL
     manga_title = extract_manga_title(manga_url)  # Get the manga title from the URL
     
     print(f"Processing Chapter {chapter_number} at {chapter_url}")
 
     # Send a GET request to the chapter page
-    response = requests.get(chapter_url)
-    soup = BeautifulSoup(response.text, "html.parser")
+    with metrics.stage("fetch"):
+        response = fetchpolicy.get(chapter_url)
+    with metrics.stage("parse"):
+        tree = htmlextract.parse(response.text, "wp-manga-chapter-img")
 
-    # Find the images inside the chapter page
-    image_tags = soup.find_all("img", class_="wp-manga-chapter-img")
+        # Find the images inside the chapter page
+        image_tags = htmlextract.select(tree, "img.wp-manga-chapter-img")
 
     if image_tags:
         print(f"Found {len(image_tags)} images in Chapter {chapter_number}")
@@ -219,7 +242,9 @@ def manhuaus_download_images_for_chapter(chapter_number, chapter_url, manga_url)
             if img_url:
                 try:
                     # Download the image
-                    img_data = requests.get(img_url).content
+                    response = httpcache.get(img_url)
+                    response.raise_for_status()
+                    img_data = response.content
                     img_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
                     
                     # Save the image temporarily
@@ -228,11 +253,12 @@ def manhuaus_download_images_for_chapter(chapter_number, chapter_url, manga_url)
                     print(f"Downloaded page {idx + 1} for Chapter {chapter_number}")
 
                     # Now split the image if needed
-                    current_page_index = split_image(img_path, folder_name, manga_title, chapter_number, current_page_index)
+                    current_page_index = split_image(img_path, folder_name, manga_title, chapter_number, current_page_index, preset=preset)
                     os.remove(img_path)  # Remove the temporary image after splitting
                     
                 except Exception as e:
                     print(f"Error downloading page {idx + 1}: {e}")
+                    fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
     else:
         print(f"No images found for Chapter {chapter_number}.")
 
@@ -250,15 +276,18 @@ def extract_manga_title(manga_url):
 
 # Function to scrape the list of chapters from the manga list page
 def manhuaus_scrape_chapters(manga_url):
+    import htmlextract
+
     print(f"Scraping chapters for {manga_url}")
     
     # Send a GET request to the manga list page
-    response = requests.get(manga_url)
-    soup = BeautifulSoup(response.text, "html.parser")
-    
-    # Find the div that contains the chapter list
-    chapter_list_div = soup.find("div", class_="page-content-listing single-page")
-    chapter_links = chapter_list_div.find_all("a", href=True)  # Find all <a> tags with href attribute
+    with metrics.stage("fetch"):
+        response = fetchpolicy.get(manga_url)
+    with metrics.stage("parse"):
+        tree = htmlextract.parse(response.text, "page-content-listing")
+
+        # Find all <a> tags with href attribute in the div that contains the chapter list
+        chapter_links = htmlextract.select(tree, "div.page-content-listing.single-page a[href]")
     
     chapters = []
     for link in chapter_links:
@@ -283,16 +312,19 @@ def manhuaus_scrape_chapters(manga_url):
 
 
 # Main function to start the script
-def manhuaus_main():
+def manhuaus_main(preset=None):
     manga_url = "https://manhuaus.com/manga/the-reincarnation-of-the-forbidden-archmage"
     
-    # Scrape the chapters
-    chapters = manhuaus_scrape_chapters(manga_url)
-    
-    # Process each chapter starting from the first one
-    for chapter_number, chapter_href in chapters:
-        chapter_url = f"{chapter_href}"
-        manhuaus_download_images_for_chapter(chapter_number, chapter_url, manga_url)
+    with metrics.labels(site="manhuaus", series=extract_manga_title(manga_url)):
+        # Scrape the chapters
+        with metrics.stage("list_scrape"):
+            chapters = manhuaus_scrape_chapters(manga_url)
+        
+        # Process each chapter starting from the first one
+        for chapter_number, chapter_href in chapters:
+            chapter_url = f"{chapter_href}"
+            with metrics.labels(chapter=chapter_number):
+                manhuaus_download_images_for_chapter(chapter_number, chapter_url, manga_url, preset)
 
     print("Download completed!")
 
@@ -301,16 +333,20 @@ manga_title = "Get Schooled"
 chaptersName = []  # Initialize chapter globally to store chapter titles
 
 # Function to download images for a specific chapter
-def naver_download_images_for_chapter(chapter_number, chapter_url, manga_url):
+def naver_download_images_for_chapter(chapter_number, chapter_url, manga_url, preset=None):
+    import htmlextract
+
     global chaptersName  # Use the global chapter variable
     print(f"Processing Chapter {chapter_number} at {chapter_url}")
 
     try:
-        response = requests.get(chapter_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        # Find images
-        image_tags = soup.find_all("img", alt="comic content")
+        with metrics.stage("fetch"):
+            response = fetchpolicy.get(chapter_url)
+            response.raise_for_status()
+        with metrics.stage("parse"):
+            # Find images (parsing starts at the viewer, with lxml)
+            tree = htmlextract.parse(response.text, "wt_viewer")
+            image_tags = htmlextract.select(tree, "img[alt='comic content']")
         if not image_tags:
             print(f"No images found for Chapter {chapter_number}.")
             return
@@ -333,7 +369,7 @@ def naver_download_images_for_chapter(chapter_number, chapter_url, manga_url):
                         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
                     }
 
-                    img_data = requests.get(img_url, headers=headers)
+                    img_data = httpcache.get(img_url, headers=headers)
                     img_data.raise_for_status()  # Check if the image download was successful
 
                     # Save image as a temporary file
@@ -342,7 +378,7 @@ def naver_download_images_for_chapter(chapter_number, chapter_url, manga_url):
                         img_file.write(img_data.content)  # Save the image
 
                     # Optionally split large images into smaller pieces (if necessary)
-                    current_page_index = split_image(img_path, folder_name, manga_title, chapter_number, current_page_index)
+                    current_page_index = split_image(img_path, folder_name, manga_title, chapter_number, current_page_index, preset=preset)
 
                     # Remove the temporary image after splitting
                     os.remove(img_path)
@@ -350,8 +386,10 @@ def naver_download_images_for_chapter(chapter_number, chapter_url, manga_url):
 
                 except RequestException as e:
                     print(f"Error downloading page {idx + 1} at {img_url}: {e}")
+                    fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
                 except Exception as e:
                     print(f"Unexpected error while processing image {idx + 1}: {e}")
+                    fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
     except Exception as e:
         print(f"Error processing Chapter {chapter_number}: {e}")
 
@@ -360,49 +398,51 @@ def naver_download_images_for_chapter(chapter_number, chapter_url, manga_url):
 def naver_scrape_chapters_with_selenium(manga_url):
     from selenium import webdriver
     from selenium.webdriver.chrome.service import Service
-    from webdriver_manager.chrome import ChromeDriverManager
     from selenium.webdriver.chrome.options import Options
-    import time
 
     # Set up the WebDriver
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run in headless mode
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    service = Service(chromedriver.driver_path())
+    with metrics.stage("browser_start"):
+        driver = webdriver.Chrome(service=service, options=chrome_options)
 
     try:
-        # Load the page
-        driver.get(manga_url)
-        time.sleep(3)  # Wait for JavaScript to load the page
+        with metrics.stage("render"):
+            # Load the page
+            driver.get(manga_url)
+            time.sleep(3)  # Wait for JavaScript to load the page
+
+            # Get the page source after JavaScript execution
+            page_source = driver.page_source
 
-        # Get the page source after JavaScript execution
-        page_source = driver.page_source
+        # Parse with lxml, from the episode list on
+        import htmlextract
 
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(page_source, "html.parser")
+        with metrics.stage("parse"):
+            tree = htmlextract.parse(page_source, "EpisodeListList__item")
 
-        # Find all chapter list items
-        chapter_list_items = soup.find_all("li", class_="EpisodeListList__item--M8zq4")
+            # Find all chapter list items
+            chapter_list_items = htmlextract.select(tree, "li.EpisodeListList__item--M8zq4")
         chapters = []
         base_url = "https://comic.naver.com"
         
         global chaptersName
-        chapter = soup.find_all("p", class_=lambda class_name: class_name and "EpisodeListList__title_area" in class_name)
+        # The class names carry a build hash suffix, hence the substring matches
+        chapter = htmlextract.select(tree, "p[class*='EpisodeListList__title_area']")
 
         chaptersName = []  # Initialize an empty list to store chapter names
 
         # Now iterate over the found <p> tags and extract the <span> inside them
         for p_tag in chapter:
-            span_tag = p_tag.find("span", class_=lambda class_name: class_name and "EpisodeListList__title" in class_name)
-            if span_tag:  # Check if the <span> tag was found
-                chaptersName.append(span_tag.text)  # Save the text content of the <span> tag to chaptersName
+            span_tags = htmlextract.select(p_tag, "span[class*='EpisodeListList__title']")
+            if span_tags:  # Check if the <span> tag was found
+                chaptersName.append(span_tags[0].text_content())  # Save the text content of the <span> tag to chaptersName
 
-# Print the list of chapter names
-            
         for li in chapter_list_items:
-            link = li.find("a", href=True)
-            if link:
-                href = link.get("href")
+            links = htmlextract.select(li, "a[href]")
+            if links:
+                href = links[0].get("href")
                 full_url = f"{base_url}{href}"
                 chapters.append(full_url)
 
@@ -418,32 +458,41 @@ def naver_scrape_chapters_with_selenium(manga_url):
 
 
 # Main function
-def naver_main(manga_url):
+def naver_main(manga_url=None, preset=None):
     manga_url = "https://comic.naver.com/webtoon/list?titleId=758037&page=8&sort=DESC"
-    chapters = naver_scrape_chapters_with_selenium(manga_url)
+    with metrics.labels(site="naver", series=manga_title):
+        with metrics.stage("list_scrape"):
+            chapters = naver_scrape_chapters_with_selenium(manga_url)
 
-    for chapter_number, chapter_href in enumerate(chapters, start=1):  # Enumerate to generate chapter numbers
-        naver_download_images_for_chapter(chapter_number, chapter_href, manga_url)
+        for chapter_number, chapter_href in enumerate(chapters, start=1):  # Enumerate to generate chapter numbers
+            with metrics.labels(chapter=chapter_number):
+                naver_download_images_for_chapter(chapter_number, chapter_href, manga_url, preset)
 
     print("Download completed!")
 
 #battwo section
 # Download images for a chapter
-def battwo_download_images_for_chapter(driver, chapter_url, manga_title, chapter_index):
+def battwo_download_images_for_chapter(driver, chapter_url, manga_title, chapter_index, preset=None):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     print(f"Processing Chapter {chapter_index}: {chapter_url}")
-    driver.get(chapter_url)
+    with metrics.stage("render"):
+        driver.get(chapter_url)
 
-    # Wait for the viewer div to load
-    try:
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.ID, "viewer"))
-        )
-    except Exception as e:
-        print(f"Viewer not found: {e}")
-        return
+        # Wait for the viewer div to load
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.ID, "viewer"))
+            )
+        except Exception as e:
+            print(f"Viewer not found: {e}")
+            return
 
-    viewer_div = driver.find_element(By.ID, "viewer")
-    img_elements = viewer_div.find_elements(By.TAG_NAME, "img")
+    with metrics.stage("parse"):
+        viewer_div = driver.find_element(By.ID, "viewer")
+        img_elements = viewer_div.find_elements(By.TAG_NAME, "img")
 
     if not img_elements:
         print(f"No images found for Chapter {chapter_index}")
@@ -459,7 +508,9 @@ def battwo_download_images_for_chapter(driver, chapter_url, manga_title, chapter
         # Check if the image is the best quality by URL
         if ".webp" in img_url or ".jpg" in img_url:  # Prefer webp or high res jpg
             try:
-                img_data = requests.get(img_url, timeout=10).content
+                response = httpcache.get(img_url)
+                response.raise_for_status()
+                img_data = response.content
                 temp_image_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
 
                 # Save the image temporarily
@@ -469,31 +520,38 @@ def battwo_download_images_for_chapter(driver, chapter_url, manga_title, chapter
 
                 # Split the image if necessary
                 current_page_index = split_image(
-                    temp_image_path, folder_name, manga_title, chapter_index, current_page_index
+                    temp_image_path, folder_name, manga_title, chapter_index, current_page_index, preset=preset
                 )
 
                 # Remove the temporary file
                 os.remove(temp_image_path)
             except Exception as e:
                 print(f"Error downloading image {img_url}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_index, chapter_url=chapter_url, page=idx + 1)
 
 
 # Scrape chapters from the main page
 def battwo_scrape_chapters(driver, manga_url):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     print(f"Scraping chapters from {manga_url}")
-    driver.get(manga_url)
+    with metrics.stage("render"):
+        driver.get(manga_url)
 
-    # Wait for the main div to load
-    try:
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "main"))
-        )
-    except Exception as e:
-        print(f"Failed to load main div: {e}")
-        return []
+        # Wait for the main div to load
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.CLASS_NAME, "main"))
+            )
+        except Exception as e:
+            print(f"Failed to load main div: {e}")
+            return []
 
-    main_div = driver.find_element(By.CLASS_NAME, "main")
-    chapter_links = main_div.find_elements(By.CSS_SELECTOR, "a.chapt")
+    with metrics.stage("parse"):
+        main_div = driver.find_element(By.CLASS_NAME, "main")
+        chapter_links = main_div.find_elements(By.CSS_SELECTOR, "a.chapt")
 
     chapters = []
     for link in chapter_links:
@@ -509,32 +567,44 @@ def battwo_scrape_chapters(driver, manga_url):
 
 
 # Main function
-def battwo_main():
+def battwo_main(preset=None):
     manga_url = "https://battwo.com/series/141768/secret-playlist-official"
     manga_title = "Secret Playlist Official"
 
-    driver = setup_driver()
+    with metrics.labels(site="battwo", series=manga_title):
+        with metrics.stage("browser_start"):
+            driver = setup_driver()
 
-    try:
-        chapters = battwo_scrape_chapters(driver, manga_url)
-        for chapter_index, (chapter_number, chapter_url) in enumerate(chapters, start=1):
-            battwo_download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
-    finally:
-        driver.quit()
+        try:
+            with metrics.stage("list_scrape"):
+                chapters = battwo_scrape_chapters(driver, manga_url)
+            for chapter_index, (chapter_number, chapter_url) in enumerate(chapters, start=1):
+                with metrics.labels(chapter=chapter_index):
+                    battwo_download_images_for_chapter(driver, chapter_url, manga_title, chapter_index, preset)
+        finally:
+            driver.quit()
 
     print("Download completed!")
 
 
 # bato section
 # Function to download images for a specific chapter and split large images
-def bato_download_images_for_chapter(chapter_number, chapter_url, manga_url):
+def bato_download_images_for_chapter(chapter_number, chapter_url, manga_url, preset=None):
     manga_title = bato_extract_manga_title(manga_url)  # Get the manga title
-    print(f"Processing Chapter {chapter_number} at {chapter_url}")
+    with metrics.labels(site="bato", series=manga_title, chapter=chapter_number):
+        _bato_download_images_for_chapter(chapter_number, chapter_url, manga_title, preset)
 
-    page_source = fetch_page_with_selenium(chapter_url)
-    soup = BeautifulSoup(page_source, "html.parser")
 
-    image_divs = soup.find_all("div", {"data-name": "image-item"})
+def _bato_download_images_for_chapter(chapter_number, chapter_url, manga_title, preset=None):
+    import htmlextract
+
+    print(f"Processing Chapter {chapter_number} at {chapter_url}")
+
+    with metrics.stage("render"):
+        page_source = fetch_page_with_selenium(chapter_url)
+    with metrics.stage("parse"):
+        tree = htmlextract.parse(page_source, 'data-name="image-item"')
+        image_divs = htmlextract.select(tree, "div[data-name='image-item']")
     if not image_divs:
         print(f"No images found for Chapter {chapter_number}.")
         return
@@ -547,20 +617,23 @@ def bato_download_images_for_chapter(chapter_number, chapter_url, manga_url):
     current_page_index = 1
 
     for idx, image_div in enumerate(image_divs):
-        img_tag = image_div.find("img")
-        if img_tag and img_tag.get("src"):
-            img_url = img_tag["src"]
+        img_tags = htmlextract.select(image_div, "img")
+        if img_tags and img_tags[0].get("src"):
+            img_url = img_tags[0].get("src")
             try:
-                img_data = requests.get(img_url).content
+                response = httpcache.get(img_url)
+                response.raise_for_status()
+                img_data = response.content
                 img_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
                 with open(img_path, "wb") as img_file:
                     img_file.write(img_data)
                 print(f"Downloaded page {idx + 1} for Chapter {chapter_number}")
 
-                current_page_index = split_image(img_path, folder_name, manga_title, chapter_number, current_page_index)
+                current_page_index = split_image(img_path, folder_name, manga_title, chapter_number, current_page_index, preset=preset)
                 os.remove(img_path)  # Remove temporary image
             except Exception as e:
                 print(f"Error downloading page {idx + 1}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
         else:
             print(f"No image found in div {idx + 1}. Skipping.")
 
@@ -574,15 +647,27 @@ def bato_extract_manga_title(manga_url):
 def bato_scrape_chapters(manga_url):
     print(f"Scraping chapters for {manga_url}")
 
-    page_source = fetch_page_with_selenium(manga_url)
-    soup = BeautifulSoup(page_source, "html.parser")
+    with metrics.labels(site="bato", series=bato_extract_manga_title(manga_url)), metrics.stage("list_scrape"):
+        with metrics.stage("render"):
+            page_source = fetch_page_with_selenium(manga_url)
+        with metrics.stage("parse"):
+            chapters = _bato_parse_chapters(page_source, manga_url)
 
-    chapter_list_div = soup.find("div", class_="group flex flex-col")
+    chapters.sort(key=lambda x: x[0])
+    print(f"Found {len(chapters)} chapters.")
+    return chapters
+
+def _bato_parse_chapters(page_source, manga_url):
+    import htmlextract
+
+    tree = htmlextract.parse(page_source)
+
+    chapter_list_div = htmlextract.select(tree, "div.group.flex.flex-col")
     if not chapter_list_div:
         print("Could not find the chapter list div.")
         return []
 
-    chapter_links = chapter_list_div.find_all("a", href=True)
+    chapter_links = htmlextract.select(chapter_list_div[0], "a[href]")
     chapters = []
     for link in chapter_links:
         href = link.get("href")
@@ -592,26 +677,47 @@ def bato_scrape_chapters(manga_url):
                 chapter_number = int(match.group(1))
                 full_url = urljoin(manga_url, href)
                 chapters.append((chapter_number, full_url))
-
-    chapters.sort(key=lambda x: x[0])
-    print(f"Found {len(chapters)} chapters.")
     return chapters
 
 # Main function
-def bato_main():
+def bato_main(preset=None):
     manga_url = "https://bato.ing/title/84772-olgami"
     chapters = bato_scrape_chapters(manga_url)
 
     for chapter_number, chapter_href in chapters:
-        bato_download_images_for_chapter(chapter_number, chapter_href, manga_url)
+        bato_download_images_for_chapter(chapter_number, chapter_href, manga_url, preset)
 
     print("Download completed!")
 
 
 
+SITES = {
+    "kingofshojo": kingOfShojo_main,
+    "manhuaus": manhuaus_main,
+    "naver": naver_main,
+    "battwo": battwo_main,
+    "bato": bato_main,
+}
+DEFAULT_SITES = ["kingofshojo", "manhuaus", "naver", "battwo"]  # What a run without arguments downloads
+
+
 # Run the script
 if __name__ == "__main__":
-   kingOfShojo_main()
-   manhuaus_main()
-   naver_main()
-   battwo_main()
+    parser = argparse.ArgumentParser(description="Download manga from the supported sites.")
+    # No choices=: argparse checks an empty nargs="*" list against them and rejects it
+    parser.add_argument("sites", nargs="*", metavar="site",
+                        help=f"Sites to run ({', '.join(sorted(SITES))}); default: {' '.join(DEFAULT_SITES)}")
+    parser.add_argument("--preset", default=None,
+                        help="Encoder preset for the pages: archive, reader, compact or e-ink (default: JPEG)")
+    args = parser.parse_args()
+    unknown = set(args.sites) - set(SITES)
+    if unknown:
+        parser.error(f"unknown site(s): {', '.join(sorted(unknown))} (choose from {', '.join(sorted(SITES))})")
+    if args.preset is not None:
+        from encoders import PRESETS  # Imports PIL, so only when a preset is asked for
+
+        if args.preset not in PRESETS:
+            parser.error(f"unknown preset {args.preset!r} (choose from {', '.join(PRESETS)})")
+
+    for site in args.sites or DEFAULT_SITES:
+        SITES[site](preset=args.preset)
@@ -1,8 +1,11 @@
 import os
-import requests
 from bs4 import BeautifulSoup
 from PIL import Image
 
+import fetchpolicy
+import httpcache
+import metrics
+
 # Function to download images for a specific chapter and split large images into smaller pieces
 def download_images_for_chapter(chapter_number, chapter_url, manga_url):
     # Extract the manga name from the URL
@@ -11,11 +14,13 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
     print(f"Processing Chapter {chapter_number} at {chapter_url}")
 
     # Send a GET request to the chapter page
-    response = requests.get(chapter_url)
-    soup = BeautifulSoup(response.text, "html.parser")
+    with metrics.stage("fetch"):
+        response = fetchpolicy.get(chapter_url)
+    with metrics.stage("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
 
-    # Find the images inside the chapter page
-    image_tags = soup.find_all("img", class_="wp-manga-chapter-img")
+        # Find the images inside the chapter page
+        image_tags = soup.find_all("img", class_="wp-manga-chapter-img")
 
     if image_tags:
         print(f"Found {len(image_tags)} images in Chapter {chapter_number}")
@@ -30,7 +35,9 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
             if img_url:
                 try:
                     # Download the image
-                    img_data = requests.get(img_url).content
+                    response = httpcache.get(img_url)
+                    response.raise_for_status()
+                    img_data = response.content
                     img_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
                     
                     # Save the image temporarily
@@ -44,6 +51,7 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
                     
                 except Exception as e:
                     print(f"Error downloading page {idx + 1}: {e}")
+                    fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
     else:
         print(f"No images found for Chapter {chapter_number}.")
 
@@ -78,7 +86,8 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
             output_filename = f"{manga_title}-chapter{chapter_number}-{current_page_index}.jpg"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                img.save(output_path, "JPEG")
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
@@ -91,7 +100,8 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
                 lower = upper + piece_height
 
                 box = (left, upper, right, lower)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
 
                 # Convert to RGB if the mode is not suitable for JPEG
                 if piece.mode in ["RGBA", "P"]:
@@ -99,7 +109,8 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
                 output_filename = f"{manga_title}-chapter{chapter_number}-{current_page_index}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -112,7 +123,8 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
                 lower = img_height
 
                 box = (left, upper, right, lower)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
 
                 # Convert to RGB if the mode is not suitable for JPEG
                 if piece.mode in ["RGBA", "P"]:
@@ -120,7 +132,8 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
                 output_filename = f"{manga_title}-chapter{chapter_number}-{current_page_index}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -132,12 +145,14 @@ def scrape_chapters(manga_url):
     print(f"Scraping chapters for {manga_url}")
     
     # Send a GET request to the manga list page
-    response = requests.get(manga_url)
-    soup = BeautifulSoup(response.text, "html.parser")
-    
-    # Find the div that contains the chapter list
-    chapter_list_div = soup.find("div", class_="page-content-listing single-page")
-    chapter_links = chapter_list_div.find_all("a", href=True)  # Find all <a> tags with href attribute
+    with metrics.stage("fetch"):
+        response = fetchpolicy.get(manga_url)
+    with metrics.stage("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
+        
+        # Find the div that contains the chapter list
+        chapter_list_div = soup.find("div", class_="page-content-listing single-page")
+        chapter_links = chapter_list_div.find_all("a", href=True)  # Find all <a> tags with href attribute
     
     chapters = []
     for link in chapter_links:
@@ -165,13 +180,16 @@ def scrape_chapters(manga_url):
 def main():
     manga_url = "https://manhuaus.com/manga/the-reincarnation-of-the-forbidden-archmage"
     
-    # Scrape the chapters
-    chapters = scrape_chapters(manga_url)
-    
-    # Process each chapter starting from the first one
-    for chapter_number, chapter_href in chapters:
-        chapter_url = f"{chapter_href}"
-        download_images_for_chapter(chapter_number, chapter_url, manga_url)
+    with metrics.labels(site="manhuaus", series=extract_manga_title(manga_url)):
+        # Scrape the chapters
+        with metrics.stage("list_scrape"):
+            chapters = scrape_chapters(manga_url)
+        
+        # Process each chapter starting from the first one
+        for chapter_number, chapter_href in chapters:
+            chapter_url = f"{chapter_href}"
+            with metrics.labels(chapter=chapter_number):
+                download_images_for_chapter(chapter_number, chapter_url, manga_url)
 
     print("Download completed!")
 
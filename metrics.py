@@ -0,0 +1,234 @@
+import atexit
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+import profiling
+
+
+# Pipeline stages, in the order a page goes through them
+STAGES = ("list_scrape", "browser_start", "render", "parse", "fetch", "decode", "slice", "encode", "write")
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# When set, a Prometheus text file and a JSON run summary are written here at exit
+METRICS_DIR = os.environ.get("MANGA_METRICS_DIR")
+
+_labels = contextvars.ContextVar("metrics_labels", default=("", ""))  # (site, series)
+_chapter = contextvars.ContextVar("metrics_chapter", default=None)  # Not a histogram label; see profiling.py
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other["counts"])]
+        self.count += other["count"]
+        self.sum += other["sum"]
+        self.max = max(self.max, other["max"])
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (what Prometheus would estimate)
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Registry:
+    """
+    Stage histograms keyed by (site, series, stage).
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, site=None, series=None):
+        default_site, default_series = _labels.get()
+        key = (site if site is not None else default_site, series if series is not None else default_series, stage)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    def drain(self):
+        """
+        Returns the histograms as plain data and resets them; used to ship a
+        worker process's measurements back to the parent.
+        """
+        with self._lock:
+            data = [
+                (key, {"counts": h.counts, "count": h.count, "sum": h.sum, "max": h.max})
+                for key, h in self.histograms.items()
+            ]
+            self.histograms = {}
+        return data
+
+    def merge(self, data):
+        with self._lock:
+            for key, histogram in data:
+                key = tuple(key)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram()
+                self.histograms[key].merge(histogram)
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP manga_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE manga_stage_seconds histogram",
+        ]
+        with self._lock:
+            items = sorted(self.histograms.items())
+        for (site, series, stage), histogram in items:
+            labels = f'stage="{stage}",site="{_escape(site)}",series="{_escape(series)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'manga_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'manga_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"manga_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"manga_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        import ratelimit
+
+        hosts = ratelimit.limiter.metrics()
+        for name, field, kind, help_text in (
+            ("manga_host_rate", "rate", "gauge", "Current request rate limit (requests/s)."),
+            ("manga_host_concurrency", "concurrency", "gauge", "Current concurrency limit."),
+            ("manga_host_requests_total", "requests", "counter", "Requests sent."),
+            ("manga_host_throttled_total", "throttled", "counter", "429/503 responses received."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for host, values in sorted(hosts.items()):
+                lines.append(f'{name}{{host="{_escape(host)}"}} {values[field]}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        with self._lock:
+            items = sorted(self.histograms.items())
+        stages = []
+        for (site, series, stage), histogram in items:
+            stages.append({
+                "site": site,
+                "series": series,
+                "stage": stage,
+                "count": histogram.count,
+                "total_seconds": round(histogram.sum, 4),
+                "mean_seconds": round(histogram.sum / histogram.count, 4) if histogram.count else None,
+                "p50_seconds": _round(histogram.quantile(0.5)),
+                "p95_seconds": _round(histogram.quantile(0.95)),
+                "max_seconds": round(histogram.max, 4),
+            })
+
+        import ratelimit
+
+        now = time.time()
+        return {
+            "started_at": self.started_at,
+            "finished_at": now,
+            "wall_seconds": round(now - self.started_at, 3),
+            "stages": stages,
+            "hosts": ratelimit.limiter.metrics(),
+        }
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+@contextlib.contextmanager
+def stage(name, site=None, series=None):
+    """
+    Times the block and records it under `name`.
+
+    Usage:
+        with metrics.stage("decode"):
+            img.load()
+    """
+    start = time.perf_counter()
+    try:
+        if name in profiling.STAGES:
+            with profiling.profile(name, _labels.get() + (_chapter.get(),)):
+                yield
+        else:
+            yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, site, series)
+
+
+@contextlib.contextmanager
+def labels(site=None, series=None, chapter=None):
+    """
+    Sets the site / series labels for every stage recorded inside the block
+    (including in httpcache, spliceTool... without passing them around).
+    `chapter` isn't a histogram label; it lets MANGA_PROFILE_CHAPTERS count chapters.
+    """
+    current_site, current_series = _labels.get()
+    token = _labels.set((site if site is not None else current_site, series if series is not None else current_series))
+    chapter_token = _chapter.set(chapter) if chapter is not None else None
+    try:
+        yield
+    finally:
+        if chapter_token is not None:
+            _chapter.reset(chapter_token)
+        _labels.reset(token)
+
+
+def write_report(directory):
+    """
+    Writes <directory>/manga_pipeline.prom (for node_exporter's textfile
+    collector, overwritten each run) and run-<timestamp>-<pid>.json.
+
+    Returns:
+        tuple: (Prometheus file path, JSON summary path)
+    """
+    os.makedirs(directory, exist_ok=True)
+    prom_path = os.path.join(directory, "manga_pipeline.prom")
+    tmp_path = f"{prom_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as prom_file:
+        prom_file.write(registry.prometheus_text())
+    os.replace(tmp_path, prom_path)
+
+    json_path = os.path.join(directory, f"run-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+    with open(json_path, "w", encoding="utf-8") as json_file:
+        json.dump(registry.summary(), json_file, indent=2)
+    return prom_path, json_path
+
+
+def _write_report_at_exit():
+    if registry.histograms:
+        write_report(METRICS_DIR)
+
+
+if METRICS_DIR:
+    atexit.register(_write_report_at_exit)
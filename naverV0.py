@@ -1,5 +1,4 @@
 import os
-import requests
 import time
 from bs4 import BeautifulSoup
 from PIL import Image
@@ -8,17 +7,24 @@ from io import BytesIO
 from requests.exceptions import RequestException
 from PIL import UnidentifiedImageError
 
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+
 # Function to download images for a specific chapter
 def download_images_for_chapter(chapter_number, chapter_url, manga_url):
     manga_title = extract_manga_title(manga_url)
     print(f"Processing Chapter {chapter_number} at {chapter_url}")
 
     try:
-        response = requests.get(chapter_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        # Find images
-        image_tags = soup.find_all("img", alt="comic content")
+        with metrics.stage("fetch"):
+            response = fetchpolicy.get(chapter_url)
+            response.raise_for_status()
+        with metrics.stage("parse"):
+            soup = BeautifulSoup(response.text, "html.parser")
+            # Find images
+            image_tags = soup.find_all("img", alt="comic content")
         if not image_tags:
             print(f"No images found for Chapter {chapter_number}.")
             return
@@ -40,7 +46,9 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
                         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
                     }
 
-                    img_data = requests.get(img_url)
+                    response = httpcache.get(img_url, headers=headers)
+                    response.raise_for_status()
+                    img_data = response.content
                     # Save image as temporary file
                     img_path = os.path.join(folder_name, f"temp_page_{idx + 1}.jpg")
                     with open(img_path, "wb") as img_file:
@@ -51,8 +59,10 @@ def download_images_for_chapter(chapter_number, chapter_url, manga_url):
 
                 except RequestException as e:
                     print(f"Error downloading page {idx + 1} at {img_url}: {e}")
+                    fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
                 except Exception as e:
                     print(f"Unexpected error: {e}")
+                    fetchpolicy.record_failure(img_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=idx + 1)
     except Exception as e:
         print(f"Error processing Chapter {chapter_number}: {e}")
 # Extract manga title from URL
@@ -73,31 +83,36 @@ def split_image(image_path, output_folder, manga_title, chapter_number, start_pa
 
             output_filename = f"{manga_title}-chapter{chapter_number}-{current_page_index}.jpg"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, "JPEG")
+            with metrics.stage("encode"):
+                img.save(output_path, "JPEG")
             current_page_index += 1
         else:
             num_pieces = img_height // piece_height
             for cut_number in range(num_pieces):
                 box = (0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}-chapter{chapter_number}-{current_page_index}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 current_page_index += 1
 
             remainder = img_height % piece_height
             if remainder > 0:
                 box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
                 if piece.mode in ["RGBA", "P"]:
                     piece = piece.convert("RGB")
 
                 output_filename = f"{manga_title}-chapter{chapter_number}-{current_page_index}.jpg"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, "JPEG")
+                with metrics.stage("encode"):
+                    piece.save(output_path, "JPEG")
                 current_page_index += 1
 
         return current_page_index
@@ -107,29 +122,31 @@ def scrape_chapters_with_selenium(manga_url):
     # Set up Selenium WebDriver with WebDriverManager
     from selenium import webdriver
     from selenium.webdriver.chrome.service import Service
-    from webdriver_manager.chrome import ChromeDriverManager
     from selenium.webdriver.chrome.options import Options
     import time
 
     # Set up the WebDriver
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run in headless mode
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    service = Service(chromedriver.driver_path())
+    with metrics.stage("browser_start"):
+        driver = webdriver.Chrome(service=service, options=chrome_options)
 
     try:
-        # Load the page
-        driver.get(manga_url)
-        time.sleep(3)  # Wait for JavaScript to load the page
+        with metrics.stage("render"):
+            # Load the page
+            driver.get(manga_url)
+            time.sleep(3)  # Wait for JavaScript to load the page
 
-        # Get the page source after JavaScript execution
-        page_source = driver.page_source
+            # Get the page source after JavaScript execution
+            page_source = driver.page_source
 
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(page_source, "html.parser")
+        with metrics.stage("parse"):
+            # Parse with BeautifulSoup
+            soup = BeautifulSoup(page_source, "html.parser")
 
-        # Find all chapter list items
-        chapter_list_items = soup.find_all("li", class_="EpisodeListList__item--M8zq4")
+            # Find all chapter list items
+            chapter_list_items = soup.find_all("li", class_="EpisodeListList__item--M8zq4")
         chapters = []
         base_url = "https://comic.naver.com"
 
@@ -153,10 +170,13 @@ def scrape_chapters_with_selenium(manga_url):
 # Main function
 def main():
     manga_url = "https://comic.naver.com/webtoon/list?titleId=814753"
-    chapters = scrape_chapters_with_selenium(manga_url)
+    with metrics.labels(site="naver", series=extract_manga_title(manga_url)):
+        with metrics.stage("list_scrape"):
+            chapters = scrape_chapters_with_selenium(manga_url)
 
-    for chapter_number, chapter_href in enumerate(chapters, start=1):  # Enumerate to generate chapter numbers
-        download_images_for_chapter(chapter_number, chapter_href, manga_url)
+        for chapter_number, chapter_href in enumerate(chapters, start=1):  # Enumerate to generate chapter numbers
+            with metrics.labels(chapter=chapter_number):
+                download_images_for_chapter(chapter_number, chapter_href, manga_url)
 
     print("Download completed!")
 
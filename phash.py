@@ -0,0 +1,196 @@
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+
+# Function to compute a 64-bit difference hash (dHash)
+def dhash(img, hash_size=8):
+    """
+    Hashes the horizontal gradient of a tiny grayscale copy of the image.
+
+    Only a (hash_size + 1) x hash_size thumbnail is ever decoded into NumPy,
+    so hashing a tall strip costs about as much as resizing it.
+
+    Returns:
+        int: hash_size * hash_size bit hash.
+    """
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+# Function to dHash an image file without fully decoding large JPEGs.
+# Every page hashed from disk (junk pages included) goes through here, so a
+# junk page and its re-download are hashed from the same draft-scale decode.
+def hash_file(image_path):
+    with Image.open(image_path) as img:
+        img.draft("L", (img.width // 8 or 1, img.height // 8 or 1))  # JPEG only: decode at 1/8 scale
+        return dhash(img)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BandedHashIndex:
+    """
+    Multi-index hashing over 64-bit hashes.
+
+    The hash is cut into max_distance + 1 bands and every band value gets
+    its own dict. By the pigeonhole principle two hashes within max_distance
+    bits agree exactly on at least one band, so a lookup only compares
+    against the few hashes sharing a band instead of scanning them all.
+    """
+
+    def __init__(self, max_distance, bits=64):
+        self.max_distance = max_distance
+        band_count = max_distance + 1
+        base, extra = divmod(bits, band_count)
+        self.bands = []  # (shift, mask) per band
+        shift = 0
+        for band in range(band_count):
+            width = base + (1 if band < extra else 0)
+            self.bands.append((shift, (1 << width) - 1))
+            shift += width
+        self.tables = [{} for _ in self.bands]
+        self.values = {}  # hash -> [values]
+
+    def add(self, hash_value, value):
+        if hash_value not in self.values:
+            self.values[hash_value] = []
+            for table, (shift, mask) in zip(self.tables, self.bands):
+                table.setdefault((hash_value >> shift) & mask, []).append(hash_value)
+        self.values[hash_value].append(value)
+
+    def search(self, hash_value):
+        """
+        Returns:
+            list: (distance, hash, value) for every stored value within max_distance, closest first.
+        """
+        results = []
+        seen = set()
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            for candidate in table.get((hash_value >> shift) & mask, ()):
+                distance = hamming(hash_value, candidate)
+                if distance <= self.max_distance and candidate not in seen:
+                    seen.add(candidate)
+                    results.extend((distance, candidate, value) for value in self.values[candidate])
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class HashIndex:
+    """
+    Library-wide index of page hashes, stored as JSON.
+
+    Holds two kinds of entries:
+        junk     - pages to skip (credit pages, ads, "support us" banners)
+        chapters - the page hashes of every processed chapter, used to flag
+                   chapters that are near-duplicates of one already stored
+    """
+
+    def __init__(self, path, max_distance=6):
+        self.path = path
+        self.max_distance = max_distance
+        self.junk = {}  # hash -> label
+        self.chapters = {}  # chapter key -> [hashes]
+        self.junk_tree = BandedHashIndex(max_distance)
+        self.page_tree = BandedHashIndex(max_distance)
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as index_file:
+                data = json.load(index_file)
+            for hash_hex, label in data.get("junk", {}).items():
+                self._add_junk(int(hash_hex, 16), label)
+            for chapter_key, hashes in data.get("chapters", {}).items():
+                self._add_chapter(chapter_key, [int(h, 16) for h in hashes])
+
+    def _add_junk(self, hash_value, label):
+        self.junk[hash_value] = label
+        self.junk_tree.add(hash_value, label)
+
+    def _add_chapter(self, chapter_key, hashes):
+        self.chapters[chapter_key] = hashes
+        for hash_value in hashes:
+            self.page_tree.add(hash_value, chapter_key)
+
+    def add_junk(self, image_path, label=None):
+        """
+        Registers a junk page file, hashed by hash_file() like the pages it
+        will be matched against. The label defaults to the file name.
+        """
+        self._add_junk(hash_file(image_path), label or os.path.basename(image_path))
+
+    def junk_label(self, image_path=None, hash_value=None):
+        """
+        Returns the label of the closest known junk page, or None.
+        """
+        if hash_value is None:
+            hash_value = hash_file(image_path)
+        matches = self.junk_tree.search(hash_value)
+        return matches[0][2] if matches else None
+
+    def junk_only(self):
+        # Small copy holding just the junk pages, cheap to send to worker processes
+        index = HashIndex(None, self.max_distance)
+        for hash_value, label in self.junk.items():
+            index._add_junk(hash_value, label)
+        return index
+
+    def add_chapter(self, chapter_key, hashes):
+        """
+        Stores a chapter's page hashes and returns the keys of stored chapters
+        that share at least half of its pages (near-duplicates / re-uploads).
+        """
+        duplicates = self.duplicate_chapters(hashes, exclude=chapter_key)
+        if chapter_key in self.chapters:
+            # Re-processing a chapter: rebuild the page index without its old pages
+            old = self.chapters
+            self.chapters = {}
+            self.page_tree = BandedHashIndex(self.max_distance)
+            for key, key_hashes in old.items():
+                if key != chapter_key:
+                    self._add_chapter(key, key_hashes)
+        self._add_chapter(chapter_key, hashes)
+        return duplicates
+
+    def duplicate_chapters(self, hashes, exclude=None, min_overlap=0.5):
+        if not hashes:
+            return []
+        matched = {}
+        for hash_value in hashes:
+            for chapter_key in {value for _, _, value in self.page_tree.search(hash_value)}:
+                matched[chapter_key] = matched.get(chapter_key, 0) + 1
+        return sorted(
+            chapter_key
+            for chapter_key, count in matched.items()
+            if chapter_key != exclude and count / len(hashes) >= min_overlap
+        )
+
+    def save(self):
+        data = {
+            "junk": {f"{hash_value:016x}": label for hash_value, label in self.junk.items()},
+            "chapters": {key: [f"{h:016x}" for h in hashes] for key, hashes in self.chapters.items()},
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump(data, index_file)
+        os.replace(tmp_path, self.path)
+
+
+# Register junk pages from the command line:
+#   python phash.py junk_index.json credits.png ads.jpg ...
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python phash.py <index.json> <junk image> [<junk image> ...]")
+        sys.exit(1)
+
+    index = HashIndex(sys.argv[1])
+    for image_path in sys.argv[2:]:
+        index.add_junk(image_path)
+        print(f"Added junk page: {image_path}")
+    index.save()
@@ -0,0 +1,181 @@
+import atexit
+import collections
+import contextlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+
+# Stages to profile (names from metrics.STAGES, comma-separated), e.g. MANGA_PROFILE=parse,slice.
+# Unset = no profiling, and metrics.stage() costs nothing extra.
+STAGES = frozenset(name.strip() for name in os.environ.get("MANGA_PROFILE", "").split(",") if name.strip())
+
+# "cprofile" writes <stage>-<run>-<pid>.prof (pstats: snakeviz, flameprof, speedscope);
+# "sample" writes <stage>-<run>-<pid>.folded (collapsed stacks: flamegraph.pl, speedscope, inferno)
+MODE = os.environ.get("MANGA_PROFILE_MODE", "cprofile")
+CHAPTERS = int(os.environ.get("MANGA_PROFILE_CHAPTERS", "1"))  # Profile the stage in this many chapters only
+PROFILE_DIR = os.environ.get("MANGA_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.environ.get("MANGA_PROFILE_INTERVAL_MS", "2")) / 1000
+DUMP_INTERVAL = 1.0  # Rewrite the output at most this often in the main process
+
+RUN_ID = time.strftime("%Y%m%d-%H%M%S")
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    """
+    Samples the stack of the thread inside the profiled block every
+    SAMPLE_INTERVAL seconds into folded stacks ("outer;inner;innermost count").
+    """
+
+    def __init__(self):
+        self.stacks = collections.Counter()
+        self.thread_id = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enable(self):
+        if self._thread is None:
+            # Started on first use, in the process doing the profiling (threads don't survive fork)
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        self.thread_id = threading.get_ident()
+
+    def disable(self):
+        self.thread_id = None
+
+    def _sample(self):
+        while True:
+            time.sleep(SAMPLE_INTERVAL)
+            thread_id = self.thread_id
+            frame = sys._current_frames().get(thread_id) if thread_id is not None else None
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack and self.thread_id == thread_id:
+                with self._lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+        with open(path, "w", encoding="utf-8") as folded_file:
+            for stack, count in stacks:
+                folded_file.write(f"{stack} {count}\n")
+
+
+class StageProfiler:
+    """
+    Profiles every block of one stage in the first CHAPTERS chapters seen,
+    one block at a time per process (cProfile can't nest, and a sampler
+    follows a single thread).
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.chapters = set()
+        self.done = False
+        self.last_dump = 0.0
+        if MODE == "sample":
+            self.profiler = _Sampler()
+            self.path = os.path.join(PROFILE_DIR, f"{stage}-{RUN_ID}-{os.getpid()}.folded")
+        else:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.path = os.path.join(PROFILE_DIR, f"{stage}-{RUN_ID}-{os.getpid()}.prof")
+
+    def wants(self, chapter):
+        if chapter in self.chapters:
+            return True
+        if len(self.chapters) >= CHAPTERS:
+            if not self.done:
+                self.done = True
+                self.dump()
+                print(f"Profiled {self.stage} in {len(self.chapters)} chapter(s): {self.path}")
+            return False
+        self.chapters.add(chapter)
+        return True
+
+    def dump(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if MODE == "sample":
+            self.profiler.dump(self.path)
+        else:
+            self.profiler.dump_stats(self.path)
+        self.last_dump = time.monotonic()
+
+
+_profilers = {}
+_active = threading.Lock()  # Held while a block is being profiled
+_active_stage = None
+_skipped = set()  # (stage, profiled stage) pairs already reported
+
+
+@contextlib.contextmanager
+def profile(stage, chapter):
+    """
+    Profiles the block if `stage` is in STAGES and `chapter` (any hashable
+    key, e.g. (site, series, chapter number)) is among the first CHAPTERS
+    chapters; otherwise runs it as is. metrics.stage() calls this, so
+    every instrumented stage can be profiled without code changes.
+    """
+    global _active_stage
+
+    if stage not in STAGES:
+        yield
+        return
+    if not _active.acquire(blocking=False):
+        # Nested in (or concurrent with) another profiled block: its time shows up there instead
+        if (stage, _active_stage) not in _skipped:
+            _skipped.add((stage, _active_stage))
+            print(f"Not profiling {stage} while {_active_stage} is being profiled (one block at a time per process)")
+        yield
+        return
+    _active_stage = stage
+    try:
+        if stage not in _profilers:
+            _profilers[stage] = StageProfiler(stage)
+        profiler = _profilers[stage]
+        if not profiler.wants(chapter):
+            yield
+            return
+        profiler.profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.profiler.disable()
+            # Pool workers exit without running atexit, so they rewrite the output after every block
+            in_worker = multiprocessing.parent_process() is not None
+            if in_worker or time.monotonic() - profiler.last_dump > DUMP_INTERVAL:
+                profiler.dump()
+    finally:
+        _active_stage = None
+        _active.release()
+
+
+def _reset_after_fork():
+    # A forked worker starts with its own profilers: new output paths (pid),
+    # a fresh cProfile / sampler thread, and no block held by a parent thread
+    global _active, _active_stage
+    _profilers.clear()
+    _skipped.clear()
+    _active = threading.Lock()
+    _active_stage = None
+
+
+def _dump_at_exit():
+    for profiler in _profilers.values():
+        if not profiler.done:
+            profiler.dump()
+
+
+if STAGES:
+    atexit.register(_dump_at_exit)
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Starting point for every host; each host then finds its own limits
+INITIAL_RATE = float(os.environ.get("MANGA_RATE_INITIAL", "4"))  # Requests per second
+INITIAL_CONCURRENCY = float(os.environ.get("MANGA_CONCURRENCY_INITIAL", "2"))
+MAX_RATE = float(os.environ.get("MANGA_RATE_MAX", "50"))
+MAX_CONCURRENCY = float(os.environ.get("MANGA_CONCURRENCY_MAX", "16"))
+
+MIN_RATE = 0.2
+MIN_CONCURRENCY = 1.0
+THROTTLE_STATUSES = (429, 503)
+LATENCY_INFLATION = 2.0  # Back off when time-to-headers exceeds this multiple of the baseline
+DECREASE_FACTOR = 0.5  # Multiplicative decrease on 429/503
+LATENCY_DECREASE_FACTOR = 0.8  # Gentler decrease when the host is only slowing down
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `burst` saved up.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        # Seconds until a token is available (0 if one is available now)
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+def _retry_after(value):
+    # Retry-After is either delta-seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    """
+    Rate and concurrency limits for one host, adjusted with AIMD:
+
+    - every successful response adds 1/limit to the concurrency limit (about
+      +1 per round of requests) and 5% to the request rate;
+    - a 429/503 halves both and pauses the host for Retry-After, if given;
+    - time-to-headers inflating past LATENCY_INFLATION x the best seen
+      shrinks both by 20%, before the host starts refusing requests.
+
+    So each host settles just under the throughput it tolerates.
+    """
+
+    def __init__(self, host, rate=INITIAL_RATE, concurrency=INITIAL_CONCURRENCY):
+        self.host = host
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.base_latency = None  # Best recent time-to-headers, in seconds
+        self.requests = 0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self.condition.wait(self.paused_until - now)
+                    continue
+                if self.in_flight >= int(self.concurrency):
+                    self.condition.wait()
+                    continue
+                wait = self.bucket.wait_time(now)
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                self.bucket.take()
+                self.in_flight += 1
+                self.requests += 1
+                return
+
+    def release(self, status_code=None, latency=None, retry_after=None):
+        """
+        Records the outcome of a request started with acquire().
+
+        Args:
+            status_code (int): Response status, or None if the request failed outright.
+            latency (float): Seconds until the response headers arrived.
+            retry_after (str): The response's Retry-After header, if any.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if status_code in THROTTLE_STATUSES:
+                self.throttled += 1
+                self._decrease(DECREASE_FACTOR)
+                pause = _retry_after(retry_after)
+                if pause:
+                    self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            elif status_code is not None and status_code < 400 and latency is not None:
+                if self.base_latency is None or latency < self.base_latency:
+                    self.base_latency = latency
+                else:
+                    # Let the baseline drift up slowly so one lucky fast request doesn't pin it
+                    self.base_latency += (latency - self.base_latency) * 0.01
+                if latency > self.base_latency * LATENCY_INFLATION:
+                    self._decrease(LATENCY_DECREASE_FACTOR)
+                else:
+                    self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1 / self.concurrency)
+                    self.bucket.rate = min(MAX_RATE, self.bucket.rate * 1.05)
+                    self.bucket.burst = max(1.0, self.bucket.rate)
+            self.condition.notify_all()
+
+    def _decrease(self, factor):
+        self.concurrency = max(MIN_CONCURRENCY, self.concurrency * factor)
+        self.bucket.rate = max(MIN_RATE, self.bucket.rate * factor)
+        self.bucket.burst = max(1.0, self.bucket.rate)
+        self.bucket.tokens = min(self.bucket.tokens, self.bucket.burst)
+
+    def metrics(self):
+        with self.condition:
+            return {
+                "rate": round(self.bucket.rate, 3),
+                "concurrency": round(self.concurrency, 3),
+                "in_flight": self.in_flight,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+                "base_latency": round(self.base_latency, 4) if self.base_latency is not None else None,
+                "requests": self.requests,
+                "throttled": self.throttled,
+            }
+
+
+class RateLimiter:
+    """
+    One HostLimiter per host, created on first use.
+
+    Usage:
+        with limiter.slot(url) as slot:
+            response = session.get(url)
+            slot.record(response)
+    """
+
+    def __init__(self):
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host)
+            return self.hosts[host]
+
+    def slot(self, url):
+        return _Slot(self.for_host(url))
+
+    def metrics(self):
+        """
+        Returns:
+            dict: host -> current limits and counters.
+        """
+        with self._lock:
+            hosts = dict(self.hosts)
+        return {host: limiter.metrics() for host, limiter in hosts.items()}
+
+
+class _Slot:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.response = None
+
+    def record(self, response):
+        self.response = response
+
+    def __enter__(self):
+        self.limiter.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.response is None:
+            self.limiter.release()  # Connection error, timeout...
+        else:
+            elapsed = getattr(self.response, "elapsed", None)
+            self.limiter.release(
+                self.response.status_code,
+                elapsed.total_seconds() if elapsed is not None else None,
+                self.response.headers.get("Retry-After"),
+            )
+
+
+# Shared by every download in the process (see httpcache.py)
+limiter = RateLimiter()
@@ -1,17 +1,20 @@
 import os
 import re
 import time
-import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from PIL import Image
 import mimetypes
 
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+
 # Selenium setup
 def setup_driver():
     chrome_options = Options()
@@ -20,7 +23,7 @@ def setup_driver():
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--start-maximized")
-    driver_service = Service(ChromeDriverManager().install())
+    driver_service = Service(chromedriver.driver_path())
     driver = webdriver.Chrome(service=driver_service, options=chrome_options)
     return driver
 
@@ -36,27 +39,32 @@ def split_image(image_path, output_folder, chapter_index, start_page_index, piec
         if img_height <= piece_height:
             output_filename = f"chapter{chapter_index}_{current_page_index:02}.{img_format}"
             output_path = os.path.join(output_folder, output_filename)
-            img.save(output_path, format=img_format.upper(), quality=100)
+            with metrics.stage("encode"):
+                img.save(output_path, format=img_format.upper(), quality=100)
             print(f"Saved: {output_path}")
             current_page_index += 1
         else:
             num_pieces = img_height // piece_height
             for cut_number in range(num_pieces):
                 left, upper, right, lower = 0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height
-                piece = img.crop((left, upper, right, lower))
+                with metrics.stage("slice"):
+                    piece = img.crop((left, upper, right, lower))
                 output_filename = f"chapter{chapter_index}_{current_page_index:02}.{img_format}"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, format=img_format.upper(), quality=100)
+                with metrics.stage("encode"):
+                    piece.save(output_path, format=img_format.upper(), quality=100)
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
             remainder = img_height % piece_height
             if remainder > 0:
                 box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
                 output_filename = f"chapter{chapter_index}_{current_page_index:02}.{img_format}"
                 output_path = os.path.join(output_folder, output_filename)
-                piece.save(output_path, format=img_format.upper(), quality=100)
+                with metrics.stage("encode"):
+                    piece.save(output_path, format=img_format.upper(), quality=100)
                 print(f"Saved: {output_path}")
                 current_page_index += 1
 
@@ -64,18 +72,20 @@ def split_image(image_path, output_folder, chapter_index, start_page_index, piec
 
 def scrape_chapters(driver, manga_url):
     print(f"Scraping chapters from {manga_url}")
-    driver.get(manga_url)
+    with metrics.stage("render"):
+        driver.get(manga_url)
 
-    try:
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div.Chapters_container__5S4y_"))
-        )
-    except Exception as e:
-        print(f"Failed to load chapters: {e}")
-        return []
+        try:
+            WebDriverWait(driver, 30).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "div.Chapters_container__5S4y_"))
+            )
+        except Exception as e:
+            print(f"Failed to load chapters: {e}")
+            return []
 
     chapters = []
-    chapter_elements = driver.find_elements(By.CSS_SELECTOR, "div.Chapters_container__5S4y_ a.Chapters_chapterItem__4Wz_G")
+    with metrics.stage("parse"):
+        chapter_elements = driver.find_elements(By.CSS_SELECTOR, "div.Chapters_container__5S4y_ a.Chapters_chapterItem__4Wz_G")
     for chapter_element in chapter_elements:
         href = chapter_element.get_attribute("href")
         chapter_text = chapter_element.find_element(By.CSS_SELECTOR, "span.Chapters_tome__tBNYU").text
@@ -95,8 +105,6 @@ def scrape_chapters(driver, manga_url):
 # Download images for a chapter and handle lazy-loading
 def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index):
     print(f"Processing Chapter {chapter_index}: {chapter_url}")
-    driver.get(chapter_url)
-
     # Function to wait for and handle lazy loading of images
     def scroll_to_load_images():
         SCROLL_PAUSE_TIME = 2  # Pause to allow images to load
@@ -115,11 +123,15 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
                 break  # Exit if no new content is loaded
             last_height = new_height
 
-    # Execute scrolling to load all images for the current chapter
-    scroll_to_load_images()
+    with metrics.stage("render"):
+        driver.get(chapter_url)
 
-    # Find the images for the current chapter
-    image_elements = driver.find_elements(By.CSS_SELECTOR, "img#chapter-image")
+        # Execute scrolling to load all images for the current chapter
+        scroll_to_load_images()
+
+    with metrics.stage("parse"):
+        # Find the images for the current chapter
+        image_elements = driver.find_elements(By.CSS_SELECTOR, "img#chapter-image")
     
     # Log how many images are found
     print(f"Found {len(image_elements)} images for Chapter {chapter_index}")
@@ -161,7 +173,7 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
                 }
 
                 # Fetch the image data with headers
-                response = requests.get(img_url, headers=headers, timeout=10)
+                response = httpcache.get(img_url, headers=headers)
 
                 # Debug: Check the response status code
                 print(f"Image URL: {img_url}, Status Code: {response.status_code}")
@@ -193,8 +205,12 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
                     os.remove(temp_image_path)
                 else:
                     print(f"Failed to download image {img_url}, Status Code: {response.status_code}")
+                    fetchpolicy.record_failure(
+                        img_url, f"HTTP {response.status_code}", chapter_number=chapter_index, chapter_url=chapter_url, page=idx + 1
+                    )
             except Exception as e:
                 print(f"Error downloading or processing image {img_url}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_index, chapter_url=chapter_url, page=idx + 1)
         else:
             print(f"Invalid image URL: {img_url}")
 
@@ -202,19 +218,23 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
 def main():
     manga_url = "https://remanga.org/manga/on-the-way-to-see-mom?p=chapters"
     manga_title = "On the Way to See Mom"
-    driver = setup_driver()
-    try:
-        # Scrape chapters from the manga URL
-        chapters = scrape_chapters(driver, manga_url)
-
-        # Reverse the order of the chapters (latest first)
-        chapters.reverse()
-
-        # Process chapters in reversed order
-        for chapter_index, (chapter_number, chapter_url) in enumerate(chapters, start=1):
-            download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
-    finally:
-        driver.quit()
+    with metrics.labels(site="remanga", series=manga_title):
+        with metrics.stage("browser_start"):
+            driver = setup_driver()
+        try:
+            # Scrape chapters from the manga URL
+            with metrics.stage("list_scrape"):
+                chapters = scrape_chapters(driver, manga_url)
+
+            # Reverse the order of the chapters (latest first)
+            chapters.reverse()
+
+            # Process chapters in reversed order
+            for chapter_index, (chapter_number, chapter_url) in enumerate(chapters, start=1):
+                with metrics.labels(chapter=chapter_index):
+                    download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
+        finally:
+            driver.quit()
 
     print("Download completed!")
 
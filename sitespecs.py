@@ -0,0 +1,467 @@
+import argparse
+import concurrent.futures
+import contextlib
+import contextvars
+import json
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urljoin
+
+import requests
+
+import fetchpolicy
+import htmlextract
+import httpcache
+import metrics
+
+
+DOWNLOAD_THREADS = 4  # Images of a chapter downloaded at once (ratelimit.py still caps each host)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
+
+# One entry per site. Keys:
+#   chapter_list      CSS selector (or "xpath:..." expression) matching the chapter links
+#   chapter_number    Regex whose first group is the chapter number
+#   number_from       Where chapter_number is matched: "href" or "text" (the link's text)
+#   images            CSS selector (or "xpath:...") matching the page images
+#   image_attributes  Attributes holding the image URL, first non-empty wins
+#   image_filter      Optional regex an image URL must match (skips banners, avatars...)
+#   render            Pages that need JavaScript: any of "chapters", "images"
+#   wait              Seconds to let a rendered page settle
+#   referer           Send the chapter URL as Referer with image requests
+#   stream            Optional regex an <img> tag must match to be a page: the reader page's
+#                     images are then pulled out of the static HTML while it downloads
+#                     (no browser, no parse tree) and their downloads start right away
+#   scope             Optional {"chapters": text, "images": text}: parsing starts at the tag
+#                     containing this text (e.g. the list's container), skipping the page's
+#                     head and header; the whole page is parsed when it isn't found
+SITE_SPECS = {
+    "kingofshojo": {
+        "chapter_list": "div.eplister#chapterlist a[href]",
+        "chapter_number": r"Chapter (\d+)",
+        "number_from": "text",
+        "images": "div#readerarea.rdminimal img[src]",
+        "image_attributes": ["src"],
+        "image_filter": r"wp-content/uploads",
+        "stream": r"wp-content/uploads",
+        "render": ["images"],
+        "wait": 5,
+        "scope": {"chapters": 'id="chapterlist"', "images": 'id="readerarea"'},
+    },
+    "manhuaus": {
+        "chapter_list": "div.page-content-listing.single-page a[href]",
+        "chapter_number": r"chapter-(\d+(?:\.\d+)?)",
+        "number_from": "href",
+        "images": "img.wp-manga-chapter-img",
+        "image_attributes": ["data-src", "src"],
+        "stream": r"wp-manga-chapter-img",
+        "scope": {"chapters": "page-content-listing", "images": "reading-content"},
+    },
+    "bato_ing": {
+        "chapter_list": "div.group.flex.flex-col a[href]",
+        "chapter_number": r"ch_(\d+)",
+        "number_from": "href",
+        "images": "div[data-name='image-item'] img",
+        "image_attributes": ["src"],
+        "render": ["images"],
+        "wait": 5,
+        "scope": {"images": 'data-name="image-item"'},
+    },
+    "battwo": {
+        "chapter_list": "div[name='chapter-list'] a.link-hover",
+        "chapter_number": r"ch_(\d+)",
+        "number_from": "href",
+        "images": "div[name='image-items'] img",
+        "image_attributes": ["src"],
+        "render": ["chapters", "images"],
+        "wait": 5,
+        "scope": {"chapters": 'name="chapter-list"', "images": 'name="image-items"'},
+    },
+    "zbato": {
+        "chapter_list": "div.main a.visited.chapt",
+        "chapter_number": r"Chapter\s*(\d+)",
+        "number_from": "text",
+        "images": "#viewer .item img.page-img",
+        "image_attributes": ["src"],
+        "render": ["chapters", "images"],
+        "wait": 5,
+        "scope": {"images": 'id="viewer"'},
+    },
+    "bato": {
+        "chapter_list": "div.main a.chapt",
+        "chapter_number": r"chapter/(\d+)",
+        "number_from": "href",
+        "images": "#viewer img",
+        "image_attributes": ["src"],
+        "render": ["chapters", "images"],
+        "wait": 5,
+        "scope": {"images": 'id="viewer"'},
+    },
+    "naver": {
+        "chapter_list": "li.EpisodeListList__item--M8zq4 a[href]",
+        "chapter_number": r"no=(\d+)",
+        "number_from": "href",
+        "images": "img[alt='comic content']",
+        "image_attributes": ["data-src", "src"],
+        "render": ["chapters"],
+        "wait": 3,
+        "referer": True,
+        "scope": {"chapters": "EpisodeListList__item", "images": "wt_viewer"},
+    },
+    "remanga": {
+        "chapter_list": "div.Chapters_container__5S4y_ a.Chapters_chapterItem__4Wz_G",
+        "chapter_number": r"(\d+)",
+        "number_from": "text",
+        "images": "img#chapter-image",
+        "image_attributes": ["src"],
+        "render": ["chapters", "images"],
+        "wait": 5,
+        "referer": True,
+        "scope": {"chapters": "Chapters_container", "images": "chapter-image"},
+    },
+}
+
+
+# Function to load extra site specs from a JSON file ({"site name": {spec}, ...})
+def load_specs(path):
+    with open(path, "r", encoding="utf-8") as spec_file:
+        specs = json.load(spec_file)
+    SITE_SPECS.update(specs)
+    for name in specs:
+        _compiled.pop(name, None)
+    return list(specs)
+
+
+class _Selector:
+    # A CSS selector or "xpath:" expression run on lxml's tree, or, for CSS
+    # htmlextract can't translate (without cssselect), soupsieve on BeautifulSoup
+
+    def __init__(self, expression):
+        self.expression = expression
+        try:
+            self.xpath = htmlextract.compile_selector(expression)
+            self.css = None
+        except ValueError:
+            import soupsieve
+
+            self.xpath = None
+            self.css = soupsieve.compile(expression)
+
+    def select(self, document):
+        if self.css is not None:
+            return self.css.select(document.soup)
+        return self.xpath(document.tree)
+
+
+class _Document:
+    # Parses the HTML only into the tree the selector needs, from `scope` on
+
+    def __init__(self, html, scope=None):
+        self.html = html
+        self.scope = scope
+        self._soup = None
+        self._tree = None
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+
+            self._soup = BeautifulSoup(self.html, "html.parser")
+        return self._soup
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = htmlextract.parse(self.html, self.scope)
+        return self._tree
+
+
+def _attribute(element, name):
+    # bs4 Tag and lxml element both expose .get(); XPath may also return plain strings
+    if isinstance(element, str):
+        return element
+    return element.get(name)
+
+
+def _text(element):
+    if hasattr(element, "get_text"):
+        return element.get_text(" ", strip=True)
+    return htmlextract.text(element)
+
+
+def _chapter_number(value):
+    return float(value) if "." in value else int(value)
+
+
+class SiteExtractor:
+    """
+    A site spec with its selectors and regexes compiled once, reused for
+    every chapter and page of a run.
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.chapter_selector = _Selector(spec["chapter_list"])
+        self.image_selector = _Selector(spec["images"])
+        self.chapter_number = re.compile(spec["chapter_number"])
+        self.number_from = spec.get("number_from", "href")
+        self.image_attributes = spec.get("image_attributes", ["src"])
+        self.image_filter = re.compile(spec["image_filter"]) if spec.get("image_filter") else None
+        self.render = set(spec.get("render", ()))
+        self.wait = spec.get("wait", 0)
+        self.referer = spec.get("referer", False)
+        self.scope = spec.get("scope", {})
+        self.stream = spec.get("stream")
+
+    def chapters(self, html, base_url):
+        """
+        Returns:
+            list: (chapter number, absolute chapter URL), sorted by number, one per chapter.
+        """
+        with metrics.stage("parse"):
+            return self._chapters(html, base_url)
+
+    def _chapters(self, html, base_url):
+        chapters = {}
+        for link in self.chapter_selector.select(_Document(html, self.scope.get("chapters"))):
+            href = _attribute(link, "href")
+            if not href:
+                continue
+            source = href if self.number_from == "href" else _text(link)
+            match = self.chapter_number.search(source)
+            if match:
+                chapters.setdefault(_chapter_number(match.group(1)), urljoin(base_url, href))
+        return sorted(chapters.items())
+
+    def images(self, html, base_url):
+        """
+        Returns:
+            list: Absolute image URLs in page order, without duplicates.
+        """
+        with metrics.stage("parse"):
+            return self._images(html, base_url)
+
+    def _images(self, html, base_url):
+        urls = []
+        seen = set()
+        for img in self.image_selector.select(_Document(html, self.scope.get("images"))):
+            for attribute in self.image_attributes:
+                url = _attribute(img, attribute)
+                if url and url.strip():
+                    url = urljoin(base_url, url.strip())
+                    break
+            else:
+                continue
+            if self._keep(url, seen):
+                urls.append(url)
+        return urls
+
+    def stream_images(self, chunks, base_url):
+        """
+        Yields absolute image URLs, in page order and without duplicates, as
+        the chunks of HTML text arrive. Needs the spec's "stream" regex.
+        """
+        seen = set()
+        for url in htmlextract.stream_image_urls(chunks, self.image_attributes, self.stream, self.scope.get("images")):
+            url = urljoin(base_url, url)
+            if self._keep(url, seen):
+                yield url
+
+    def _keep(self, url, seen):
+        if url in seen or (self.image_filter and not self.image_filter.search(url)):
+            return False
+        seen.add(url)
+        return True
+
+
+_compiled = {}  # site name -> SiteExtractor
+
+
+def extractor_for(site):
+    if site not in _compiled:
+        if site not in SITE_SPECS:
+            raise ValueError(f"Unknown site {site!r}, expected one of: {', '.join(sorted(SITE_SPECS))}")
+        _compiled[site] = SiteExtractor(site, SITE_SPECS[site])
+    return _compiled[site]
+
+
+class PageFetcher:
+    """
+    Fetches HTML with requests, or through one shared headless Chrome for
+    pages that need JavaScript (started on first use, closed with the fetcher).
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._driver = None
+
+    def fetch(self, url, render=False, wait=0):
+        if not render:
+            with metrics.stage("fetch"):
+                response = fetchpolicy.get(url, session=self.session)
+                response.raise_for_status()
+            return response.text
+
+        if self._driver is None:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.chrome.service import Service
+
+            import chromedriver
+
+            options = Options()
+            options.add_argument("--headless")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--no-sandbox")
+            options.add_argument("--disable-dev-shm-usage")
+            with metrics.stage("browser_start"):
+                self._driver = webdriver.Chrome(service=Service(chromedriver.driver_path()), options=options)
+        with metrics.stage("render"):
+            self._driver.get(url)
+            time.sleep(wait)  # Let JavaScript load the page
+            return self._driver.page_source
+
+    def stream(self, url, chunk_size=16 * 1024):
+        """
+        Yields the page's HTML as decoded text chunks while it downloads (never rendered).
+        """
+        response = fetchpolicy.get(url, session=self.session, stream=True)
+        with response:
+            response.raise_for_status()
+            charset = re.search(r"charset=([\w-]+)", response.headers.get("Content-Type", ""))
+            response.encoding = charset.group(1) if charset else "utf-8"
+            yield from response.iter_content(chunk_size, decode_unicode=True)
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Function to download and split a range of chapters of any site in SITE_SPECS
+def download_series(site, manga_url, manga_title, output_folder, start=1, end=None, piece_height=2000, preset=None,
+                    fetcher=None):
+    """
+    Scrapes the chapter list, then downloads every chapter in [start, end]
+    (1-based positions in the sorted list) and splits its pages with
+    spliceTool.split_image into <output_folder>/<title>/chapter_<n>/.
+
+    fetcher: a PageFetcher to use instead of a new one (left open).
+    """
+    from spliceTool import split_image
+
+    extractor = extractor_for(site)
+    os.makedirs(output_folder, exist_ok=True)
+    with (
+        metrics.labels(site=site, series=manga_title),
+        contextlib.nullcontext(fetcher) if fetcher is not None else PageFetcher() as fetcher,
+        tempfile.TemporaryDirectory(dir=output_folder, prefix=".download-") as download_folder,
+        concurrent.futures.ThreadPoolExecutor(max_workers=DOWNLOAD_THREADS) as pool,
+    ):
+        with metrics.stage("list_scrape"):
+            html = fetcher.fetch(manga_url, "chapters" in extractor.render, extractor.wait)
+            chapters = extractor.chapters(html, manga_url)
+        print(f"Found {len(chapters)} chapters.")
+
+        for chapter_number, chapter_url in chapters[start - 1:end]:
+            with metrics.labels(chapter=chapter_number):
+                print(f"Processing Chapter {chapter_number}: {chapter_url}")
+                headers = {"User-Agent": USER_AGENT}
+                if extractor.referer:
+                    headers["Referer"] = chapter_url
+
+                try:
+                    downloads = _start_downloads(extractor, fetcher, pool, chapter_url, headers)
+                except Exception as e:
+                    print(f"Failed to fetch chapter page: {e}")
+                    continue
+                if not downloads:
+                    print(f"No images found for Chapter {chapter_number}.")
+                    continue
+
+                page_index = 1
+                for image_index, (image_url, download) in enumerate(downloads, start=1):
+                    try:
+                        response = download.result()
+                        response.raise_for_status()
+                    except Exception as e:
+                        print(f"Failed to download {image_url}: {e}")
+                        fetchpolicy.record_failure(
+                            image_url, e, chapter_number=chapter_number, chapter_url=chapter_url, page=image_index
+                        )
+                        continue
+
+                    extension = os.path.splitext(image_url.split("?")[0])[1].lower() or ".jpg"
+                    image_path = os.path.join(download_folder, f"{chapter_number}-{image_index}{extension}")
+                    with open(image_path, "wb") as image_file:
+                        image_file.write(response.content)
+                    try:
+                        page_index = split_image(
+                            image_path, output_folder, manga_title, chapter_number, page_index,
+                            piece_height=piece_height, preset=preset
+                        )
+                    finally:
+                        os.remove(image_path)
+                print(f"Chapter {chapter_number}: {page_index - 1} pages")
+
+
+# Function to find a chapter's images and queue their downloads as soon as each URL is known
+def _start_downloads(extractor, fetcher, pool, chapter_url, headers):
+    """
+    Returns:
+        list: (image URL, future of its httpcache response), in page order.
+    """
+    def submit(image_url):
+        # copy_context() carries the metrics labels into the download thread
+        future = pool.submit(contextvars.copy_context().run, httpcache.get, image_url, headers=headers, timeout=10)
+        downloads.append((image_url, future))
+
+    downloads = []
+    if extractor.stream is not None:
+        try:
+            with metrics.stage("fetch"):
+                for image_url in extractor.stream_images(fetcher.stream(chapter_url), chapter_url):
+                    submit(image_url)  # While the rest of the page is still downloading
+        except Exception:
+            for _, future in downloads:
+                future.cancel()
+            raise
+        if downloads:
+            return downloads
+        # Nothing matched in the static HTML: fall back to the regular extraction
+
+    html = fetcher.fetch(chapter_url, "images" in extractor.render, extractor.wait)
+    for image_url in extractor.images(html, chapter_url):
+        submit(image_url)
+    return downloads
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download a series from any site described by a spec.")
+    parser.add_argument("site", help="Site name from SITE_SPECS (or from --spec-file)")
+    parser.add_argument("manga_url")
+    parser.add_argument("manga_title")
+    parser.add_argument("output_folder", nargs="?", default=".")
+    parser.add_argument("--start", type=int, default=1, help="First chapter (1-based position in the list)")
+    parser.add_argument("--end", type=int, default=None, help="Last chapter (inclusive)")
+    parser.add_argument("--height", type=int, default=2000, help="Split pages taller than this")
+    parser.add_argument("--preset", default=None, help="Encoder preset (see encoders.PRESETS)")
+    parser.add_argument("--spec-file", default=None, help="JSON file with extra site specs")
+    args = parser.parse_args()
+
+    if args.spec_file:
+        load_specs(args.spec_file)
+    download_series(
+        args.site, args.manga_url, args.manga_title, args.output_folder,
+        args.start, args.end, args.height, args.preset
+    )
@@ -1,7 +1,107 @@
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from PIL import Image
 from natsort import natsorted
 
+import metrics
+from castore import ImageStore
+from cbz import CbzWriter, pack_volumes
+from encoders import encode_to_bytes, extension_for
+from gutters import cut_boxes
+from inotify import IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_ISDIR, IN_MOVED_FROM, IN_MOVED_TO, Inotify
+from phash import HashIndex, hash_file
+
+
+SPLIT_INDEX_NAME = ".splice_index.json"
+
+
+def chapter_output_folder(output_base_folder, manga_title, chapter_number):
+    manga_title = manga_title.lower().replace(" ", "_")
+    return os.path.join(output_base_folder, manga_title, f"chapter_{chapter_number}")
+
+
+def fast_hash(image_path, size, sample_size=65536):
+    # Hash the size plus the first and last 64 KiB: enough to notice a
+    # re-download or re-encode without reading whole multi-MB strips.
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(image_path, "rb") as image_file:
+        digest.update(image_file.read(sample_size))
+        if size > 2 * sample_size:
+            image_file.seek(-sample_size, os.SEEK_END)
+        digest.update(image_file.read(sample_size))
+    return digest.hexdigest()
+
+
+def source_signatures(image_paths, previous=None):
+    """
+    Returns {path: [size, mtime_ns, fast hash]} for a chapter's sources.
+
+    Files whose size and mtime match the previous run reuse the stored hash,
+    so unchanged chapters cost one stat() per file.
+    """
+    previous = previous or {}
+    signatures = {}
+    for image_path in image_paths:
+        stat = os.stat(image_path)
+        old = previous.get(image_path)
+        if old and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+            signatures[image_path] = old
+        else:
+            signatures[image_path] = [stat.st_size, stat.st_mtime_ns, fast_hash(image_path, stat.st_size)]
+    return signatures
+
+
+def load_split_index(output_folder):
+    index_path = os.path.join(output_folder, SPLIT_INDEX_NAME)
+    if not os.path.exists(index_path):
+        return {"chapters": {}}
+    with open(index_path, "r", encoding="utf-8") as index_file:
+        return json.load(index_file)
+
+
+def save_split_index(output_folder, split_index):
+    os.makedirs(output_folder, exist_ok=True)
+    index_path = os.path.join(output_folder, SPLIT_INDEX_NAME)
+    with open(index_path + ".tmp", "w", encoding="utf-8") as index_file:
+        json.dump(split_index, index_file)
+    os.replace(index_path + ".tmp", index_path)
+
+
+def save_page(page, chapter_folder, page_index, file_extension, preset=None, cbz=None, store=None):
+    # preset=None keeps the source format at full quality, otherwise the page
+    # is re-encoded with one of the encoders.PRESETS ("archive", "reader", ...).
+    # With a CbzWriter the page goes straight into the chapter archive; with
+    # an ImageStore it is stored once and hardlinked into the chapter folder.
+    if cbz is not None:
+        with metrics.stage("encode"):
+            return cbz.add_page(page, preset=preset, file_extension=file_extension)
+
+    # Encoding and writing are kept apart so each shows up as its own stage
+    with metrics.stage("encode"):
+        if preset is None:
+            buffer = io.BytesIO()
+            page.save(buffer, Image.registered_extensions().get(file_extension, "JPEG"), quality=100)  # Preserve quality
+            data = buffer.getvalue()
+        else:
+            data = encode_to_bytes(page, preset)
+            file_extension = extension_for(preset)
+    output_path = os.path.join(chapter_folder, f"page_{page_index}{file_extension}")
+
+    with metrics.stage("write"):
+        if store is not None:
+            store.materialize(store.put_bytes(data), output_path)
+        else:
+            with open(output_path, "wb") as page_file:
+                page_file.write(data)
+    return output_path
+
 
 def split_image(
     image_path, 
@@ -9,87 +109,590 @@ def split_image(
     manga_title, 
     chapter_number, 
     start_page_index=1, 
-    piece_height=1600
+    piece_height=1600,
+    gutter_tolerance=None,
+    preset=None,
+    cbz=None,
+    store=None
 ):
+    # gutter_tolerance: when set, cuts move up to this many pixels to land in
+    # a blank gutter instead of slicing through panels (see gutters.py)
+
     # Prepare folder structure
-    manga_title = manga_title.lower().replace(" ", "_")
-    chapter_folder = os.path.join(output_base_folder, manga_title, f"chapter_{chapter_number}")
-    os.makedirs(chapter_folder, exist_ok=True)
+    chapter_folder = chapter_output_folder(output_base_folder, manga_title, chapter_number)
+    if cbz is None:
+        os.makedirs(chapter_folder, exist_ok=True)
 
     # Open the original image
     with Image.open(image_path) as img:
+        with metrics.stage("decode"):
+            img.load()
         img_width, img_height = img.size
         current_page_index = start_page_index
         file_extension = os.path.splitext(image_path)[1].lower()  # Preserve original format
 
         # If image height is less than or equal to the piece height, save as a single piece
         if img_height <= piece_height:
-            output_filename = f"page_{current_page_index}{file_extension}"
-            output_path = os.path.join(chapter_folder, output_filename)
-            img.save(output_path, quality=100)  # Preserve quality
+            save_page(img, chapter_folder, current_page_index, file_extension, preset, cbz, store)
             current_page_index += 1
         else:
-            # Split the image into pieces
-            num_pieces = img_height // piece_height
-            for cut_number in range(num_pieces):
-                box = (0, cut_number * piece_height, img_width, (cut_number + 1) * piece_height)
-                piece = img.crop(box)
-                output_filename = f"page_{current_page_index}{file_extension}"
-                output_path = os.path.join(chapter_folder, output_filename)
-                piece.save(output_path, quality=100)  # Preserve quality
+            # Split the image into pieces (fixed height, or snapped to gutters)
+            with metrics.stage("slice"):
+                boxes = cut_boxes(img, piece_height, tolerance=gutter_tolerance)
+            for box in boxes:
+                with metrics.stage("slice"):
+                    piece = img.crop(box)
+                save_page(piece, chapter_folder, current_page_index, file_extension, preset, cbz, store)
                 current_page_index += 1
 
-            # Handle the remainder (if any)
-            remainder = img_height % piece_height
-            if remainder > 0:
-                box = (0, img_height - remainder, img_width, img_height)
-                piece = img.crop(box)
-                output_filename = f"page_{current_page_index}{file_extension}"
-                output_path = os.path.join(chapter_folder, output_filename)
-                piece.save(output_path, quality=100)  # Preserve quality
-                current_page_index += 1
+    return current_page_index
+
+
+def split_chapter_stream(
+    image_paths,
+    output_base_folder,
+    manga_title,
+    chapter_number,
+    start_page_index=1,
+    piece_height=1600,
+    preset=None,
+    cbz=None,
+    store=None
+):
+    """
+    Splits a whole chapter as one continuous vertical strip.
+
+    Sites like Naver serve a chapter as many fixed-height slices, so cutting
+    each file on its own leaves an odd-height remainder at every boundary.
+    Here the images are read one at a time and fed through a rolling buffer
+    that never holds more than one page worth of rows, so every page except
+    the last is exactly `piece_height` tall.
+
+    Args:
+        image_paths (list): Chapter images in reading order.
+        output_base_folder (str): Root of the output tree.
+        manga_title (str): Manga title.
+        chapter_number (str|int): Chapter folder name / number.
+        start_page_index (int): Starting page index for naming the pieces.
+        piece_height (int): Height of each output page in pixels.
+        preset (str): Encoder preset name (see encoders.PRESETS), None keeps the source format.
+        cbz (cbz.CbzWriter): When given, pages are added to this archive instead of written as files.
+        store (castore.ImageStore): When given, pages are stored once and hardlinked into place.
+
+    Returns:
+        int: Next page index after processing the chapter.
+    """
+    chapter_folder = chapter_output_folder(output_base_folder, manga_title, chapter_number)
+    if cbz is None:
+        os.makedirs(chapter_folder, exist_ok=True)
+
+    current_page_index = start_page_index
+    if not image_paths:
+        return current_page_index
+
+    file_extension = os.path.splitext(image_paths[0])[1].lower()
+    page_width = None
+    page_mode = None
+    buffer = []  # Strips waiting to be emitted, never taller than piece_height in total
+    buffered_height = 0
+
+    def flush():
+        nonlocal buffer, buffered_height, current_page_index
+        with metrics.stage("slice"):
+            if len(buffer) == 1:
+                page = buffer[0]
+            else:
+                page = Image.new(page_mode, (page_width, buffered_height))
+                top = 0
+                for strip in buffer:
+                    page.paste(strip, (0, top))
+                    top += strip.height
+        save_page(page, chapter_folder, current_page_index, file_extension, preset, cbz, store)
+        current_page_index += 1
+        buffer = []
+        buffered_height = 0
+
+    for image_path in image_paths:
+        with Image.open(image_path) as img:
+            with metrics.stage("decode"):
+                img.load()
+                if page_width is None:
+                    page_width = img.width
+                    page_mode = "RGB" if img.mode == "P" else img.mode
+                    if preset is None and file_extension in (".jpg", ".jpeg") and page_mode not in ("RGB", "L"):
+                        page_mode = "RGB"
+                if img.mode != page_mode:
+                    img = img.convert(page_mode)
+                if img.width != page_width:
+                    # Mirrors occasionally mix widths, scale to the first image's width
+                    new_height = max(1, round(img.height * page_width / img.width))
+                    img = img.resize((page_width, new_height), Image.LANCZOS)
+
+            top = 0
+            while top < img.height:
+                take = min(piece_height - buffered_height, img.height - top)
+                with metrics.stage("slice"):
+                    buffer.append(img.crop((0, top, page_width, top + take)))
+                buffered_height += take
+                top += take
+                if buffered_height == piece_height:
+                    flush()
+
+    # Whatever is left becomes the final (shorter) page
+    if buffer:
+        flush()
 
     return current_page_index
 
 
-def process_manga_folder(input_folder, output_folder, image_height):
-    for root, _, files in os.walk(input_folder):
-        relative_path = os.path.relpath(root, input_folder)
-        parts = root.split(os.sep)
+def filter_junk_pages(image_paths, junk_index):
+    """
+    Drops known junk pages (credits, ads, banners) from a chapter.
+
+    Args:
+        image_paths (list): Chapter images in reading order.
+        junk_index (phash.HashIndex): Index holding the junk page hashes.
 
-        # Skip folders without valid structure
-        if len(parts) < 2:
-            print(f"Skipping folder: {root} (not a valid manga/chapter structure)")
+    Returns:
+        tuple: (image paths that are not junk, their dHashes)
+    """
+    kept_paths = []
+    page_hashes = []
+    for image_path in image_paths:
+        hash_value = hash_file(image_path)
+        label = junk_index.junk_label(hash_value=hash_value)
+        if label is not None:
+            print(f"  Skipping junk page: {image_path} (matches {label})")
             continue
+        kept_paths.append(image_path)
+        page_hashes.append(hash_value)
+    return kept_paths, page_hashes
+
+
+def process_chapter(task):
+    """
+    Splits every image of one chapter. Runs in a worker process when
+    process_manga_folder is given jobs > 1, so page numbering
+    (start_page_index) stays continuous within the chapter.
+
+    Args:
+        task (dict): Chapter paths and split options built by process_manga_folder.
+
+    Returns:
+        dict: Chapter key, pages written, source bytes read, page hashes and,
+        from a worker process, its stage timings.
+    """
+    with metrics.labels(series=task["manga_title"], chapter=task["chapter_folder"]):
+        result = _split_chapter(task)
+    if multiprocessing.parent_process() is not None:
+        result["metrics"] = metrics.registry.drain()  # Merged by process_manga_folder
+    return result
+
 
-        # Extract manga title and chapter folder
-        manga_title = parts[0]
-        chapter_folder = parts[1]
+def _split_chapter(task):
+    manga_title = task["manga_title"]
+    chapter_folder = task["chapter_folder"]
+    image_paths = task["image_paths"]
+    print(f"Processing: Manga '{manga_title}', Chapter '{chapter_folder}'")
 
-        print(f"Processing: Manga '{manga_title}', Chapter '{chapter_folder}'")
+    page_hashes = None
+    if task["junk_index"] is not None:
+        image_paths, page_hashes = filter_junk_pages(image_paths, task["junk_index"])
 
-        start_page_index = 1
-        for file_name in natsorted(files):
-            if file_name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                image_path = os.path.join(root, file_name)
+    source_bytes = sum(os.path.getsize(image_path) for image_path in image_paths)
+    store = task.get("store")
+    if store is not None:
+        for image_path in image_paths:
+            store.put_file(image_path)  # Keep the downloaded originals too (reflinks only, unless copy_originals)
+    start_page_index = 1
+
+    # Rebuilding a chapter: drop the pages from the previous run first so
+    # that a chapter which lost pages doesn't keep stale ones
+    for output in task.get("stale_outputs", []):
+        stale_path = os.path.join(task["output_folder"], output)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    chapter_folder_path = chapter_output_folder(task["output_folder"], manga_title, chapter_folder)
+    cbz = None
+    if task.get("output_format") == "cbz":
+        cbz = CbzWriter(chapter_folder_path + ".cbz", series=manga_title, number=chapter_folder)
+
+    try:
+        if task["stitch"]:
+            if image_paths:
+                print(f"  Stitching {len(image_paths)} images")
+                start_page_index = split_chapter_stream(
+                    image_paths=image_paths,
+                    output_base_folder=task["output_folder"],
+                    manga_title=manga_title,
+                    chapter_number=chapter_folder,
+                    piece_height=task["piece_height"],
+                    preset=task["preset"],
+                    cbz=cbz,
+                    store=store,
+                )
+        else:
+            for image_path in image_paths:
                 print(f"  Splitting: {image_path}")
                 start_page_index = split_image(
                     image_path=image_path,
-                    output_base_folder=output_folder,
+                    output_base_folder=task["output_folder"],
                     manga_title=manga_title,
                     chapter_number=chapter_folder,
                     start_page_index=start_page_index,
-                    piece_height=image_height,
+                    piece_height=task["piece_height"],
+                    gutter_tolerance=task["gutter_tolerance"],
+                    preset=task["preset"],
+                    cbz=cbz,
+                    store=store,
                 )
+    except BaseException:
+        if cbz is not None:
+            cbz.abort()  # Don't leave a half-written <chapter>.cbz.tmp behind
+        raise
+
+    outputs = []
+    if cbz is not None:
+        cbz.close()
+        outputs = [os.path.relpath(cbz.path, task["output_folder"])]
+    elif os.path.isdir(chapter_folder_path):
+        outputs = [
+            os.path.relpath(os.path.join(chapter_folder_path, file_name), task["output_folder"])
+            for file_name in natsorted(os.listdir(chapter_folder_path))
+        ]
+
+    return {
+        "chapter_key": os.path.join(manga_title, chapter_folder),
+        "outputs": outputs,
+        "pages": start_page_index - 1,
+        "bytes": source_bytes,
+        "page_hashes": page_hashes,
+    }
+
+
+def plan_chapter(root, files, input_folder, output_folder, options, split_index, worker_junk_index=None, store=None,
+                 force=False):
+    """
+    Builds the process_chapter task for one chapter folder under input_folder
+    (the manga folder; its name is the manga title).
+
+    Returns:
+        tuple: (task, source signatures, chapter key). The task is None when
+        the folder has no images (signatures None too) or when the split
+        index shows the chapter is unchanged (never with force=True).
+    """
+    # Manga title and chapter folder, relative to input_folder so an absolute or
+    # nested input path still gives every chapter its own key and output folder
+    manga_title = os.path.basename(os.path.abspath(input_folder))
+    chapter_folder = os.path.relpath(root, input_folder).replace(os.sep, "_")
+    chapter_key = os.path.join(manga_title, chapter_folder)
+
+    image_paths = [
+        os.path.join(root, file_name)
+        for file_name in natsorted(files)
+        if file_name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))
+    ]
+    if not image_paths:
+        return None, None, chapter_key
+
+    entry = split_index["chapters"].get(chapter_key)
+    signatures = source_signatures(image_paths, entry["sources"] if entry else None)
+    if (
+        not force
+        and entry
+        and entry["options"] == options
+        and entry["sources"] == signatures
+        and all(os.path.exists(os.path.join(output_folder, output)) for output in entry["outputs"])
+    ):
+        return None, signatures, chapter_key
+
+    task = {
+        "manga_title": manga_title,
+        "chapter_folder": chapter_folder,
+        "image_paths": image_paths,
+        "output_folder": output_folder,
+        "piece_height": options["piece_height"],
+        "stitch": options["stitch"],
+        "gutter_tolerance": options["gutter_tolerance"],
+        "preset": options["preset"],
+        "output_format": options["output_format"],
+        "store": store,
+        "junk_index": worker_junk_index,
+        "stale_outputs": entry["outputs"] if entry else [],
+    }
+    return task, signatures, chapter_key
+
+
+def record_chapter(result, signatures, options, split_index, junk_index=None):
+    split_index["chapters"][result["chapter_key"]] = {
+        "options": options,
+        "sources": signatures,
+        "outputs": result["outputs"],
+    }
+    if junk_index is not None:
+        duplicates = junk_index.add_chapter(result["chapter_key"], result["page_hashes"])
+        if duplicates:
+            print(f"Warning: {result['chapter_key']} looks like a duplicate of {', '.join(duplicates)}")
+
+
+def _run_chapters(tasks, jobs):
+    """
+    Yields (task, function returning its process_chapter result) as chapters
+    finish. Whole chapters are sharded across processes; a chapter is never
+    split between workers so its page numbering stays continuous.
+    """
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(process_chapter, task): task for task in tasks}
+            for future in as_completed(futures):
+                yield futures[future], future.result
+    else:
+        for task in tasks:
+            yield task, lambda task=task: process_chapter(task)
+
+
+def _stage_totals():
+    totals = {}
+    for (_, _, stage), histogram in list(metrics.registry.histograms.items()):
+        totals[stage] = totals.get(stage, 0.0) + histogram.sum
+    return totals
+
+
+def process_manga_folder(input_folder, output_folder, image_height, stitch=False, gutter_tolerance=None, preset=None,
+                         junk_index=None, jobs=1, incremental=True, output_format="files", store=None):
+    """
+    Splits every chapter under input_folder into output_folder.
 
+    An index in the output tree records each chapter's sources (size, mtime,
+    fast hash), the split options and the pages it produced. With
+    incremental=True chapters whose sources and options are unchanged are
+    skipped and changed ones are rebuilt; incremental=False rebuilds every
+    chapter. Either way a rebuilt chapter's old outputs are removed first
+    and the index is saved, so it always matches the output tree.
+
+    output_format "files" writes loose page images per chapter folder;
+    "cbz" streams each chapter into <chapter folder>.cbz instead.
+
+    With a castore.ImageStore, pages are kept once in the store and the
+    output tree is made of hardlinks into it. Originals are added too when
+    they can be reflinked, or always with ImageStore(copy_originals=True).
+    """
+    started = time.perf_counter()
+    stage_baseline = _stage_totals()  # The registry is process-wide; report only this run's share
+    split_index = load_split_index(output_folder)
+    options = {"piece_height": image_height, "stitch": stitch, "gutter_tolerance": gutter_tolerance, "preset": preset,
+               "output_format": output_format}
+    signatures = {}
+    skipped = 0
+    worker_junk_index = junk_index.junk_only() if junk_index is not None else None
+
+    tasks = []
+    for root, _, files in os.walk(input_folder):
+        # The manga folder itself holds chapter folders, not pages
+        if os.path.relpath(root, input_folder) == os.curdir:
+            continue
+
+        task, chapter_signatures, chapter_key = plan_chapter(
+            root, files, input_folder, output_folder, options, split_index, worker_junk_index, store,
+            force=not incremental,
+        )
+        if task is None:
+            if chapter_signatures is not None:
+                skipped += 1
+            continue
+        signatures[chapter_key] = chapter_signatures
+        tasks.append(task)
+
+    results = []
+    failed = []
+    for task, get_result in _run_chapters(tasks, jobs):
+        chapter_key = os.path.join(task["manga_title"], task["chapter_folder"])
+        try:
+            result = get_result()
+        except Exception as e:
+            # One bad chapter doesn't stop the run; it stays out of the index and is retried next time
+            print(f"Error splitting {chapter_key}: {e}")
+            failed.append(chapter_key)
+            continue
+        if result.get("metrics"):
+            metrics.registry.merge(result["metrics"])
+        record_chapter(result, signatures[chapter_key], options, split_index, junk_index)
+        results.append(result)
+    save_split_index(output_folder, split_index)
+    if junk_index is not None:
+        junk_index.save()
+
+    elapsed = time.perf_counter() - started
+    total_pages = sum(result["pages"] for result in results)
+    total_mb = sum(result["bytes"] for result in results) / (1024 * 1024)
     print("Processing complete!")
+    if failed:
+        print(f"{len(failed)} chapters failed: {', '.join(sorted(failed))}")
+    if skipped:
+        print(f"Skipped {skipped} unchanged chapters")
+    print(
+        f"{len(results)} chapters, {total_pages} pages, {total_mb:.1f} MB in {elapsed:.1f}s "
+        f"({total_pages / elapsed if elapsed else 0:.1f} pages/sec, {total_mb / elapsed if elapsed else 0:.1f} MB/sec)"
+    )
+    stage_totals = {
+        stage: seconds - stage_baseline.get(stage, 0.0)
+        for stage, seconds in _stage_totals().items()
+        if seconds > stage_baseline.get(stage, 0.0)
+    }
+    if stage_totals:
+        print("Stage time (all workers): " + ", ".join(
+            f"{stage} {stage_totals[stage]:.1f}s" for stage in metrics.STAGES if stage in stage_totals
+        ))
+
+
+def watch_manga_folder(input_folder, output_folder, image_height, stitch=False, gutter_tolerance=None, preset=None,
+                       junk_index=None, jobs=1, quiet_period=30.0, marker_name=".done", output_format="files",
+                       store=None):
+    """
+    Splits chapters as soon as a downloader finishes them (Linux inotify).
+
+    A chapter folder counts as complete when a marker file (marker_name)
+    appears in it, or when nothing in it has changed for quiet_period
+    seconds. Complete chapters go to a process pool right away, so slicing
+    overlaps with downloads still in progress. Chapters that change again
+    later are re-split through the split index.
+    """
+    # Catch up on chapters that landed while nobody was watching
+    process_manga_folder(input_folder, output_folder, image_height, stitch=stitch, gutter_tolerance=gutter_tolerance,
+                         preset=preset, junk_index=junk_index, jobs=jobs, output_format=output_format, store=store)
+
+    split_index = load_split_index(output_folder)
+    options = {"piece_height": image_height, "stitch": stitch, "gutter_tolerance": gutter_tolerance, "preset": preset,
+               "output_format": output_format}
+    worker_junk_index = junk_index.junk_only() if junk_index is not None else None
+    chapter_mask = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+    pending = {}  # chapter path -> time of last activity (None once the marker file appeared)
+    running = {}  # future -> (chapter path, source signatures)
+
+    with Inotify() as notifier, ProcessPoolExecutor(max_workers=max(1, jobs)) as executor:
+        notifier.add_watch(input_folder, IN_CREATE | IN_MOVED_TO)
+        for entry in os.scandir(input_folder):
+            if entry.is_dir():
+                notifier.add_watch(entry.path, chapter_mask)
+        print(f"Watching '{input_folder}' (marker '{marker_name}', quiet period {quiet_period:.0f}s)")
+
+        try:
+            while True:
+                for path, name, mask in notifier.read_events(timeout=1.0):
+                    if path == input_folder:
+                        if mask & IN_ISDIR:
+                            chapter_path = os.path.join(input_folder, name)
+                            notifier.add_watch(chapter_path, chapter_mask)
+                            pending[chapter_path] = time.monotonic()
+                    elif name == marker_name:
+                        pending[path] = None
+                    elif pending.get(path, 0) is not None:
+                        pending[path] = time.monotonic()
+
+                now = time.monotonic()
+                busy = {chapter_path for chapter_path, _ in running.values()}
+                for chapter_path, last_activity in list(pending.items()):
+                    if chapter_path in busy:
+                        continue
+                    if last_activity is not None and now - last_activity < quiet_period:
+                        continue
+                    del pending[chapter_path]
+                    if not os.path.isdir(chapter_path):
+                        continue
+
+                    task, signatures, _ = plan_chapter(
+                        chapter_path, os.listdir(chapter_path), input_folder, output_folder, options, split_index,
+                        worker_junk_index, store,
+                    )
+                    if task is not None:
+                        running[executor.submit(process_chapter, task)] = (chapter_path, signatures)
+
+                for future in [future for future in running if future.done()]:
+                    chapter_path, signatures = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Error splitting {chapter_path}: {e}")
+                        continue
+                    record_chapter(result, signatures, options, split_index, junk_index)
+                    save_split_index(output_folder, split_index)
+                    if junk_index is not None:
+                        junk_index.save()
+                    print(f"Chapter done: {result['chapter_key']} ({result['pages']} pages)")
+        except KeyboardInterrupt:
+            print("Stopping watch mode")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split downloaded manga chapters into pages.")
     # Define the input and output folders
-    input_folder = "The reason why raeliana ended up at the duke’s mansion"  # Replace with the path to your manga folder
-    output_folder = "SPLIT The reason why raeliana ended up at the duke’s mansion"  # Replace with the desired output folder
-    image_height = 2000  # You can adjust this value as needed
-    
-    # Process all images in the manga folder
-    process_manga_folder(input_folder, output_folder, image_height)
\ No newline at end of file
+    parser.add_argument("input_folder", nargs="?", default="The reason why raeliana ended up at the duke’s mansion")
+    parser.add_argument("output_folder", nargs="?", default="SPLIT The reason why raeliana ended up at the duke’s mansion")
+    parser.add_argument("--height", type=int, default=2000, help="Height of each page in pixels")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of chapters split in parallel (processes)")
+    parser.add_argument("--stitch", action="store_true",
+                        help="Treat each chapter as one continuous strip (uniform page heights)")
+    parser.add_argument("--gutter-tolerance", type=int, default=None,
+                        help="Move cuts up to this many pixels to land in whitespace gutters (e.g. 200)")
+    parser.add_argument("--preset", default=None, help="Encoder preset: archive, reader, compact or e-ink")
+    parser.add_argument("--cbz", action="store_true",
+                        help="Write one CBZ per chapter (with ComicInfo.xml) instead of loose page files")
+    parser.add_argument("--chapters-per-volume", type=int, default=None,
+                        help="With --cbz: also pack the chapter CBZs into volume_NN.cbz archives")
+    parser.add_argument("--store", default=None,
+                        help="Content-addressed image store; outputs become hardlinks into it (same filesystem)")
+    parser.add_argument("--store-originals", action="store_true",
+                        help="With --store: also byte copy the downloaded originals into the store where they "
+                             "can't be reflinked (doubles their disk use on ext4)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and split chapters as they finish downloading (Linux only)")
+    parser.add_argument("--quiet-period", type=float, default=30.0,
+                        help="Watch mode: seconds without changes before a chapter counts as complete")
+    parser.add_argument("--marker", default=".done",
+                        help="Watch mode: file name a downloader creates when a chapter is complete")
+    parser.add_argument("--force", action="store_true", help="Re-split every chapter, even unchanged ones (the split index is still updated)")
+    parser.add_argument("--junk-index", default=None,
+                        help="Junk page index (fill it with: python phash.py junk_index.json credits.png ...)")
+    args = parser.parse_args()
+
+    junk_index = HashIndex(args.junk_index) if args.junk_index else None
+    output_format = "cbz" if args.cbz else "files"
+    store = ImageStore(args.store, copy_originals=args.store_originals) if args.store else None
+
+    if args.watch:
+        watch_manga_folder(
+            args.input_folder,
+            args.output_folder,
+            args.height,
+            stitch=args.stitch,
+            gutter_tolerance=args.gutter_tolerance,
+            preset=args.preset,
+            junk_index=junk_index,
+            jobs=args.jobs,
+            quiet_period=args.quiet_period,
+            marker_name=args.marker,
+            output_format=output_format,
+            store=store,
+        )
+    else:
+        # Process all images in the manga folder
+        process_manga_folder(
+            args.input_folder,
+            args.output_folder,
+            args.height,
+            stitch=args.stitch,
+            gutter_tolerance=args.gutter_tolerance,
+            preset=args.preset,
+            junk_index=junk_index,
+            jobs=args.jobs,
+            incremental=not args.force,
+            output_format=output_format,
+            store=store,
+        )
+
+        if args.cbz and args.chapters_per_volume:
+            for entry in os.scandir(args.output_folder):
+                if entry.is_dir():
+                    pack_volumes(entry.path, args.chapters_per_volume)
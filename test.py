@@ -3,16 +3,20 @@ import os
 import requests
 import re
 
+import fetchpolicy
+import httpcache
+
 # Function to download an image from a URL
 def download_image(url, save_path):
     try:
-        response = requests.get(url)
+        response = httpcache.get(url)
         response.raise_for_status()  # Check if the request was successful
         with open(save_path, 'wb') as file:
             file.write(response.content)  # Save the image content to a file
         print(f"Downloaded: {save_path}")
     except requests.exceptions.RequestException as e:
         print(f"Error downloading {url}: {e}")
+        fetchpolicy.record_failure(url, e, path=save_path)
 
 # Load the JSON data from a file (replace 'data.json' with your file path)
 with open('data.json', 'r') as file:
@@ -1,6 +1,6 @@
 import os
 import re
-import requests
+import shutil
 from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -8,7 +8,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+
+import chromedriver
+import fetchpolicy
+import httpcache
+import metrics
+from encoders import save_image
 
 
 # Selenium setup
@@ -20,7 +25,7 @@ def setup_driver():
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--start-maximized")
 
-    driver_service = Service(ChromeDriverManager().install())
+    driver_service = Service(chromedriver.driver_path())
     driver = webdriver.Chrome(service=driver_service, options=chrome_options)
     return driver
 
@@ -28,7 +33,8 @@ def setup_driver():
 # Split large images
 from PIL import ImageSequence
 
-def split_image(image_path, output_folder, manga_title, chapter_index, start_page_index, piece_height=2000):
+def split_image(image_path, output_folder, manga_title, chapter_index, start_page_index, piece_height=2000, preset=None,
+                animation_mode="frames"):
     """
     Slices an image into smaller pieces of specified height.
     Supports animated images (GIF, WEBP) and processes all frames.
@@ -40,6 +46,12 @@ def split_image(image_path, output_folder, manga_title, chapter_index, start_pag
         chapter_index (int): Chapter index.
         start_page_index (int): Starting page index for naming output slices.
         piece_height (int): Height of each piece in pixels.
+        preset (str): Encoder preset (see encoders.PRESETS), None saves lossless PNG.
+        animation_mode (str): "frames" (default) writes every frame of an animation
+            as separate still slices, encoded with `preset`; "animated" keeps
+            animations animated (copied untouched when no split is needed,
+            otherwise cut into lossless animated pieces of the source format,
+            so `preset` only applies to still images).
     """
     manga_title = manga_title.lower().replace(" ", "_")
     with Image.open(image_path) as img:
@@ -53,25 +65,96 @@ def split_image(image_path, output_folder, manga_title, chapter_index, start_pag
         # Handle static images
         if not is_animated:
             current_page_index = slice_static_image(
-                img, output_folder, manga_title, chapter_index, current_page_index, piece_height
+                img, output_folder, manga_title, chapter_index, current_page_index, piece_height, preset
+            )
+        elif animation_mode == "animated":
+            current_page_index = slice_animated_image(
+                img, image_path, output_folder, chapter_index, current_page_index, piece_height
             )
         else:
             # Handle animated images frame by frame
             frame_index = 0
             for frame in ImageSequence.Iterator(img):
-                frame = frame.copy()
                 frame_output_folder = os.path.join(output_folder, f"frame_{frame_index:02}")
                 os.makedirs(frame_output_folder, exist_ok=True)
 
+                # Slices are crops of the current frame, so the frame itself is never copied
                 current_page_index = slice_static_image(
-                    frame, frame_output_folder, manga_title, chapter_index, current_page_index, piece_height
+                    frame, frame_output_folder, manga_title, chapter_index, current_page_index, piece_height, preset
                 )
                 frame_index += 1
 
         return current_page_index
 
 
-def slice_static_image(img, output_folder, manga_title, chapter_index, start_page_index, piece_height):
+def slice_animated_image(img, image_path, output_folder, chapter_index, start_page_index, piece_height):
+    """
+    Slices an animated image into animated pieces of the same format.
+
+    If the animation already fits in one piece the source file is copied
+    byte for byte. Otherwise pieces are built one at a time: the frames are
+    decoded in order, only this piece's region of each is kept, and the
+    piece is saved and released before the next one, so peak memory is one
+    piece's frames rather than every frame of every piece.
+
+    Args:
+        img (PIL.Image.Image): The opened animated image.
+        image_path (str): Path of the source file (used for the pass-through copy).
+        output_folder (str): Path to the output folder.
+        chapter_index (int): Chapter index.
+        start_page_index (int): Starting page index for naming output slices.
+        piece_height (int): Height of each piece in pixels.
+    """
+    img_width, img_height = img.size
+    current_page_index = start_page_index
+    img_format = "WEBP" if img.format == "WEBP" else "GIF"
+    extension = ".webp" if img_format == "WEBP" else ".gif"
+
+    if img_height <= piece_height:
+        output_path = os.path.join(output_folder, f"chapter{chapter_index}_{current_page_index:02}{extension}")
+        shutil.copyfile(image_path, output_path)
+        print(f"Saved: {output_path}")
+        return current_page_index + 1
+
+    boxes = [
+        (0, top, img_width, min(top + piece_height, img_height))
+        for top in range(0, img_height, piece_height)
+    ]
+    default_duration = img.info.get("duration", 100)
+
+    for box in boxes:
+        piece_frames = []
+        durations = []
+        for frame in ImageSequence.Iterator(img):
+            durations.append(frame.info.get("duration", default_duration))
+            with metrics.stage("slice"):
+                piece_frames.append(frame.crop(box))
+
+        output_path = os.path.join(output_folder, f"chapter{chapter_index}_{current_page_index:02}{extension}")
+        save_options = {"save_all": True, "append_images": piece_frames[1:], "duration": durations,
+                        "loop": img.info.get("loop", 0)}
+        if img_format == "WEBP":
+            save_options["lossless"] = True
+        else:
+            save_options["disposal"] = 2
+        with metrics.stage("encode"):
+            piece_frames[0].save(output_path, img_format, **save_options)
+        print(f"Saved: {output_path}")
+        current_page_index += 1
+
+    return current_page_index
+
+
+def save_slice(img, output_folder, chapter_index, page_index, preset=None):
+    output_path_without_ext = os.path.join(output_folder, f"chapter{chapter_index}_{page_index:02}")
+    if preset is not None:
+        return save_image(img, output_path_without_ext, preset)
+    output_path = output_path_without_ext + ".png"
+    img.save(output_path, "PNG")  # Save as PNG to preserve transparency if any
+    return output_path
+
+
+def slice_static_image(img, output_folder, manga_title, chapter_index, start_page_index, piece_height, preset=None):
     """
     Slices a single static image into smaller pieces.
 
@@ -82,24 +165,24 @@ def slice_static_image(img, output_folder, manga_title, chapter_index, start_pag
         chapter_index (int): Chapter index.
         start_page_index (int): Starting page index for naming output slices.
         piece_height (int): Height of each piece in pixels.
+        preset (str): Encoder preset (see encoders.PRESETS), None saves lossless PNG.
     """
     img_width, img_height = img.size
     current_page_index = start_page_index
 
     if img_height <= piece_height:
-        output_filename = f"chapter{chapter_index}_{current_page_index:02}.png"
-        output_path = os.path.join(output_folder, output_filename)
-        img.save(output_path, "PNG")  # Save as PNG to preserve transparency if any
+        with metrics.stage("encode"):
+            output_path = save_slice(img, output_folder, chapter_index, current_page_index, preset)
         print(f"Saved: {output_path}")
         current_page_index += 1
     else:
         for cut_number in range(0, img_height, piece_height):
             box = (0, cut_number, img_width, min(cut_number + piece_height, img_height))
-            piece = img.crop(box)
+            with metrics.stage("slice"):
+                piece = img.crop(box)
 
-            output_filename = f"chapter{chapter_index}_{current_page_index:02}.png"
-            output_path = os.path.join(output_folder, output_filename)
-            piece.save(output_path, "PNG")
+            with metrics.stage("encode"):
+                output_path = save_slice(piece, output_folder, chapter_index, current_page_index, preset)
             print(f"Saved: {output_path}")
             current_page_index += 1
 
@@ -108,19 +191,21 @@ def slice_static_image(img, output_folder, manga_title, chapter_index, start_pag
 
 def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index):
     print(f"Processing Chapter {chapter_index}: {chapter_url}")
-    driver.get(chapter_url)
-
-    try:
-        # Wait for the images to load within the viewer
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#viewer .item img.page-img"))
-        )
-    except Exception as e:
-        print(f"Images not found for Chapter {chapter_index}: {e}")
-        return
+    with metrics.stage("render"):
+        driver.get(chapter_url)
+
+        try:
+            # Wait for the images to load within the viewer
+            WebDriverWait(driver, 30).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#viewer .item img.page-img"))
+            )
+        except Exception as e:
+            print(f"Images not found for Chapter {chapter_index}: {e}")
+            return
 
-    # Find all image elements within the viewer
-    image_elements = driver.find_elements(By.CSS_SELECTOR, "#viewer .item img.page-img")
+    with metrics.stage("parse"):
+        # Find all image elements within the viewer
+        image_elements = driver.find_elements(By.CSS_SELECTOR, "#viewer .item img.page-img")
     if not image_elements:
         print(f"No images found for Chapter {chapter_index}")
         return
@@ -135,7 +220,7 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
         if img_url and img_url.startswith("https"):
             try:
                 # Fetch the image data
-                response = requests.get(img_url, timeout=10)
+                response = httpcache.get(img_url)
                 response.raise_for_status()
 
                 # Get the file extension from the URL
@@ -156,29 +241,32 @@ def download_images_for_chapter(driver, chapter_url, manga_title, chapter_index)
 
             except Exception as e:
                 print(f"Error downloading or saving image {img_url}: {e}")
+                fetchpolicy.record_failure(img_url, e, chapter_number=chapter_index, chapter_url=chapter_url, page=idx + 1)
 
 
 def scrape_chapters(driver, manga_url):
     print(f"Scraping chapters from {manga_url}")
-    driver.get(manga_url)
     baseUrl = "https://zbato.com"
+    with metrics.stage("render"):
+        driver.get(manga_url)
 
-    try:
-        WebDriverWait(driver, 60).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'div.main'))
-        )
-    except Exception as e:
-        print(f"Failed to load content: {e}")
-        return []
-
-    try:
-        # Locate the chapter list container
-        chapter_list = driver.find_element(By.CSS_SELECTOR, 'div.main')
-        # Locate all chapter links
-        chapter_links = chapter_list.find_elements(By.CSS_SELECTOR, 'a.visited.chapt')
-    except Exception as e:
-        print(f"Failed to locate chapter list: {e}")
-        return []
+        try:
+            WebDriverWait(driver, 60).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'div.main'))
+            )
+        except Exception as e:
+            print(f"Failed to load content: {e}")
+            return []
+
+    with metrics.stage("parse"):
+        try:
+            # Locate the chapter list container
+            chapter_list = driver.find_element(By.CSS_SELECTOR, 'div.main')
+            # Locate all chapter links
+            chapter_links = chapter_list.find_elements(By.CSS_SELECTOR, 'a.visited.chapt')
+        except Exception as e:
+            print(f"Failed to locate chapter list: {e}")
+            return []
 
     chapters = []
     for link in chapter_links:
@@ -206,14 +294,18 @@ def main():
     manga_url = "https://battwo.com/title/97485-the-predator-s-fiancee-official"
     manga_title = "The Predator's Fiancée"
 
-    driver = setup_driver()
+    with metrics.labels(site="zbato", series=manga_title):
+        with metrics.stage("browser_start"):
+            driver = setup_driver()
 
-    try:
-        chapters = scrape_chapters(driver, manga_url)
-        for chapter_number, chapter_url in chapters[:111]:
-            download_images_for_chapter(driver, chapter_url, manga_title, chapter_number)
-    finally:
-        driver.quit()
+        try:
+            with metrics.stage("list_scrape"):
+                chapters = scrape_chapters(driver, manga_url)
+            for chapter_number, chapter_url in chapters[:111]:
+                with metrics.labels(chapter=chapter_number):
+                    download_images_for_chapter(driver, chapter_url, manga_title, chapter_number)
+        finally:
+            driver.quit()
 
     print("Download completed!")
 